@@ -24,15 +24,31 @@ async def get_available_drives():
 async def search_files(request: SearchRequest):
     try:
         start = time.time()
-        files = [FileInfo(**f) for f in file_search_service.search_files(
-            request.search_path, request.file_pattern, request.file_extension,
-            request.recursive, request.max_results, request.case_sensitive)]
+        files = [FileInfo(**f) for f in file_search_service.search_files(**request.model_dump())]
         return SearchResponse(success=True, results_count=len(files), files=files, search_duration_seconds=round(time.time() - start, 2))
     except Exception as e:
         app_logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/search/index", response_model=IndexStatus, tags=["Search"])
+async def build_file_index(request: IndexRequest):
+    try:
+        return IndexStatus(**file_search_service.build_index(request.roots))
+    except Exception as e:
+        app_logger.error(f"Index error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/search/index", response_model=IndexStatus, tags=["Search"])
+async def get_file_index():
+    try:
+        return IndexStatus(**file_search_service.index_status())
+    except Exception as e:
+        app_logger.error(f"Index status error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/search/all-drives", response_model=SearchResponse, tags=["Search"])
 async def search_in_all_drives(request: SearchMultipleDrivesRequest):
     try:
@@ -69,7 +85,8 @@ async def backup_file(request: BackupFileRequest):
 @router.post("/backup/files", response_model=BackupResponse, tags=["Backup"])
 async def backup_files(request: BackupFilesRequest, background_tasks: BackgroundTasks):
     try:
-        return BackupResponse(**backup_service.backup_files(request.source_files, request.destination_folder, request.preserve_structure))
+        return BackupResponse(**backup_service.backup_files(request.source_files, request.destination_folder, request.preserve_structure,
+                                                            workers=request.workers, pack_small_files=request.pack_small_files))
     except Exception as e:
         app_logger.error(f"Backup files error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -78,13 +95,49 @@ async def backup_files(request: BackupFilesRequest, background_tasks: Background
 @router.post("/backup/folder", response_model=BackupResponse, tags=["Backup"])
 async def backup_folder(request: BackupFolderRequest):
     try:
-        r = backup_service.backup_folder(request.source_folder, request.destination_folder, request.file_extensions, request.exclude_patterns)
+        r = backup_service.backup_folder(request.source_folder, request.destination_folder, request.file_extensions, request.exclude_patterns,
+                                         workers=request.workers, incremental=request.incremental, storage=request.storage,
+                                         resume=request.resume, archive_format=request.archive_format,
+                                         pack_small_files=request.pack_small_files, delta=request.delta)
         return BackupResponse(**r) if "error" not in r else BackupResponse(success=False, error=r["error"])
     except Exception as e:
         app_logger.error(f"Backup folder error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/backup/jobs", response_model=ListJobsResponse, tags=["Backup"])
+async def list_jobs():
+    try:
+        return ListJobsResponse(success=True, jobs=[BackupJobInfo(**j) for j in backup_service.list_jobs()])
+    except Exception as e:
+        app_logger.error(f"List jobs error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backup/jobs/{job_id}/resume", response_model=BackupResponse, tags=["Backup"])
+async def resume_job(job_id: str, workers: int = None):
+    try:
+        r = backup_service.resume_job(job_id, workers=workers)
+        return BackupResponse(**r) if "error" not in r else BackupResponse(success=False, error=r["error"])
+    except Exception as e:
+        app_logger.error(f"Resume job error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/backup/throttle", response_model=ThrottleResponse, tags=["Backup"])
+async def get_throttle():
+    return ThrottleResponse(**backup_service.get_throttle())
+
+
+@router.put("/backup/throttle", response_model=ThrottleResponse, tags=["Backup"])
+async def set_throttle(request: ThrottleRequest):
+    try:
+        return ThrottleResponse(**backup_service.set_throttle(request.mbps, request.iops, request.adaptive))
+    except Exception as e:
+        app_logger.error(f"Set throttle error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/restore", response_model=BackupResponse, tags=["Backup"])
 async def restore_file(request: RestoreFileRequest):
     try:
@@ -95,6 +148,16 @@ async def restore_file(request: RestoreFileRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/restore/snapshot", response_model=RestoreSnapshotResponse, tags=["Backup"])
+async def restore_snapshot(request: RestoreSnapshotRequest):
+    try:
+        return RestoreSnapshotResponse(**backup_service.restore_snapshot(request.snapshot_path, request.destination, request.include,
+                                                                         request.verify_checksum, request.workers))
+    except Exception as e:
+        app_logger.error(f"Restore error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/backups", response_model=ListBackupsResponse, tags=["Backup"])
 async def list_backups(backup_date: str = None):
     try:
@@ -104,6 +167,80 @@ async def list_backups(backup_date: str = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/backups/files", response_model=ListBackupFilesResponse, tags=["Backup"])
+async def list_backup_files(backup_path: str, pattern: str = None, limit: int = 1000):
+    try:
+        return ListBackupFilesResponse(success=True, files=[BackupFileEntry(**f) for f in
+                                                            backup_service.list_backup_files(backup_path, pattern, limit)])
+    except Exception as e:
+        app_logger.error(f"List backup files error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backups/rebuild-catalog", response_model=RebuildCatalogResponse, tags=["Backup"])
+async def rebuild_catalog():
+    try:
+        return RebuildCatalogResponse(**backup_service.rebuild_catalog())
+    except Exception as e:
+        app_logger.error(f"Rebuild catalog error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backups/retention", response_model=RetentionResponse, tags=["Backup"])
+async def apply_retention(request: RetentionRequest):
+    try:
+        return RetentionResponse(**backup_service.apply_retention(**request.model_dump()))
+    except Exception as e:
+        app_logger.error(f"Retention error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backups/replicate", response_model=ReplicationResponse, tags=["Backup"])
+async def replicate_backups(request: ReplicationRequest):
+    try:
+        return ReplicationResponse(**backup_service.replicate(request.backup_path))
+    except Exception as e:
+        app_logger.error(f"Replication error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backups/offload", response_model=OffloadResponse, tags=["Backup"])
+async def offload_backups(request: OffloadRequest):
+    try:
+        return OffloadResponse(**backup_service.offload_backups(**request.model_dump()))
+    except Exception as e:
+        app_logger.error(f"Offload error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/backups/scrub", response_model=ScrubStatus, tags=["Backup"])
+async def start_scrub(request: ScrubRequest):
+    try:
+        return ScrubStatus(**backup_service.start_scrub(**request.model_dump()))
+    except Exception as e:
+        app_logger.error(f"Scrub error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/backups/scrub", response_model=ScrubStatus, tags=["Backup"])
+async def scrub_status():
+    try:
+        return ScrubStatus(**backup_service.scrub_status())
+    except Exception as e:
+        app_logger.error(f"Scrub status error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/backups/scrub", response_model=ScrubStatus, tags=["Backup"])
+async def stop_scrub():
+    try:
+        backup_service.stop_scrub()
+        return ScrubStatus(**backup_service.scrub_status())
+    except Exception as e:
+        app_logger.error(f"Scrub stop error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.delete("/backups", response_model=BackupResponse, tags=["Backup"])
 async def delete_backup(backup_path: str):
     try:
@@ -1,5 +1,6 @@
 """Application configuration"""
 import os
+import sys
 from pathlib import Path
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
@@ -15,13 +16,60 @@ class Settings(BaseSettings):
     API_TITLE: str = "BackupWin API"
     API_VERSION: str = "1.0.0"
     DEFAULT_BACKUP_PATH: str = "C:\\Backups"
-    MAX_BACKUP_SIZE_GB: int = 100
+    MAX_BACKUP_SIZE_GB: int = 100  # retention prunes the oldest snapshots beyond this (0 = no cap)
+    BACKUP_VERIFY_MODE: str = "full"  # none | full | sample
+    HASH_ALGORITHM: str = "md5"  # md5 | sha256 | blake2b | blake3 (needs blake3) | xxh3 (needs xxhash) | auto (fastest here, varies by machine)
+    BACKUP_WORKERS: int = 1
+    BACKUP_MAX_INFLIGHT_MB: int = 256
+    BACKUP_JOURNAL_BATCH: int = 256
+    RESTORE_WORKERS: int = 4
+    SEARCH_WORKERS: int = 8  # folders listed at once by searches (1 = one at a time)
+    FILE_INDEX_PATH: str = os.path.join("data", "file_index.db")
+    FILE_INDEX_ROOTS: str = ""  # folders kept in the search index, separated by ";"
+    FILE_INDEX_CACHE_MB: int = 64  # SQLite page cache per index connection, the bound on its memory use
+    FILE_INDEX_WATCH: bool = True  # keep the index current from filesystem events while the API or GUI runs
+    FILE_INDEX_WATCH_DELAY: float = 2  # seconds of changes collected into one index update
+    THROTTLE_MBPS: float = 0  # 0 = unlimited; can be changed at runtime from the GUI and API
+    THROTTLE_IOPS: int = 0
+    THROTTLE_ADAPTIVE: bool = False  # back off while source reads get slower than usual
+    RETENTION_KEEP_LAST: int = 3
+    RETENTION_KEEP_DAILY: int = 7
+    RETENTION_KEEP_WEEKLY: int = 4
+    RETENTION_KEEP_MONTHLY: int = 12
+    RETENTION_AUTO: bool = False  # apply the retention policy after every scheduled backup
+    PRUNE_WORKERS: int = 8
+    SCRUB_MBPS: float = 50  # read rate of integrity scrubs (0 = unlimited)
+    SCRUB_WORKERS: int = 2
+    SCRUB_SLICE_MINUTES: int = 0  # stop a scrub after this long and continue next time (0 = whole pass)
+    SCHEDULER_ENABLED: bool = True  # run BackupSchedule rows while the API is up
+    SCHEDULER_WORKERS: int = 4
+    SCHEDULER_PER_DESTINATION: int = 1  # concurrent scheduled backups writing to one disk
+    SCHEDULER_POLL_SECONDS: int = 30
+    ARCHIVE_FORMAT: str = "tar.gz"  # tar.gz | tar.zst (needs zstandard)
+    ARCHIVE_THREADS: int = 0  # 0 = one per CPU
+    PACK_THRESHOLD_KB: int = 64  # files smaller than this go into pack files when packing
+    PACK_MAX_MB: int = 256
+    PARITY_PERCENT: float = 0  # Reed-Solomon parity added to pack files and archives (0 = off)
+    PARITY_BLOCK_KB: int = 64
+    PARITY_STRIPE_BLOCKS: int = 32  # data blocks sharing one set of parity blocks
+    DELTA_MIN_MB: int = 64  # changed files at least this large are stored as deltas when delta mode is on
+    DELTA_BLOCK_KB: int = 256
+    DELTA_MAX_CHAIN: int = 10  # deltas on top of deltas before a full copy is stored again
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = os.path.join("logs", "app.log")
     R2_ACCOUNT_ID: Optional[str] = None
     R2_ACCESS_KEY_ID: Optional[str] = None
     R2_SECRET_ACCESS_KEY: Optional[str] = None
     R2_BUCKET_NAME: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # any S3-compatible endpoint instead of R2 (MinIO, AWS S3, ...)
+    S3_REGION: Optional[str] = None
+    REPLICATION_PREFIX: str = ""  # key prefix of replicated files in the bucket
+    REPLICATION_WORKERS: int = 4
+    REPLICATION_PART_MB: int = 16  # files at least this large go as parallel multipart uploads
+    REPLICATION_MBPS: float = 0  # upload limit (0 = unlimited)
+    REPLICATION_AUTO: bool = False  # replicate every scheduled backup after it finishes
+    TIER_LOCAL_DAYS: int = 0  # keep only backups newer than this on local disk, older ones in the bucket (0 = all local)
+    TIER_CACHE_MB: int = 10240  # local cache of files fetched back from the bucket for restores
 
     @property
     def backup_path(self) -> Path:
@@ -29,3 +77,12 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
+
+
+def categories_config_path() -> str:
+    """Path of config/file_categories.json, also inside a frozen build"""
+    if getattr(sys, 'frozen', False):
+        base = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    return os.path.join(base, 'config', 'file_categories.json')
@@ -0,0 +1,107 @@
+"""File checksums with a configurable hash algorithm.
+
+Checksums are stored as ``"<algorithm>:<hex digest>"``; a bare hex digest is an MD5 checksum
+written before the algorithm was configurable, so old backups still verify. Every algorithm
+produces a 128-bit digest (SHA-256 and BLAKE3 are truncated) so checksums fit the existing
+database columns.
+"""
+import os
+import time
+import hashlib
+from functools import lru_cache
+from typing import List, Literal, Optional
+from app.core.config import settings
+
+try:
+    import blake3
+except ImportError:  # optional: pip install blake3
+    blake3 = None
+try:
+    import xxhash
+except ImportError:  # optional: pip install xxhash
+    xxhash = None
+
+HashAlgorithm = Literal["md5", "sha256", "blake2b", "blake3", "xxh3"]
+HASH_ALGORITHMS = ("md5", "sha256", "blake2b", "blake3", "xxh3")
+LEGACY_ALGORITHM = "md5"
+_PACKAGES = {"blake3": "blake3", "xxh3": "xxhash"}
+
+
+class Hasher:
+    """Incremental hash whose ``checksum()`` records the algorithm it used"""
+
+    def __init__(self, algorithm: Optional[str] = None):
+        self.algorithm = algorithm or default_algorithm()
+        if self.algorithm == "md5":
+            self._h = hashlib.md5()
+        elif self.algorithm == "sha256":
+            self._h = hashlib.sha256()
+        elif self.algorithm == "blake2b":
+            self._h = hashlib.blake2b(digest_size=16)
+        elif self.algorithm == "blake3" and blake3 is not None:
+            self._h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        elif self.algorithm == "xxh3" and xxhash is not None:
+            self._h = xxhash.xxh3_128()
+        elif self.algorithm in _PACKAGES:
+            raise ValueError(f"Hash algorithm {self.algorithm} needs the {_PACKAGES[self.algorithm]} package")
+        else:
+            raise ValueError(f"Unknown hash algorithm: {self.algorithm}")
+
+    def update(self, data):
+        self._h.update(data)
+
+    def hexdigest(self) -> str:
+        if self.algorithm == "blake3":
+            return self._h.hexdigest(16)
+        return self._h.hexdigest()[:32]
+
+    def checksum(self) -> str:
+        return self.hexdigest() if self.algorithm == LEGACY_ALGORITHM else f"{self.algorithm}:{self.hexdigest()}"
+
+
+def available_algorithms() -> List[str]:
+    """Algorithms usable with the packages installed here"""
+    installed = {"blake3": blake3 is not None, "xxh3": xxhash is not None}
+    return [a for a in HASH_ALGORITHMS if installed.get(a, True)]
+
+
+def default_algorithm() -> str:
+    """HASH_ALGORITHM from settings (md5 by default); the opt-in "auto" picks the fastest algorithm on this machine"""
+    if settings.HASH_ALGORITHM == "auto":
+        return fastest_algorithm()
+    return settings.HASH_ALGORITHM
+
+
+@lru_cache(maxsize=1)
+def fastest_algorithm() -> str:
+    data = os.urandom(4194304)
+    return max(available_algorithms(), key=lambda a: throughput(a, data, rounds=2))
+
+
+def throughput(algorithm: str, data: bytes, rounds: int = 8) -> float:
+    """Bytes per second hashing ``data`` in 1 MiB updates, best of ``rounds``"""
+    view, best = memoryview(data), float("inf")
+    for _ in range(rounds):
+        h = Hasher(algorithm)
+        start = time.perf_counter()
+        for i in range(0, len(view), 1048576):
+            h.update(view[i:i + 1048576])
+        h.hexdigest()
+        best = min(best, time.perf_counter() - start)
+    return len(data) / max(best, 1e-9)
+
+
+def checksum_algorithm(checksum: str) -> str:
+    """Algorithm a stored checksum was made with"""
+    return checksum.split(":", 1)[0] if ":" in checksum else LEGACY_ALGORITHM
+
+
+def hasher_for(checksum: Optional[str]) -> Hasher:
+    """Hasher matching a stored checksum, or the configured algorithm when there is none"""
+    return Hasher(checksum_algorithm(checksum) if checksum else None)
+
+
+def checksum_bytes(data, algorithm: Optional[str] = None) -> str:
+    h = Hasher(algorithm)
+    h.update(data)
+    return h.checksum()
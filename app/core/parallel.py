@@ -0,0 +1,44 @@
+"""Bounded thread-pool helpers for I/O heavy jobs"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, List, Optional, Sequence
+
+
+def run_bounded(items: Sequence, fn: Callable[[Any], Any], workers: int = 1, max_inflight_bytes: int = 0,
+                weight: Optional[Callable[[Any], int]] = None,
+                on_done: Optional[Callable[[int, Any, Any], None]] = None) -> List:
+    """Run fn over items on a worker pool and return the results in input order.
+
+    At most ``max_inflight_bytes`` (as measured by ``weight``) are submitted at once, except that a
+    single oversized item is always allowed to run on its own. ``on_done(count, item, result)`` is
+    called from the calling thread only, with ``count`` increasing by one per finished item.
+    """
+    results: List = [None] * len(items)
+    if workers <= 1:
+        for i, item in enumerate(items):
+            results[i] = fn(item)
+            if on_done:
+                on_done(i + 1, item, results[i])
+        return results
+
+    pending, inflight, finished = {}, 0, 0
+    queue = iter(enumerate(items))
+    nxt = next(queue, None)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while nxt is not None or pending:
+            while nxt is not None and len(pending) < workers * 2:
+                w = weight(nxt[1]) if weight else 0
+                if pending and max_inflight_bytes and inflight + w > max_inflight_bytes:
+                    break
+                pending[pool.submit(fn, nxt[1])] = (nxt[0], nxt[1], w)
+                inflight += w
+                nxt = next(queue, None)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: pending[f][0]):
+                i, item, w = pending.pop(future)
+                inflight -= w
+                results[i] = future.result()
+                finished += 1
+                if on_done:
+                    on_done(finished, item, results[i])
+    return results
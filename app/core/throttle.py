@@ -0,0 +1,128 @@
+"""Process-wide I/O throttle for backup and restore reads"""
+import time
+import threading
+from typing import Dict, Optional
+from app.core.config import settings
+
+_MIB = 1048576
+
+
+class Throttle:
+    """Token buckets for bytes per second and I/O operations per second.
+
+    Readers call ``acquire`` before each read and ``observe`` after it. Reservations may run the
+    buckets into debt; a caller then waits until the debt is paid back, so concurrent copy
+    workers share one limit and a limit changed with ``configure`` takes effect on the next read.
+
+    In adaptive mode the read latency per byte is compared with the best latency seen recently;
+    when it rises to ``backoff_ratio`` times that baseline (the disk is busy with other work) the
+    rate is cut, and it recovers step by step once latency is back to normal. Without a byte limit
+    the cut is applied to the throughput the reads reached on their own.
+    """
+
+    def __init__(self, mbps: float = 0, iops: int = 0, adaptive: bool = False, backoff_ratio: float = 3.0,
+                 burst_seconds: float = 1.0):
+        self.backoff_ratio = backoff_ratio
+        self.burst_seconds = burst_seconds
+        self.factor = 1.0
+        self._lock = threading.Lock()
+        self._bytes = self._ops = 0.0
+        self._last = time.monotonic()
+        self._latency: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._peak: Optional[float] = None
+        self._adjusted = 0.0
+        self.configure(mbps, iops, adaptive)
+
+    @classmethod
+    def from_settings(cls) -> "Throttle":
+        return cls(settings.THROTTLE_MBPS, settings.THROTTLE_IOPS, settings.THROTTLE_ADAPTIVE)
+
+    def configure(self, mbps: Optional[float] = None, iops: Optional[int] = None, adaptive: Optional[bool] = None):
+        """Change limits while copies are running; 0 means unlimited, None keeps the current value"""
+        with self._lock:
+            if mbps is not None:
+                self.mbps = max(float(mbps), 0.0)
+            if iops is not None:
+                self.iops = max(int(iops), 0)
+            if adaptive is not None:
+                self.adaptive = bool(adaptive)
+                self.factor = 1.0
+            # A new limit starts without saved-up burst
+            self._bytes = min(self._bytes, 0.0)
+            self._ops = min(self._ops, 0.0)
+            self._last = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        return bool(self.mbps or self.iops or self.adaptive)
+
+    def _byte_rate(self) -> float:
+        """Current bytes per second, 0 for unlimited"""
+        rate = self.mbps * _MIB
+        if self.adaptive and self.factor < 1:
+            reference = rate or self._peak or 0
+            rate = reference * self.factor
+        return rate
+
+    def acquire(self, nbytes: int, ops: int = 1):
+        """Reserve tokens for one read and wait until the buckets are out of debt"""
+        if not self.active:
+            return
+        with self._lock:
+            self._refill()
+            self._bytes -= nbytes
+            self._ops -= ops
+        while True:
+            with self._lock:
+                self._refill()
+                rate, iops = self._byte_rate(), self.iops
+                wait = max(-self._bytes / rate if rate else 0.0, -self._ops / iops if iops else 0.0)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 0.25))
+
+    def read(self, f, size: int = -1) -> bytes:
+        """``f.read(size)`` within the limits; the bytes are paid for once they are known"""
+        start = time.perf_counter()
+        data = f.read(size)
+        self.observe(time.perf_counter() - start, len(data))
+        self.acquire(len(data))
+        return data
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._last = now - self._last, now
+        rate = self._byte_rate()
+        self._bytes = min(self._bytes + rate * elapsed, rate * self.burst_seconds) if rate else 0.0
+        self._ops = min(self._ops + self.iops * elapsed, self.iops * self.burst_seconds) if self.iops else 0.0
+
+    def observe(self, seconds: float, nbytes: int):
+        """Record how long one read took (adaptive mode)"""
+        if not self.adaptive or nbytes <= 0:
+            return
+        per_byte = seconds / max(nbytes, 65536)
+        with self._lock:
+            self._latency = per_byte if self._latency is None else 0.8 * self._latency + 0.2 * per_byte
+            # The baseline follows the fastest recent reads and slowly forgets them
+            self._baseline = per_byte if self._baseline is None else min(self._baseline * 1.001, per_byte)
+            if self.factor >= 1 and seconds > 0:
+                speed = nbytes / seconds
+                self._peak = speed if self._peak is None else 0.8 * self._peak + 0.2 * speed
+            now = time.monotonic()
+            if now - self._adjusted < 0.5:
+                return
+            self._adjusted = now
+            if self._latency > self._baseline * self.backoff_ratio:
+                self.factor = max(self.factor * 0.7, 0.05)
+            elif self._latency < self._baseline * 1.5:
+                self.factor = min(self.factor + 0.05, 1.0)
+
+    def status(self) -> Dict:
+        with self._lock:
+            rate = self._byte_rate()
+            return {"mbps": self.mbps, "iops": self.iops, "adaptive": self.adaptive, "factor": round(self.factor, 2),
+                    "effective_mbps": round(rate / _MIB, 2) if rate else 0.0}
+
+
+throttle = Throttle.from_settings()
@@ -0,0 +1,123 @@
+"""Directory walking on os.scandir.
+
+``Path.rglob`` followed by ``is_file()`` and ``stat()`` costs several system calls per file. The
+entries os.scandir yields carry the file type from the directory listing, and on Windows their
+``stat()`` result as well, so walking with them needs about one call per file (and none per file
+for type checks). Callers filter on ``entry.name`` before asking for ``entry.stat()``.
+
+On network shares and very large volumes the wait for each listing dominates, so
+parallel_scan_files lists many folders at once on a thread pool.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+PathLike = Union[str, os.PathLike]
+
+
+def scan_files(root: PathLike, recursive: bool = True, exclude_dir: Optional[Callable[[os.DirEntry], bool]] = None,
+               on_error: Optional[Callable[[OSError], None]] = None) -> Iterator[os.DirEntry]:
+    """Regular files under a folder, as os.DirEntry objects that cache their type and stat.
+
+    Folders for which ``exclude_dir`` returns True are not entered, and symlinked folders are not
+    followed. A folder that cannot be listed is skipped as a whole and passed to ``on_error``. Entry
+    paths are joined onto ``root`` as given, so an absolute root yields absolute paths.
+    """
+    pending = [os.fspath(root)]
+    while pending:
+        folder = pending.pop()
+        try:
+            it = os.scandir(folder)
+        except OSError as e:
+            if on_error:
+                on_error(e)
+            continue
+        subfolders = []
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not (exclude_dir and exclude_dir(entry)):
+                            subfolders.append(entry.path)
+                    elif entry.is_file():
+                        yield entry
+                except OSError:  # vanished or unreadable while listed
+                    continue
+        pending.extend(reversed(subfolders))
+
+
+def parallel_scan_files(root: PathLike, workers: int = 8, recursive: bool = True,
+                        exclude_dir: Optional[Callable[[os.DirEntry], bool]] = None,
+                        on_error: Optional[Callable[[OSError], None]] = None, ordered: bool = False) -> Iterator[os.DirEntry]:
+    """scan_files with folders listed by ``workers`` threads, streaming files as listings finish.
+
+    Every subfolder found is queued on the pool at once, so idle threads pick up whatever folder is
+    waiting, wherever it is in the tree. Files come out in completion order; with ``ordered`` they
+    come out depth-first, each folder's files before its subfolders and both sorted by name, the
+    same on every run, while later folders are still listed ahead. ``exclude_dir`` runs on the worker threads; ``on_error`` runs
+    on the caller's. Closing the generator early cancels the listings still queued.
+    """
+    if workers <= 1 and not ordered:
+        yield from scan_files(root, recursive, exclude_dir, on_error)
+        return
+
+    def listing(folder: str):
+        return _list_folder(folder, recursive, exclude_dir, ordered)
+
+    pool = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="scan")
+    try:
+        if ordered:
+            stack = [pool.submit(listing, os.fspath(root))]
+            while stack:
+                files, subfolders, error = stack.pop().result()
+                if error and on_error:
+                    on_error(error)
+                yield from files
+                stack.extend(reversed([pool.submit(listing, f) for f in subfolders]))
+        else:
+            pending = {pool.submit(listing, os.fspath(root))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subfolders, error = future.result()
+                    pending.update(pool.submit(listing, f) for f in subfolders)
+                    if error and on_error:
+                        on_error(error)
+                    yield from files
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _list_folder(folder: str, recursive: bool, exclude_dir: Optional[Callable[[os.DirEntry], bool]],
+                 ordered: bool) -> Tuple[List[os.DirEntry], List[str], Optional[OSError]]:
+    """Files and subfolders to enter of one folder, or the error that stopped its listing"""
+    files, subfolders = [], []
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not (exclude_dir and exclude_dir(entry)):
+                            subfolders.append(entry)
+                    elif entry.is_file():
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as e:
+        return [], [], e
+    if ordered:
+        files.sort(key=lambda e: e.name)
+        subfolders.sort(key=lambda e: e.name)
+    return files, [e.path for e in subfolders], None
+
+
+def folder_size(root: PathLike, exclude_dir: Optional[Callable[[os.DirEntry], bool]] = None) -> Tuple[int, int]:
+    """Total bytes and number of the files under a folder"""
+    total = count = 0
+    for entry in scan_files(root, exclude_dir=exclude_dir):
+        try:
+            total += entry.stat().st_size
+            count += 1
+        except OSError:
+            continue
+    return total, count
@@ -1,24 +1,10 @@
 """Database models package"""
 from app.models.backup import BackupJob, BackupFile, SearchHistory, BackupSchedule, BackupStatus
-from app.models.classification import FileClassification, ClassificationRule, ClassificationScan
-from app.models.tag import FileTag, FileTagAssociation
-from app.models.organization import OrganizationAction, OrganizationTemplate
 
 __all__ = [
-    # Backup models
     "BackupJob",
     "BackupFile",
     "SearchHistory",
     "BackupSchedule",
     "BackupStatus",
-    # Classification models
-    "FileClassification",
-    "ClassificationRule",
-    "ClassificationScan",
-    # Tag models
-    "FileTag",
-    "FileTagAssociation",
-    # Organization models
-    "OrganizationAction",
-    "OrganizationTemplate",
 ]
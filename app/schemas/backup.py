@@ -1,6 +1,6 @@
 """Pydantic schemas for backup operations"""
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 
@@ -13,6 +13,13 @@ class SearchRequest(BaseModel):
     recursive: bool = Field(default=True, description="Search in subdirectories")
     max_results: Optional[int] = Field(default=None, description="Maximum results to return")
     case_sensitive: bool = Field(default=False, description="Case sensitive search")
+    workers: Optional[int] = Field(default=None, ge=1, description="Folders listed at once (default from settings)")
+    ordered: bool = Field(default=False, description="Return results in folder and name order")
+    min_size: Optional[int] = Field(default=None, ge=0, description="Smallest file size in bytes")
+    max_size: Optional[int] = Field(default=None, ge=0, description="Largest file size in bytes")
+    modified_after: Optional[datetime] = Field(default=None, description="Only files modified at or after this time")
+    modified_before: Optional[datetime] = Field(default=None, description="Only files modified before this time")
+    use_index: bool = Field(default=True, description="Answer from the file index when the path is indexed")
 
 
 class SearchMultipleDrivesRequest(BaseModel):
@@ -43,6 +50,33 @@ class SearchResponse(BaseModel):
     search_duration_seconds: Optional[float] = None
 
 
+class IndexRequest(BaseModel):
+    """Schema for (re)building the file index"""
+    roots: Optional[List[str]] = Field(default=None, description="Folders to index (default from settings)")
+
+
+class IndexRoot(BaseModel):
+    """Schema for one indexed folder"""
+    path: str
+    file_count: int
+    indexed_at: Optional[str] = None
+
+
+class IndexStatus(BaseModel):
+    """Schema for the file index status"""
+    success: bool
+    roots: List[IndexRoot] = []
+    file_count: int = 0
+    db_mb: float = 0.0
+    trigram_mb: Optional[float] = None
+    cache_mb: int = 0
+    watching: bool = False
+    watched_roots: List[str] = []
+    pending_changes: int = 0
+    last_update: Optional[dict] = None
+    error: Optional[str] = None
+
+
 # Backup Schemas
 class BackupFileRequest(BaseModel):
     """Schema for single file backup request"""
@@ -57,6 +91,8 @@ class BackupFilesRequest(BaseModel):
     source_files: List[str] = Field(..., description="List of source file paths")
     destination_folder: Optional[str] = Field(default=None, description="Custom destination folder")
     preserve_structure: bool = Field(default=True, description="Preserve folder structure")
+    workers: Optional[int] = Field(default=None, ge=1, description="Parallel copy workers (default from settings)")
+    pack_small_files: bool = Field(default=False, description="Store small files in shared pack files")
 
 
 class BackupFolderRequest(BaseModel):
@@ -65,6 +101,14 @@ class BackupFolderRequest(BaseModel):
     destination_folder: Optional[str] = Field(default=None, description="Custom destination folder")
     file_extensions: Optional[List[str]] = Field(default=None, description="Only backup these extensions")
     exclude_patterns: Optional[List[str]] = Field(default=None, description="Patterns to exclude")
+    workers: Optional[int] = Field(default=None, ge=1, description="Parallel copy workers (default from settings)")
+    incremental: bool = Field(default=False, description="Copy only files changed since the previous backup of this folder")
+    storage: Literal["directory", "chunks", "archive"] = Field(default="directory",
+                                                             description="Plain copies, deduplicated chunk store or one compressed archive")
+    archive_format: Optional[Literal["tar.gz", "tar.zst"]] = Field(default=None, description="Archive format (default from settings)")
+    resume: bool = Field(default=False, description="Continue an interrupted backup of this folder with the same options")
+    pack_small_files: bool = Field(default=False, description="Store small files in shared pack files (directory storage)")
+    delta: bool = Field(default=False, description="Store large changed files as deltas against their previous version (incremental directory storage)")
 
 
 class BackupFileResult(BaseModel):
@@ -85,6 +129,11 @@ class BackupResponse(BaseModel):
     successful: Optional[int] = None
     failed: Optional[int] = None
     total_size_mb: Optional[float] = None
+    unchanged: Optional[int] = None
+    stored_size_mb: Optional[float] = None
+    snapshot: Optional[str] = None
+    resumed: Optional[int] = None
+    job_id: Optional[str] = None
     files: Optional[List[BackupFileResult]] = None
     errors: Optional[List[BackupFileResult]] = None
     error: Optional[str] = None
@@ -97,6 +146,28 @@ class RestoreFileRequest(BaseModel):
     verify_checksum: bool = Field(default=True, description="Verify file integrity")
 
 
+class RestoreSnapshotRequest(BaseModel):
+    """Schema for restoring a whole backup or part of it"""
+    snapshot_path: str = Field(..., description="Path of the backup folder")
+    destination: str = Field(..., description="Folder to restore into")
+    include: Optional[List[str]] = Field(default=None, description="Glob patterns of paths inside the backup to restore")
+    verify_checksum: bool = Field(default=True, description="Verify file integrity")
+    workers: Optional[int] = Field(default=None, ge=1, description="Parallel restore workers (default from settings)")
+
+
+class RestoreSnapshotResponse(BaseModel):
+    """Schema for snapshot restore results"""
+    success: bool
+    snapshot: Optional[str] = None
+    destination: Optional[str] = None
+    total_files: int = 0
+    restored: int = 0
+    failed: int = 0
+    total_size_mb: float = 0.0
+    errors: List[dict] = []
+    error: Optional[str] = None
+
+
 class BackupInfo(BaseModel):
     """Schema for backup information"""
     path: str
@@ -104,6 +175,9 @@ class BackupInfo(BaseModel):
     file_count: int
     size_mb: float
     created: str
+    source: Optional[str] = None
+    mode: Optional[str] = None
+    tier: str = Field(default="local", description="\"remote\" once the backup's data is kept in the bucket only")
 
 
 class ListBackupsResponse(BaseModel):
@@ -112,6 +186,128 @@ class ListBackupsResponse(BaseModel):
     backups: List[BackupInfo]
 
 
+class BackupFileEntry(BaseModel):
+    """Schema for a file inside a backup"""
+    path: str
+    rel_path: str
+    size_bytes: int
+    size_mb: float
+    mtime_ns: Optional[int] = None
+
+
+class ListBackupFilesResponse(BaseModel):
+    """Schema for list backup files response"""
+    success: bool
+    files: List[BackupFileEntry]
+
+
+class RebuildCatalogResponse(BaseModel):
+    """Schema for backup catalog rebuild response"""
+    success: bool
+    snapshots: int = 0
+    error: Optional[str] = None
+
+
+class RetentionRequest(BaseModel):
+    """Schema for applying a retention policy; omitted limits come from settings"""
+    keep_last: Optional[int] = Field(default=None, ge=0, description="Newest snapshots kept per source")
+    keep_daily: Optional[int] = Field(default=None, ge=0, description="Days with a kept snapshot")
+    keep_weekly: Optional[int] = Field(default=None, ge=0, description="Weeks with a kept snapshot")
+    keep_monthly: Optional[int] = Field(default=None, ge=0, description="Months with a kept snapshot")
+    max_total_gb: Optional[float] = Field(default=None, ge=0, description="Cap on stored data (0 = no cap)")
+    dry_run: bool = Field(default=False, description="Only report what would be pruned")
+
+
+class PrunedSnapshot(BaseModel):
+    """Schema for a snapshot chosen by a retention policy"""
+    path: str
+    name: str
+    created: str
+    size_mb: float
+    reason: str = Field(description="policy or size")
+
+
+class RetentionResponse(BaseModel):
+    """Schema for retention results"""
+    success: bool
+    dry_run: bool = False
+    kept: int = 0
+    pruned: List[PrunedSnapshot] = []
+    stored_mb: float = 0.0
+    error: Optional[str] = None
+
+
+class ReplicationRequest(BaseModel):
+    """Schema for uploading backups to the S3/R2 bucket from settings"""
+    backup_path: Optional[str] = Field(default=None, description="One backup folder (default: the whole backup folder)")
+
+
+class ReplicationResponse(BaseModel):
+    """Schema for replication results"""
+    success: bool
+    total_files: int = 0
+    uploaded: int = 0
+    skipped: int = Field(default=0, description="Already in the bucket")
+    resumed: int = Field(default=0, description="Interrupted multipart uploads that were continued")
+    failed: int = 0
+    uploaded_mb: float = 0.0
+    errors: List[dict] = []
+    error: Optional[str] = None
+
+
+class OffloadRequest(BaseModel):
+    """Schema for moving old backups to the S3/R2 bucket"""
+    older_than_days: Optional[float] = Field(default=None, gt=0, description="Offload backups older than this (default from settings)")
+    dry_run: bool = Field(default=False, description="Only report what would be offloaded")
+
+
+class OffloadResponse(BaseModel):
+    """Schema for offload results"""
+    success: bool
+    dry_run: bool = False
+    offloaded: List[str] = []
+    freed_mb: float = 0.0
+    cache_files: int = Field(default=0, description="Files fetched back from the bucket and kept for restores")
+    cache_mb: float = 0.0
+    cache_limit_mb: float = 0.0
+    errors: List[dict] = []
+    error: Optional[str] = None
+
+
+class ScrubRequest(BaseModel):
+    """Schema for starting an integrity scrub; it continues the last unfinished pass"""
+    max_minutes: Optional[float] = Field(default=None, ge=0, description="Stop after this long (default from settings, 0 = no limit)")
+    max_gb: Optional[float] = Field(default=None, ge=0, description="Stop after reading this much")
+    restart: bool = Field(default=False, description="Start a new pass instead of continuing")
+
+
+class ScrubBadFile(BaseModel):
+    """Schema for stored data that failed verification"""
+    type: str
+    stored_path: str
+    error: str
+    found_at: str
+    snapshot: Optional[str] = None
+    rel_path: Optional[str] = None
+    affected: List[dict] = Field(default=[], description="Backed up files that need the data")
+
+
+class ScrubStatus(BaseModel):
+    """Schema for scrub progress and results"""
+    success: bool
+    running: bool = False
+    phase: Optional[str] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    checked_files: int = 0
+    checked_mb: float = 0.0
+    skipped_files: int = 0
+    bad: List[ScrubBadFile] = []
+    repaired: List[dict] = Field(default=[], description="Pack files and archives rebuilt from their parity files")
+    last_pass: Optional[dict] = None
+    error: Optional[str] = None
+
+
 # Drive Information Schemas
 class DriveInfo(BaseModel):
     """Schema for drive information"""
@@ -132,3 +328,38 @@ class FolderSizeResponse(BaseModel):
     total_size_mb: float
     total_size_gb: float
     file_count: int
+
+
+class BackupJobInfo(BaseModel):
+    """Schema for an unfinished backup job"""
+    job_id: str
+    source: str
+    destination: str
+    status: str
+    started_at: Optional[str] = None
+    completed_files: int = 0
+    completed_size_mb: float = 0.0
+    running: bool = False
+
+
+class ListJobsResponse(BaseModel):
+    """Schema for list backup jobs response"""
+    success: bool
+    jobs: List[BackupJobInfo]
+
+
+class ThrottleRequest(BaseModel):
+    """Schema for changing backup I/O limits; omitted fields keep their value"""
+    mbps: Optional[float] = Field(default=None, ge=0, description="Read limit in MB/s (0 = unlimited)")
+    iops: Optional[int] = Field(default=None, ge=0, description="Read operations per second (0 = unlimited)")
+    adaptive: Optional[bool] = Field(default=None, description="Back off while source reads are slower than usual")
+
+
+class ThrottleResponse(BaseModel):
+    """Schema for backup I/O limits"""
+    success: bool = True
+    mbps: float
+    iops: int
+    adaptive: bool
+    factor: float = Field(description="Share of the limit currently allowed by adaptive mode")
+    effective_mbps: float = Field(description="Limit in force right now (0 = unlimited)")
@@ -0,0 +1,325 @@
+"""Streaming tar archives compressed as independent frames on a thread pool"""
+import io
+import os
+import gzip
+import json
+import zlib
+import bisect
+import tarfile
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Literal
+from app.core.config import categories_config_path
+from app.core.hashing import Hasher
+from app.services.copy_engine import throttled_blocks
+from app.services.parity import ParityWriter
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for tar.zst archives
+    zstandard = None
+
+ArchiveFormat = Literal["tar.gz", "tar.zst"]
+ARCHIVE_FORMATS = ("tar.gz", "tar.zst")
+ARCHIVE_NAME = "backup"
+INDEX_SUFFIX = ".idx"
+
+_LEVELS = {"tar.gz": 6, "tar.zst": 3}
+# Frames holding only already-compressed files are stored (gzip level 0) or use zstd's fastest level
+_STORE_LEVELS = {"tar.gz": 0, "tar.zst": -5}
+
+
+def load_compressed_extensions(config_path: Optional[str] = None) -> Set[str]:
+    """Extensions of formats that are already compressed, from config/file_categories.json"""
+    try:
+        with open(config_path or categories_config_path(), "r", encoding="utf-8") as f:
+            return {e.lower() for e in json.load(f).get("compressed_extensions", [])}
+    except (OSError, ValueError):
+        return set()
+
+
+def archive_format(path: Path) -> ArchiveFormat:
+    for fmt in ARCHIVE_FORMATS:
+        if Path(path).name.endswith("." + fmt):
+            return fmt
+    raise ValueError(f"Unknown archive format: {path}")
+
+
+def _check_format(fmt: str):
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format: {fmt}")
+    if fmt == "tar.zst" and zstandard is None:
+        raise ValueError("tar.zst archives need the zstandard package")
+
+
+def _compress(fmt: str, data: bytes, level: int) -> bytes:
+    if fmt == "tar.gz":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _decompress(fmt: str, data: bytes) -> bytes:
+    if fmt == "tar.gz":
+        return zlib.decompress(data, 31)
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def index_path(archive: Path) -> Path:
+    """Sidecar index written next to an archive"""
+    return Path(archive).with_name(Path(archive).name + INDEX_SUFFIX)
+
+
+def load_index(archive: Path) -> Optional[Dict]:
+    """The sidecar index of an archive, or None if it has none"""
+    path = index_path(archive)
+    try:
+        return _load_index(str(path), path.stat().st_mtime_ns)
+    except (OSError, ValueError):
+        return None
+
+
+def find_member(file_path: Path) -> Optional[Dict]:
+    """Manifest-style entry for a path inside an indexed archive, e.g. ``.../backup.tar.gz/docs/a.txt``"""
+    file_path = Path(file_path)
+    for parent in file_path.parents:
+        if parent.is_file():
+            index = load_index(parent)
+            member = index["members"].get(file_path.relative_to(parent).as_posix()) if index else None
+            if member is None:
+                return None
+            return {"source": None, "size": member["size"], "mtime_ns": member["mtime_ns"], "checksum": member["checksum"],
+                    "location": {"type": "archive", "path": str(parent.absolute()), "offset": member["offset"],
+                                 "size": member["size"]}}
+    return None
+
+
+@lru_cache(maxsize=8)
+def _load_index(path: str, _mtime_ns: int) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    index["starts"] = [frame[2] for frame in index["frames"]]
+    return index
+
+
+class ArchiveWriter:
+    """Writes files straight from their source into one tar archive.
+
+    The tar stream is cut into frames of about ``frame_size`` bytes, each compressed on its own by a
+    thread pool and written in order, so the result is a normal multi-member .tar.gz or multi-frame
+    .tar.zst. Files with an extension in ``store_extensions`` go into frames of their own that are
+    stored rather than compressed again.
+
+    Closing also writes a sidecar index listing every frame as ``[compressed offset, compressed
+    length, tar offset, tar length]`` and every member as ``{"offset", "size", "checksum",
+    "mtime_ns"}``, so one member can be read by decompressing only the frames that hold it.
+    ``parity`` (ParityWriter keyword arguments) also writes a parity file of the compressed archive.
+    """
+
+    def __init__(self, path: Path, fmt: ArchiveFormat = "tar.gz", level: Optional[int] = None,
+                 threads: Optional[int] = None, frame_size: int = 4194304, store_extensions: Iterable[str] = (),
+                 parity: Optional[Dict] = None):
+        _check_format(fmt)
+        self.path = Path(path)
+        self.format = fmt
+        self.level = _LEVELS[fmt] if level is None else level
+        self.threads = threads or os.cpu_count() or 1
+        self.frame_size = frame_size
+        self.store_extensions = {e.lower() for e in store_extensions}
+        self.offset = 0
+        self.stored_bytes = 0
+        self.frames: List[List[int]] = []
+        self.members: Dict[str, Dict] = {}
+        self._frame = bytearray()
+        self._frame_store = False
+        self._frame_start = 0
+        self._pending = deque()
+        self._tmp = self.path.with_name(self.path.name + ".part")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._out = open(self._tmp, "wb")
+        self._parity = ParityWriter(self.path, **parity) if parity else None
+        self._pool = ThreadPoolExecutor(max_workers=self.threads)
+
+    def add_file(self, src: Path, arcname: str) -> Dict:
+        """Append one file; returns its checksum, size, mtime and offset in the tar stream"""
+        src = Path(src)
+        store = src.suffix.lower() in self.store_extensions
+        with open(src, "rb") as f:
+            st = os.fstat(f.fileno())
+            info = tarfile.TarInfo(arcname)
+            info.size, info.mtime, info.mode = st.st_size, int(st.st_mtime), st.st_mode & 0o7777
+            self._write(info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape"), store)
+            offset, remaining, h = self.offset, st.st_size, Hasher()
+            try:
+                for block in throttled_blocks(f):
+                    block = block[:remaining]
+                    h.update(block)
+                    self._write(block, store)
+                    remaining -= len(block)
+                    if not remaining:
+                        break
+            finally:
+                # Keep the tar stream well formed even if the file shrank or failed while it was read
+                self._write(bytes(remaining + (-st.st_size) % 512), store)
+        if remaining:
+            raise IOError(f"File changed while archiving: {src}")
+        self.members[arcname] = {"offset": offset, "size": st.st_size, "checksum": h.checksum(), "mtime_ns": st.st_mtime_ns}
+        return {"checksum": h.checksum(), "size_bytes": st.st_size, "mtime_ns": st.st_mtime_ns, "offset": offset}
+
+    def close(self) -> Dict:
+        """Finish the archive and move it into place"""
+        try:
+            self._write(bytes(1024), self._frame_store)
+            self._cut()
+            while self._pending:
+                self._flush_one()
+            self._out.close()
+            if self._parity:
+                self._parity.close()
+            index = index_path(self.path)
+            tmp = index.with_name(index.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "format": self.format, "frames": self.frames, "members": self.members}, f,
+                          ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, index)
+            os.replace(self._tmp, self.path)
+        finally:
+            self.abort()
+        return {"path": str(self.path.absolute()), "size_bytes": self.offset, "stored_bytes": self.stored_bytes,
+                "frames": len(self.frames)}
+
+    def abort(self):
+        """Stop writing and remove a partial archive"""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._out.close()
+        self._tmp.unlink(missing_ok=True)
+        if self._parity:
+            self._parity.abort()
+
+    def _write(self, data, store: bool):
+        if self._frame and store != self._frame_store:
+            self._cut()
+        self._frame_store = store
+        view = memoryview(data)
+        while len(view):
+            part, view = view[:self.frame_size - len(self._frame)], view[self.frame_size - len(self._frame):]
+            self._frame += part
+            self.offset += len(part)
+            if len(self._frame) >= self.frame_size:
+                self._cut()
+
+    def _cut(self):
+        if not self._frame:
+            return
+        data, self._frame = bytes(self._frame), bytearray()
+        level = _STORE_LEVELS[self.format] if self._frame_store else self.level
+        self._pending.append((self._pool.submit(_compress, self.format, data, level), self._frame_start, len(data)))
+        self._frame_start += len(data)
+        while len(self._pending) > self.threads * 2:
+            self._flush_one()
+
+    def _flush_one(self):
+        future, start, size = self._pending.popleft()
+        packed = future.result()
+        self.frames.append([self.stored_bytes, len(packed), start, size])
+        self._out.write(packed)
+        if self._parity:
+            self._parity.update(packed)
+        self.stored_bytes += len(packed)
+
+
+def open_member(location: Dict) -> BinaryIO:
+    """Stream the data of one archived file.
+
+    With a sidecar index only the frames holding the file are read and decompressed; without one
+    the archive is decompressed from the start up to the file.
+    """
+    path = Path(location["path"])
+    fmt = archive_format(path)
+    _check_format(fmt)
+    index = load_index(path)
+    raw = open(path, "rb")
+    if index is not None:
+        first = max(bisect.bisect_right(index["starts"], location["offset"]) - 1, 0)
+        return io.BufferedReader(_FrameReader(raw, fmt, index["frames"], first, location["offset"], location["size"]))
+    try:
+        if fmt == "tar.gz":
+            stream = gzip.GzipFile(fileobj=raw)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False)
+        stream.seek(location["offset"])
+    except Exception:
+        raw.close()
+        raise
+    return io.BufferedReader(_SliceReader(stream, location["size"], raw))
+
+
+class _SliceReader(io.RawIOBase):
+    """Raw stream over the next ``size`` bytes of a decompressed archive stream"""
+
+    def __init__(self, stream: BinaryIO, size: int, raw: BinaryIO):
+        self._stream = stream
+        self._remaining = size
+        self._raw = raw
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        data = self._stream.read(min(len(buffer), self._remaining))
+        if not data:
+            raise IOError("Archive ended early")
+        n = len(data)
+        buffer[:n] = data
+        self._remaining -= n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+            self._raw.close()
+        super().close()
+
+
+class _FrameReader(io.RawIOBase):
+    """Raw stream over a byte range of the tar stream, decompressing one indexed frame at a time"""
+
+    def __init__(self, raw: BinaryIO, fmt: str, frames: List[List[int]], first: int, offset: int, size: int):
+        self._raw = raw
+        self._format = fmt
+        self._frames = frames
+        self._next = first
+        self._position = offset
+        self._remaining = size
+        self._current = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not len(self._current):
+            if self._remaining <= 0:
+                return 0
+            if self._next >= len(self._frames):
+                raise IOError("Archive ended early")
+            packed_offset, packed_length, start, size = self._frames[self._next]
+            self._next += 1
+            self._raw.seek(packed_offset)
+            data = _decompress(self._format, self._raw.read(packed_length))
+            if len(data) != size:
+                raise IOError(f"Corrupt archive frame at {packed_offset}")
+            self._current = memoryview(data)[self._position - start:self._position - start + self._remaining]
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        self._position += n
+        self._remaining -= n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
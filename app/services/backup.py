@@ -1,56 +1,132 @@
 """Backup service for Windows files"""
-import shutil
-import hashlib
+import os
+import itertools
+import threading
+from fnmatch import fnmatch
 from pathlib import Path
-from typing import List, Optional, Dict, Callable
-from datetime import datetime
+from typing import List, Optional, Dict, Callable, Literal, Set
+from datetime import datetime, timedelta
 from app.core.logger import app_logger
 from app.core.config import settings
+from app.core.parallel import run_bounded
+from app.core.hashing import hasher_for
+from app.core.throttle import throttle
+from app.core.walker import scan_files
+from app.services.copy_engine import CopyEngine, VerifyMode, ChecksumMismatchError, iter_blocks
+from app.services.archive import ArchiveWriter, ArchiveFormat, ARCHIVE_NAME, find_member, load_compressed_extensions
+from app.services.catalog import BackupCatalog, CATALOG_NAME
+from app.services.chunk_store import ChunkStore
+from app.services.delta import Signature, SignatureCache, SIGNATURES_DIR, DELTAS_DIR, DELTA_SUFFIX, write_delta
+from app.services.pack_store import PackWriter, PACKS_DIR, pack_intact
+from app.services.journal import BackupJournal, JOBS_DIR, JOURNAL_SUFFIX, list_journals
+from app.services.manifest import MANIFEST_NAME, SnapshotManifest, SourceHistory, location_path, open_location
+from app.services.parity import parity_path, repair_file
+from app.services.replication import REPLICATION_STATE_NAME, S3Replicator, replication_files, s3_client
+from app.services.retention import Pruner, plan_retention, TRASH_DIR
+from app.services.scrubber import SCRUB_STATE_NAME, Scrubber
+from app.services.tiering import TieredStore
+
+CHUNK_STORE_DIR = ".chunks"
+
+_jobs_lock = threading.Lock()
+_running_by_base: Dict[str, Set[str]] = {}
+
+
+def running_jobs(backup_base_path: Path) -> Set[str]:
+    """Ids of the folder backups running in this process on a backup base.
+
+    Every BackupService on the same base gets the same set, so deletes, retention and offloads from
+    one (the API's) see a backup another (the scheduler's) is writing.
+    """
+    key = os.path.normcase(os.path.abspath(backup_base_path))
+    with _jobs_lock:
+        return _running_by_base.setdefault(key, set())
 
 
 class BackupService:
     """Service for backing up files"""
 
-    def __init__(self, backup_base_path: Optional[str] = None):
+    def __init__(self, backup_base_path: Optional[str] = None, verify_mode: Optional[VerifyMode] = None):
         self.logger = app_logger
         self.backup_base_path = Path(backup_base_path or settings.DEFAULT_BACKUP_PATH)
         self.backup_base_path.mkdir(parents=True, exist_ok=True)
+        self.copy_engine = CopyEngine(verify=verify_mode or settings.BACKUP_VERIFY_MODE)
+        self.chunk_store = ChunkStore(self.backup_base_path / CHUNK_STORE_DIR)
+        self.catalog = BackupCatalog(self.backup_base_path / CATALOG_NAME)
+        self.jobs_path = self.backup_base_path / JOBS_DIR
+        self.signatures = SignatureCache(self.backup_base_path / SIGNATURES_DIR)
+        self.pruner = Pruner(self.backup_base_path, self.catalog, settings.PRUNE_WORKERS)
+        self.scrubber = Scrubber(self.backup_base_path, self.catalog, self.chunk_store)
+        self.tiers = TieredStore(self.backup_base_path, self.catalog)
+        self._running_jobs = running_jobs(self.backup_base_path)
 
     def backup_file(self, source_file: str, destination_folder: Optional[str] = None,
                     preserve_structure: bool = True, create_checksum: bool = True) -> Dict:
         """Backup a single file"""
+        dest_base = Path(destination_folder) if destination_folder else self.backup_base_path / datetime.now().strftime("%Y%m%d_%H%M%S")
+        result = self._backup_one(source_file, dest_base, preserve_structure, create_checksum)
+        if result["success"]:
+            self._record_manifest(dest_base, [result])
+        return result
+
+    def _backup_one(self, source_file: str, dest_base: Path, preserve_structure: bool = True,
+                    create_checksum: bool = True) -> Dict:
         try:
             src = Path(source_file)
             if not src.exists() or not src.is_file():
                 raise FileNotFoundError(f"Source not found: {source_file}")
 
-            dest_base = Path(destination_folder) if destination_folder else self.backup_base_path / datetime.now().strftime("%Y%m%d_%H%M%S")
             dest_folder = dest_base / src.parent.name if preserve_structure else dest_base
             dest_folder.mkdir(parents=True, exist_ok=True)
-            dest_file = dest_folder / src.name
-
-            src_checksum = self._calculate_checksum(src) if create_checksum else None
-            shutil.copy2(src, dest_file)
-
-            if create_checksum and src_checksum != self._calculate_checksum(dest_file):
-                raise Exception("Checksum mismatch!")
-
-            stats = dest_file.stat()
-            return {"success": True, "source": str(src.absolute()), "destination": str(dest_file.absolute()),
-                    "size_bytes": stats.st_size, "size_mb": round(stats.st_size / 1048576, 2),
-                    "checksum": src_checksum, "backed_up_at": datetime.now().isoformat(sep=' ')}
+            return self._copy_file(src, dest_folder / src.name, create_checksum)
         except Exception as e:
             self.logger.error(f"Backup error {source_file}: {e}")
             return {"success": False, "source": source_file, "error": str(e)}
 
+    def _copy_file(self, src: Path, dest_file: Path, create_checksum: bool = True) -> Dict:
+        copied = self.copy_engine.copy(src, dest_file, hash_data=create_checksum)
+        return {"success": True, "source": str(src.absolute()), "destination": str(dest_file.absolute()),
+                "size_bytes": copied["size_bytes"], "size_mb": round(copied["size_bytes"] / 1048576, 2),
+                "mtime_ns": copied["mtime_ns"], "checksum": copied["checksum"],
+                "backed_up_at": datetime.now().isoformat(sep=' ')}
+
     def backup_files(self, source_files: List[str], destination_folder: Optional[str] = None,
-                     preserve_structure: bool = True, progress_callback: Optional[Callable] = None) -> Dict:
-        """Backup multiple files"""
-        results = {"total_files": len(source_files), "successful": 0, "failed": 0, "total_size_mb": 0.0, "files": [], "errors": []}
-        dest = destination_folder or str(self.backup_base_path / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                     preserve_structure: bool = True, progress_callback: Optional[Callable] = None,
+                     workers: Optional[int] = None, max_inflight_mb: Optional[int] = None,
+                     journal: Optional[BackupJournal] = None, pack_small_files: bool = False) -> Dict:
+        """Backup multiple files, optionally on a bounded pool of copy workers.
+
+        With a journal, every copied file is recorded as it finishes and files the journal already
+        holds are not copied again. With pack_small_files, files below PACK_THRESHOLD_KB are
+        appended to shared pack files instead of being created one by one.
+        """
+        results = {"total_files": len(source_files), "successful": 0, "failed": 0, "resumed": 0, "total_size_mb": 0.0,
+                   "files": [], "errors": []}
+        dest = Path(destination_folder) if destination_folder else self._stamped_folder()
+        workers = workers or settings.BACKUP_WORKERS
+        inflight = (max_inflight_mb or settings.BACKUP_MAX_INFLIGHT_MB) * 1048576
+        done = {f: journal.completed[f] for f in source_files if journal and self._journaled(journal.completed.get(f), f)}
+        pending = [f for f in source_files if f not in done]
+        packer = self._packer(dest) if pack_small_files else None
+
+        def backup_one(f: str) -> Dict:
+            if packer and self._file_size(f) < settings.PACK_THRESHOLD_KB * 1024:
+                return self._pack_one(f, dest, preserve_structure, packer)
+            return self._backup_one(f, dest, preserve_structure)
+
+        def on_done(count: int, f: str, result: Dict):
+            if journal and result["success"]:
+                journal.record(f, result)
+            if progress_callback:
+                progress_callback(len(done) + count, len(source_files), f)
 
-        for i, f in enumerate(source_files, 1):
-            result = self.backup_file(f, dest, preserve_structure)
+        try:
+            outcomes = dict(zip(pending, run_bounded(pending, backup_one, workers, inflight, self._file_size, on_done)))
+        finally:
+            if packer:
+                packer.close(self.copy_engine.verify)
+        for f in source_files:
+            result = done.get(f) or outcomes[f]
             if result["success"]:
                 results["successful"] += 1
                 results["total_size_mb"] += result["size_mb"]
@@ -58,87 +134,711 @@ class BackupService:
             else:
                 results["failed"] += 1
                 results["errors"].append(result)
-            if progress_callback:
-                progress_callback(i, len(source_files), f)
+        results["resumed"] = len(done)
 
+        self._record_manifest(dest, results["files"])
         results["total_size_mb"] = round(results["total_size_mb"], 2)
         return results
 
+    @staticmethod
+    def _journaled(entry: Optional[Dict], source: str) -> bool:
+        """True if a journaled copy still matches its unchanged source"""
+        if not entry:
+            return False
+        try:
+            st = Path(source).stat()
+        except OSError:
+            return False
+        location = entry.get("location") or {"type": "file", "path": entry["destination"]}
+        if location["type"] in ("file", "delta") and not Path(location["path"]).exists():
+            return False
+        if location["type"] == "pack" and not pack_intact(location):
+            return False
+        return st.st_size == entry["size_bytes"] and st.st_mtime_ns == entry["mtime_ns"]
+
+    def _packer(self, dest: Path) -> PackWriter:
+        """Pack writer for a destination; packs for the backup base itself live in its .packs folder"""
+        return PackWriter(dest / PACKS_DIR, settings.PACK_MAX_MB * 1048576, _parity_options())
+
+    def _pack_one(self, source_file: str, dest_base: Path, preserve_structure: bool, packer: PackWriter) -> Dict:
+        try:
+            src = Path(source_file)
+            logical = (dest_base / src.parent.name if preserve_structure else dest_base) / src.name
+            packed = packer.add(src, logical.relative_to(dest_base).as_posix())
+            return {"success": True, "source": str(src.absolute()), "destination": str(logical.absolute()),
+                    "size_bytes": packed["size_bytes"], "size_mb": round(packed["size_bytes"] / 1048576, 2),
+                    "mtime_ns": packed["mtime_ns"], "checksum": packed["checksum"], "location": packed["location"],
+                    "backed_up_at": datetime.now().isoformat(sep=' ')}
+        except Exception as e:
+            self.logger.error(f"Backup error {source_file}: {e}")
+            return {"success": False, "source": source_file, "error": str(e)}
+
+    def _record_manifest(self, dest: Path, copied: List[Dict]):
+        """Merge copied files into the manifest of their snapshot folder and catalog it.
+
+        Files written straight into the backup base are grouped by their top-level folder, which is
+        how list_backups has always presented them.
+        """
+        dest, base = dest.absolute(), self.backup_base_path.absolute()
+        groups: Dict[Path, List[Dict]] = {}
+        for r in copied:
+            folder = dest
+            if dest == base:
+                parts = Path(r["destination"]).relative_to(base).parts
+                if len(parts) < 2:
+                    continue
+                folder = base / parts[0]
+            groups.setdefault(folder, []).append(r)
+
+        for folder, results in groups.items():
+            try:
+                manifest = SnapshotManifest.load(folder) or SnapshotManifest(folder)
+                for r in results:
+                    rel = Path(r["destination"]).relative_to(folder).as_posix()
+                    manifest.add(rel, r["source"], r["size_bytes"], r["mtime_ns"], r["checksum"],
+                                 r.get("location") or {"type": "file", "path": r["destination"]})
+                manifest.save()
+                self._catalog_snapshot(manifest)
+            except Exception as e:
+                self.logger.warning(f"Manifest write error {folder}: {e}")
+
+    def _catalog_snapshot(self, manifest: SnapshotManifest):
+        """Catalog snapshots that live under the backup base; others only keep their manifest"""
+        if self.backup_base_path.absolute() in manifest.snapshot_path.absolute().parents:
+            self.catalog.record_manifest(manifest)
+
     def backup_folder(self, source_folder: str, destination_folder: Optional[str] = None,
                       file_extensions: Optional[List[str]] = None, exclude_patterns: Optional[List[str]] = None,
-                      progress_callback: Optional[Callable] = None) -> Dict:
-        """Backup entire folder"""
+                      progress_callback: Optional[Callable] = None, workers: Optional[int] = None,
+                      incremental: bool = False, storage: Literal["directory", "chunks", "archive"] = "directory",
+                      resume: bool = False, archive_format: Optional[ArchiveFormat] = None,
+                      pack_small_files: bool = False, delta: bool = False) -> Dict:
+        """Backup entire folder.
+
+        Incremental runs copy only files changed since the previous snapshot of the folder. The
+        "chunks" storage writes file data into the deduplicating chunk store instead of plain copies;
+        "archive" streams all files into one compressed tar archive in the snapshot folder. Each run
+        is journaled; with resume, an interrupted run of the same folder and options is continued
+        instead of starting over (archive runs start their archive again). pack_small_files stores
+        small files in shared pack files with "directory" storage. delta stores large changed
+        files of an incremental "directory" backup as rsync-style deltas against their previous
+        version. Folders matching exclude_patterns are skipped without being walked.
+        """
         try:
             src = Path(source_folder)
             if not src.exists() or not src.is_dir():
                 raise FileNotFoundError(f"Folder not found: {source_folder}")
+            if storage not in ("directory", "chunks", "archive"):
+                raise ValueError(f"Unknown storage: {storage}")
 
-            files = [str(f.absolute()) for f in src.rglob("*") if f.is_file()
-                     and (not file_extensions or any(f.name.endswith(ext) for ext in file_extensions))
-                     and (not exclude_patterns or not any(f.match(p) for p in exclude_patterns))]
-
-            return self.backup_files(files, destination_folder, True, progress_callback)
+            options = {"destination_folder": destination_folder, "file_extensions": file_extensions,
+                       "exclude_patterns": exclude_patterns, "incremental": incremental, "storage": storage}
+            if storage == "archive":
+                options["archive_format"] = archive_format or settings.ARCHIVE_FORMAT
+            if pack_small_files and storage == "directory":
+                options["pack_small_files"] = True
+            if delta and incremental and storage == "directory":
+                options["delta"] = True
+            journal = self._find_job(str(src.absolute()), options) if resume else None
+            if journal is None:
+                dest = self._job_destination(destination_folder, incremental or storage != "directory")
+                journal = BackupJournal.create(self.jobs_path, str(src.absolute()), str(dest.absolute()), options)
+            return self._run_job(journal, progress_callback, workers)
         except Exception as e:
             self.logger.error(f"Folder backup error: {e}")
             return {"success": False, "source": source_folder, "error": str(e)}
 
+    def resume_job(self, job_id: str, progress_callback: Optional[Callable] = None, workers: Optional[int] = None) -> Dict:
+        """Continue an interrupted folder backup from its journal"""
+        try:
+            path = self.jobs_path / f"{job_id}{JOURNAL_SUFFIX}"
+            journal = BackupJournal.load(path) if path.is_file() else None
+            if journal is None:
+                raise FileNotFoundError(f"Job not found: {job_id}")
+            if journal.job_id in self._running_jobs:
+                raise RuntimeError(f"Job is already running: {job_id}")
+            return self._run_job(journal, progress_callback, workers)
+        except Exception as e:
+            self.logger.error(f"Resume job error: {e}")
+            return {"success": False, "job_id": job_id, "error": str(e)}
+
+    def list_jobs(self) -> List[Dict]:
+        """Folder backups that have not completed; those not running here were interrupted"""
+        try:
+            return [dict(j.info(), running=j.job_id in self._running_jobs) for j in list_journals(self.jobs_path)]
+        except Exception as e:
+            self.logger.error(f"List jobs error: {e}")
+            return []
+
+    def find_interrupted_job(self, source_folder: str) -> Optional[Dict]:
+        """Newest interrupted job for a source folder, if any"""
+        source = str(Path(source_folder).absolute())
+        jobs = [j for j in self.list_jobs() if j["source"] == source and not j["running"]]
+        return jobs[-1] if jobs else None
+
+    def _find_job(self, source: str, options: Dict) -> Optional[BackupJournal]:
+        for journal in reversed(list_journals(self.jobs_path)):
+            if journal.source == source and journal.options == options and journal.job_id not in self._running_jobs:
+                return journal
+        return None
+
+    def _job_destination(self, destination_folder: Optional[str], snapshot: bool) -> Path:
+        """Concrete folder a job writes to; snapshots never go straight into the backup base"""
+        if not destination_folder:
+            return self._stamped_folder()
+        dest = Path(destination_folder)
+        return self._stamped_folder() if snapshot and dest.absolute() == self.backup_base_path.absolute() else dest
+
+    def _stamped_folder(self) -> Path:
+        """Create a new ``backup_<time>`` folder; backups started in the same second get ``_1``, ``_2``, ...
+        so they never share a folder (and a manifest)"""
+        stamp = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        for n in itertools.count():
+            folder = self.backup_base_path / (f"{stamp}_{n}" if n else stamp)
+            try:
+                folder.mkdir(parents=True)
+                return folder
+            except FileExistsError:
+                continue
+
+    def _run_job(self, journal: BackupJournal, progress_callback: Optional[Callable], workers: Optional[int]) -> Dict:
+        src, options = Path(journal.source), journal.options
+        if not src.is_dir():
+            raise FileNotFoundError(f"Folder not found: {journal.source}")
+        file_extensions, exclude_patterns = options.get("file_extensions"), options.get("exclude_patterns")
+        extensions = tuple(file_extensions) if file_extensions else None
+        skip_dir = (lambda d: _excluded(d.path, exclude_patterns)) if exclude_patterns else None
+        files = [e.path for e in scan_files(src.absolute(), exclude_dir=skip_dir)
+                 if (not extensions or e.name.endswith(extensions))
+                 and not (exclude_patterns and _excluded(e.path, exclude_patterns))]
+
+        self._running_jobs.add(journal.job_id)
+        try:
+            if options.get("incremental") or options.get("storage", "directory") != "directory":
+                results = self._backup_snapshot(src, files, Path(journal.destination), progress_callback, workers,
+                                                options, journal)
+            else:
+                results = self.backup_files(files, journal.destination, True, progress_callback, workers, journal=journal,
+                                            pack_small_files=options.get("pack_small_files", False))
+            journal.finish(results)
+        finally:
+            journal.close()
+            self._running_jobs.discard(journal.job_id)
+        results["job_id"] = journal.job_id
+        return results
+
+    def _backup_snapshot(self, src: Path, files: List[str], dest: Path, progress_callback: Optional[Callable],
+                         workers: Optional[int], options: Dict, journal: Optional[BackupJournal] = None) -> Dict:
+        """Back up a tree into a manifest snapshot, referencing unchanged files when incremental"""
+        incremental, storage = options.get("incremental", False), options.get("storage", "directory")
+        history = SourceHistory(self.backup_base_path, src)
+        previous = history.latest()
+        prev_entries = previous.entries if previous and incremental else {}
+        manifest = SnapshotManifest(dest, str(src.absolute()), "incremental" if incremental else "full",
+                                    str(previous.snapshot_path) if previous and incremental else None)
+        results = {"total_files": len(files), "successful": 0, "failed": 0, "unchanged": 0, "resumed": 0, "total_size_mb": 0.0,
+                   "stored_size_mb": 0.0, "files": [], "errors": [], "snapshot": str(dest.absolute())}
+        done = journal.completed if journal and storage != "archive" else {}
+
+        changed = []
+        for f in files:
+            p = Path(f)
+            rel = p.relative_to(src).as_posix()
+            try:
+                st = p.stat()
+            except OSError as e:
+                results["failed"] += 1
+                results["errors"].append({"success": False, "source": f, "error": str(e)})
+                continue
+            old = prev_entries.get(rel)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                manifest.entries[rel] = dict(old, source=str(p.absolute()))
+                results["unchanged"] += 1
+            elif self._journaled(done.get(rel), f):
+                result = dict(done[rel])
+                manifest.add(rel, result["source"], result["size_bytes"], result["mtime_ns"], result["checksum"],
+                             result.pop("location"))
+                result.pop("stored_bytes", None)
+                results["total_size_mb"] += result["size_mb"]
+                results["files"].append(result)
+                results["resumed"] += 1
+            else:
+                changed.append((p, rel))
+
+        packer = self._packer(dest) if options.get("pack_small_files") else None
+
+        def copy_one(item) -> Dict:
+            p, rel = item
+            try:
+                if storage == "chunks":
+                    return self._chunk_file(p, dest / rel)
+                size = self._file_size(p)
+                if options.get("delta") and rel in prev_entries and size >= settings.DELTA_MIN_MB * 1048576:
+                    result = self._delta_file(p, dest, rel, prev_entries[rel])
+                    if result:
+                        return result
+                if packer and size < settings.PACK_THRESHOLD_KB * 1024:
+                    result = self._pack_one(str(p), dest / Path(rel).parent, False, packer)
+                    result["stored_bytes"] = result.get("size_bytes", 0)
+                    return result
+                (dest / rel).parent.mkdir(parents=True, exist_ok=True)
+                result = self._copy_file(p, dest / rel)
+                result["stored_bytes"] = result["size_bytes"]
+                result["location"] = {"type": "file", "path": result["destination"]}
+                return result
+            except Exception as e:
+                self.logger.error(f"Backup error {p}: {e}")
+                return {"success": False, "source": str(p), "error": str(e)}
+
+        def on_done(count: int, item, result: Dict):
+            if journal and result["success"] and storage != "archive":
+                journal.record(item[1], result)
+            if progress_callback:
+                progress_callback(results["unchanged"] + results["resumed"] + count, len(files), str(item[0]))
+
+        if storage == "archive":
+            outcomes, stored = self._archive_files(changed, dest, options.get("archive_format") or settings.ARCHIVE_FORMAT,
+                                                   workers, on_done)
+            results["stored_size_mb"] += stored / 1048576
+        else:
+            try:
+                outcomes = run_bounded(changed, copy_one, workers or settings.BACKUP_WORKERS,
+                                       settings.BACKUP_MAX_INFLIGHT_MB * 1048576, lambda item: self._file_size(item[0]), on_done)
+            finally:
+                if packer:
+                    packer.close(self.copy_engine.verify)
+        for (p, rel), result in zip(changed, outcomes):
+            if result["success"]:
+                manifest.add(rel, result["source"], result["size_bytes"], result["mtime_ns"], result["checksum"],
+                             result.pop("location"))
+                results["total_size_mb"] += result["size_mb"]
+                results["stored_size_mb"] += result.pop("stored_bytes") / 1048576
+                results["files"].append(result)
+            else:
+                results["failed"] += 1
+                results["errors"].append(result)
+
+        manifest.save()
+        self._catalog_snapshot(manifest)
+        history.record(dest.absolute())
+        results["successful"] = results["unchanged"] + len(results["files"])
+        results["total_size_mb"] = round(results["total_size_mb"], 2)
+        results["stored_size_mb"] = round(results["stored_size_mb"], 2)
+        return results
+
+    def _archive_files(self, items: List, dest: Path, fmt: ArchiveFormat, threads: Optional[int],
+                       on_done: Callable) -> tuple:
+        """Stream files into the snapshot's archive; returns per-file results and the archive size"""
+        archive = dest / f"{ARCHIVE_NAME}.{fmt}"
+        writer = ArchiveWriter(archive, fmt, threads=threads or settings.ARCHIVE_THREADS or None,
+                               store_extensions=load_compressed_extensions(), parity=_parity_options())
+        outcomes = []
+        try:
+            for count, (p, rel) in enumerate(items, 1):
+                try:
+                    added = writer.add_file(p, rel)
+                    result = {"success": True, "source": str(p.absolute()), "destination": str((dest / rel).absolute()),
+                              "size_bytes": added["size_bytes"], "size_mb": round(added["size_bytes"] / 1048576, 2),
+                              "mtime_ns": added["mtime_ns"], "checksum": added["checksum"], "stored_bytes": 0,
+                              "location": {"type": "archive", "path": str(archive.absolute()), "offset": added["offset"],
+                                           "size": added["size_bytes"]},
+                              "backed_up_at": datetime.now().isoformat(sep=' ')}
+                except Exception as e:
+                    self.logger.error(f"Backup error {p}: {e}")
+                    result = {"success": False, "source": str(p), "error": str(e)}
+                outcomes.append(result)
+                on_done(count, (p, rel), result)
+            return outcomes, writer.close()["stored_bytes"]
+        except BaseException:
+            writer.abort()
+            raise
+
+    def _delta_file(self, src: Path, dest: Path, rel: str, old: Dict) -> Optional[Dict]:
+        """Store a changed file as a delta against its previous version; None when a full copy is due"""
+        base = old["location"]
+        depth = base.get("depth", 0) + 1
+        if base["type"] not in ("file", "delta") or depth > settings.DELTA_MAX_CHAIN:
+            return None
+        block_size = settings.DELTA_BLOCK_KB * 1024
+        sig = self.signatures.get(old.get("checksum"), block_size)
+        if sig is None:
+            with open_location(base) as f:
+                sig = Signature.of_stream(f, block_size)
+            self.signatures.put(old.get("checksum"), sig)
+        written = write_delta(src, sig, dest / DELTAS_DIR / (rel + DELTA_SUFFIX))
+        if written is None:
+            return None
+        location = {"type": "delta", "path": str((dest / DELTAS_DIR / (rel + DELTA_SUFFIX)).absolute()), "base": base,
+                    "depth": depth, "size": written["size_bytes"]}
+        if self.copy_engine.verify == "full":
+            h = hasher_for(written["checksum"])
+            with open_location(location) as f:
+                for block in iter_blocks(f):
+                    h.update(block)
+            if h.checksum() != written["checksum"]:
+                raise ChecksumMismatchError(f"Checksum mismatch: {src} -> {location['path']}")
+        self.signatures.put(written["checksum"], written["signature"])
+        return {"success": True, "source": str(src.absolute()), "destination": str((dest / rel).absolute()),
+                "size_bytes": written["size_bytes"], "size_mb": round(written["size_bytes"] / 1048576, 2),
+                "mtime_ns": written["mtime_ns"], "checksum": written["checksum"], "stored_bytes": written["stored_bytes"],
+                "location": location, "backed_up_at": datetime.now().isoformat(sep=' ')}
+
+    def _chunk_file(self, src: Path, logical_dest: Path) -> Dict:
+        stored = self.chunk_store.store_file(src)
+        return {"success": True, "source": str(src.absolute()), "destination": str(logical_dest.absolute()),
+                "size_bytes": stored["size_bytes"], "size_mb": round(stored["size_bytes"] / 1048576, 2),
+                "mtime_ns": stored["mtime_ns"], "checksum": stored["checksum"], "stored_bytes": stored["stored_bytes"],
+                "location": {"type": "chunks", "store": str(self.chunk_store.root.absolute()), "chunks": stored["chunks"]},
+                "backed_up_at": datetime.now().isoformat(sep=' ')}
+
     def restore_file(self, backup_file: str, destination: str, verify_checksum: bool = True) -> Dict:
         """Restore a file from backup"""
         try:
             src = Path(backup_file)
-            if not src.exists():
+            entry = None
+            if not src.exists() or verify_checksum:
+                entry = self.catalog.find_file(src)
+                if entry is None:
+                    manifest = SnapshotManifest.find(src, self.backup_base_path)
+                    entry = (manifest.entry_for(src) if manifest else None) or find_member(src)
+            if entry is None and not src.exists():
                 raise FileNotFoundError(f"Backup not found: {backup_file}")
 
             dest = Path(destination)
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            checksum = self._calculate_checksum(src) if verify_checksum else None
-            shutil.copy2(src, dest)
-
-            if verify_checksum and checksum != self._calculate_checksum(dest):
-                raise Exception("Checksum mismatch!")
-
-            return {"success": True, "backup_file": str(src.absolute()), "destination": str(dest.absolute()),
+            if entry:
+                checksum = self._restore_entry(entry, dest, verify_checksum)
+            else:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                checksum = self.copy_engine.copy(src, dest, hash_data=verify_checksum)["checksum"]
+            return {"success": True, "backup_file": str(Path(backup_file).absolute()), "destination": str(dest.absolute()),
                     "checksum": checksum, "restored_at": datetime.now().isoformat(sep=' ')}
         except Exception as e:
             self.logger.error(f"Restore error: {e}")
             return {"success": False, "backup_file": backup_file, "error": str(e)}
 
+    def _restore_entry(self, entry: Dict, dest: Path, verify_checksum: bool = True) -> str:
+        """Write one manifest entry to dest, checked against its stored checksum while it is copied.
+
+        Stored files that were offloaded are fetched back from the bucket, and a pack file or
+        archive with a parity file gets its damaged blocks rebuilt; then the copy is tried again.
+        """
+        location = entry["location"]
+        try:
+            self.tiers.touch([location])
+            return self._copy_entry(entry, dest, verify_checksum)
+        except FileNotFoundError:
+            if not self.tiers.fetch_missing([location]):
+                raise
+            return self._copy_entry(entry, dest, verify_checksum)
+        except Exception as e:
+            if location["type"] not in ("pack", "archive") or not parity_path(location["path"]).is_file():
+                raise
+            repaired = repair_file(location["path"])
+            if not repaired["success"]:
+                raise
+            if repaired["repaired_blocks"]:
+                self.logger.warning(f"Repaired {repaired['repaired_blocks']} damaged blocks of {location['path']}: {e}")
+            return self._copy_entry(entry, dest, verify_checksum)
+
+    def _copy_entry(self, entry: Dict, dest: Path, verify_checksum: bool) -> str:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        expected = entry["checksum"] if verify_checksum else None
+        if entry["location"]["type"] != "file":
+            with open_location(entry["location"]) as fin:
+                return self.copy_engine.copy_stream(fin, dest, entry["size"], verify_checksum,
+                                                    expected_checksum=expected, mtime_ns=entry["mtime_ns"])["checksum"]
+        return self.copy_engine.copy(location_path(entry["location"]), dest, hash_data=verify_checksum,
+                                     expected_checksum=expected)["checksum"]
+
+    def restore_snapshot(self, snapshot_path: str, destination: str, include: Optional[List[str]] = None,
+                         verify_checksum: bool = True, workers: Optional[int] = None,
+                         progress_callback: Optional[Callable] = None) -> Dict:
+        """Restore a whole backup, or its files matching the include glob patterns, into a folder.
+
+        File list and checksums come from the catalog (or the snapshot manifest), so nothing in the
+        backup is walked or hashed up front. Files are restored in storage order on a worker pool
+        and every copy is checked against the checksum recorded at backup time.
+        """
+        try:
+            folder = Path(snapshot_path)
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            entries = self.catalog.snapshot_entries(folder)
+            if entries is None:
+                manifest = SnapshotManifest.load(folder)
+                if manifest is None:
+                    raise FileNotFoundError(f"Backup not found: {snapshot_path}")
+                entries = manifest.entries
+            items = sorted(((rel, e) for rel, e in entries.items() if not include or any(fnmatch(rel, p) for p in include)),
+                           key=lambda item: _storage_order(item[1]["location"]))
+            if self.catalog.snapshot_tier(folder) == "remote":
+                self.tiers.fetch_missing(e["location"] for _, e in items)
+            root = Path(destination).absolute()
+            results = {"snapshot": str(folder.absolute()), "destination": str(root), "total_files": len(items),
+                       "restored": 0, "failed": 0, "total_size_mb": 0.0, "errors": []}
+
+            def restore_one(item) -> Dict:
+                rel, entry = item
+                try:
+                    dest = Path(os.path.normpath(root / rel))
+                    if root not in dest.parents:
+                        raise ValueError(f"Path escapes the destination: {rel}")
+                    self._restore_entry(entry, dest, verify_checksum)
+                    return {"success": True, "rel_path": rel, "size_bytes": entry["size"]}
+                except Exception as e:
+                    self.logger.error(f"Restore error {rel}: {e}")
+                    return {"success": False, "rel_path": rel, "error": str(e)}
+
+            def on_done(count: int, item, result: Dict):
+                if progress_callback:
+                    progress_callback(count, len(items), item[0])
+
+            outcomes = run_bounded(items, restore_one, workers or settings.RESTORE_WORKERS,
+                                   settings.BACKUP_MAX_INFLIGHT_MB * 1048576, lambda item: item[1]["size"], on_done)
+            for result in outcomes:
+                if result["success"]:
+                    results["restored"] += 1
+                    results["total_size_mb"] += result["size_bytes"] / 1048576
+                else:
+                    results["failed"] += 1
+                    results["errors"].append(result)
+            results["success"] = results["failed"] == 0
+            results["total_size_mb"] = round(results["total_size_mb"], 2)
+            self.logger.info(f"Restored {results['restored']} of {len(items)} files from {folder} to {root}")
+            return results
+        except Exception as e:
+            self.logger.error(f"Restore error: {e}")
+            return {"success": False, "snapshot": snapshot_path, "error": str(e)}
+
     def list_backups(self, backup_date: Optional[str] = None) -> List[Dict]:
-        """List available backups"""
+        """List available backups from the catalog"""
         try:
-            backups = []
-            for folder in self.backup_base_path.iterdir():
-                if not folder.is_dir() or (backup_date and not folder.name.startswith(backup_date)):
-                    continue
-                files = list(folder.rglob("*"))
-                size = sum(f.stat().st_size for f in files if f.is_file())
-                backups.append({"path": str(folder.absolute()), "name": folder.name,
-                               "file_count": sum(1 for f in files if f.is_file()),
-                               "size_bytes": size, "size_mb": round(size / 1048576, 2),
-                               "created": datetime.fromtimestamp(folder.stat().st_ctime).isoformat(sep=' ')})
-            return sorted(backups, key=lambda x: x["created"], reverse=True)
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            return self.catalog.list_snapshots(backup_date)
         except Exception as e:
             self.logger.error(f"List backups error: {e}")
             return []
 
+    def list_backup_files(self, backup_path: str, pattern: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Files inside one backup, as paths restore_file accepts"""
+        try:
+            folder = Path(backup_path)
+            return [dict(f, path=str((folder / f["rel_path"]).absolute()), size_mb=round(f["size_bytes"] / 1048576, 2))
+                    for f in self.catalog.list_files(folder, pattern, limit)]
+        except Exception as e:
+            self.logger.error(f"List backup files error: {e}")
+            return []
+
+    def rebuild_catalog(self) -> Dict:
+        """Rescan existing backup folders into the catalog"""
+        try:
+            result = self.catalog.rebuild(self.backup_base_path)
+            self.logger.info(f"Catalog rebuilt: {result['snapshots']} snapshots")
+            return result
+        except Exception as e:
+            self.logger.error(f"Catalog rebuild error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def get_throttle(self) -> Dict:
+        """Current I/O limits of backup and restore reads"""
+        return throttle.status()
+
+    def set_throttle(self, mbps: Optional[float] = None, iops: Optional[int] = None,
+                     adaptive: Optional[bool] = None) -> Dict:
+        """Change the I/O limits of running and future backups and restores (0 = unlimited)"""
+        throttle.configure(mbps, iops, adaptive)
+        limits = throttle.status()
+        self.logger.info(f"I/O limits: {limits['mbps'] or 'unlimited'} MB/s, {limits['iops'] or 'unlimited'} IOPS, "
+                         f"adaptive={limits['adaptive']}")
+        return limits
+
+    @staticmethod
+    def _file_size(file_path: str) -> int:
+        try:
+            return Path(file_path).stat().st_size
+        except OSError:
+            return 0
+
     def _calculate_checksum(self, file_path: Path) -> str:
-        """Calculate MD5 checksum"""
-        h = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                h.update(chunk)
-        return h.hexdigest()
+        """Calculate the checksum of a file with the configured algorithm"""
+        return self.copy_engine.file_checksum(file_path)
 
     def delete_backup(self, backup_path: str) -> Dict:
-        """Delete a backup folder"""
+        """Delete a backup folder.
+
+        Data that other snapshots still use is kept for them; the folder disappears at once and its
+        disk space is reclaimed in the background.
+        """
         try:
             folder = Path(backup_path)
             if not folder.exists():
                 raise FileNotFoundError(f"Not found: {backup_path}")
             if self.backup_base_path not in folder.parents:
                 raise ValueError("Cannot delete outside backup directory")
-            shutil.rmtree(folder)
+            self._prune([folder])
             return {"success": True, "deleted_path": backup_path, "deleted_at": datetime.now().isoformat(sep=' ')}
         except Exception as e:
             self.logger.error(f"Delete error: {e}")
             return {"success": False, "path": backup_path, "error": str(e)}
+
+    def apply_retention(self, keep_last: Optional[int] = None, keep_daily: Optional[int] = None,
+                        keep_weekly: Optional[int] = None, keep_monthly: Optional[int] = None,
+                        max_total_gb: Optional[float] = None, dry_run: bool = False) -> Dict:
+        """Prune the snapshots a retention policy no longer keeps (settings fill omitted limits).
+
+        Snapshots are chosen from the catalog, see plan_retention; max_total_gb caps the data all
+        kept snapshots need (0 = no cap). With dry_run nothing is deleted.
+        """
+        try:
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            max_gb = settings.MAX_BACKUP_SIZE_GB if max_total_gb is None else max_total_gb
+            max_bytes = int(max_gb * 1073741824)
+            objects = self.catalog.snapshot_objects() if max_bytes and self.catalog.stored_bytes() > max_bytes else None
+            snapshots = self.catalog.list_snapshots()
+            plan = plan_retention(snapshots,
+                                  settings.RETENTION_KEEP_LAST if keep_last is None else keep_last,
+                                  settings.RETENTION_KEEP_DAILY if keep_daily is None else keep_daily,
+                                  settings.RETENTION_KEEP_WEEKLY if keep_weekly is None else keep_weekly,
+                                  settings.RETENTION_KEEP_MONTHLY if keep_monthly is None else keep_monthly,
+                                  max_bytes, objects)
+            if not dry_run:
+                self._prune([Path(s["path"]) for s in plan])
+                self.logger.info(f"Retention pruned {len(plan)} of {len(snapshots)} snapshots")
+            return {"success": True, "dry_run": dry_run, "kept": len(snapshots) - len(plan),
+                    "pruned": [{k: s[k] for k in ("path", "name", "created", "size_mb", "reason")} for s in plan],
+                    "stored_mb": round(self.catalog.stored_bytes() / 1048576, 2)}
+        except Exception as e:
+            self.logger.error(f"Retention error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _prune(self, folders: List[Path]):
+        if self._running_jobs:
+            raise RuntimeError("Cannot delete backups while a backup is running")
+        if not self.catalog.is_built():
+            self.rebuild_catalog()
+        for folder in folders:
+            self.pruner.prune(folder)
+        if folders:
+            self.pruner.purge_in_background(lambda: bool(self._running_jobs))
+
+    def replicate(self, backup_path: Optional[str] = None, progress_callback: Optional[Callable] = None) -> Dict:
+        """Upload one backup, or the whole backup folder, to the S3/R2 bucket from settings.
+
+        A backup goes with the stored data it shares with other backups (chunks, packs, earlier
+        incremental copies), and manifests go only once everything else is there, so the bucket never
+        lists a backup it cannot restore. Files already in the bucket are skipped; see S3Replicator.
+        """
+        try:
+            if not settings.R2_BUCKET_NAME:
+                raise ValueError("No bucket configured (R2_BUCKET_NAME)")
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            if backup_path:
+                folder = Path(backup_path).absolute()
+                if self.backup_base_path.absolute() not in folder.parents or not folder.is_dir():
+                    raise ValueError(f"Not a backup in {self.backup_base_path}: {backup_path}")
+                files = set(replication_files(folder))
+                files.update(Path(p) for p in self.catalog.snapshot_objects(folder).get(str(folder), {}) if os.path.isfile(p))
+            else:
+                files = replication_files(self.backup_base_path, (TRASH_DIR, JOBS_DIR, SIGNATURES_DIR),
+                                          (CATALOG_NAME, SCRUB_STATE_NAME, REPLICATION_STATE_NAME))
+            replicator = S3Replicator(self.backup_base_path, s3_client(), settings.R2_BUCKET_NAME, settings.REPLICATION_PREFIX,
+                                      settings.REPLICATION_WORKERS, settings.REPLICATION_PART_MB * 1048576,
+                                      settings.REPLICATION_MBPS)
+            return replicator.replicate(sorted(p for p in files if p.name != MANIFEST_NAME), progress_callback,
+                                        sorted(p for p in files if p.name == MANIFEST_NAME))
+        except Exception as e:
+            self.logger.error(f"Replication error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def offload_backups(self, older_than_days: Optional[float] = None, dry_run: bool = False) -> Dict:
+        """Keep backups older than older_than_days (default TIER_LOCAL_DAYS) in the bucket only.
+
+        Each one is replicated first and offloaded only if that succeeded, see TieredStore. The
+        newest backup of every source stays local, as the next incremental backup builds on it.
+        """
+        try:
+            days = settings.TIER_LOCAL_DAYS if older_than_days is None else older_than_days
+            if days <= 0:
+                raise ValueError("No offload age set (TIER_LOCAL_DAYS)")
+            if not settings.R2_BUCKET_NAME:
+                raise ValueError("No bucket configured (R2_BUCKET_NAME)")
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            cutoff = (datetime.now() - timedelta(days=days)).isoformat(sep=' ')
+            snapshots = self.catalog.list_snapshots()
+            newest = {}
+            for s in snapshots:
+                newest.setdefault(s["source"], s["path"])
+            plan = [s for s in snapshots if s["tier"] == "local" and s["created"] < cutoff
+                    and s["path"] != newest[s["source"]] and (Path(s["path"]) / MANIFEST_NAME).is_file()]
+            results = {"success": True, "dry_run": dry_run, "offloaded": [], "freed_mb": 0.0, "errors": []}
+            for s in plan:
+                if dry_run:
+                    results["offloaded"].append(s["path"])
+                    continue
+                if self._running_jobs:
+                    raise RuntimeError("Cannot offload backups while a backup is running")
+                replicated = self.replicate(s["path"])
+                if not replicated["success"]:
+                    results["errors"].append({"path": s["path"], "error": replicated.get("error") or "Replication failed"})
+                    continue
+                offloaded = self.tiers.offload(Path(s["path"]))
+                results["offloaded"].append(s["path"])
+                results["freed_mb"] += offloaded["freed_bytes"] / 1048576
+            results["success"] = not results["errors"]
+            results["freed_mb"] = round(results["freed_mb"], 2)
+            results.update(self.tiers.status())
+            return results
+        except Exception as e:
+            self.logger.error(f"Offload error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def start_scrub(self, max_minutes: Optional[float] = None, max_gb: Optional[float] = None,
+                    restart: bool = False, wait: bool = False) -> Dict:
+        """Verify stored data against its checksums, continuing the last pass (see Scrubber).
+
+        max_minutes (default SCRUB_SLICE_MINUTES, 0 = no limit) and max_gb bound this run; the
+        scrub runs in the background unless wait is set.
+        """
+        try:
+            if not self.catalog.is_built():
+                self.rebuild_catalog()
+            minutes = settings.SCRUB_SLICE_MINUTES if max_minutes is None else max_minutes
+            max_seconds, max_bytes = minutes * 60 or None, int((max_gb or 0) * 1073741824) or None
+            if wait:
+                return self.scrubber.run(max_seconds, max_bytes, restart)
+            if not self.scrubber.start(max_seconds, max_bytes, restart):
+                raise RuntimeError("A scrub is already running")
+            return self.scrubber.status()
+        except Exception as e:
+            self.logger.error(f"Scrub error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def scrub_status(self) -> Dict:
+        """Progress of the current scrub pass and the bad files it has found"""
+        return self.scrubber.status()
+
+    def stop_scrub(self) -> Dict:
+        """Stop a running scrub after its current batch; the next one continues from there"""
+        self.scrubber.stop()
+        return {"success": True, "running": self.scrubber.running}
+
+
+def _parity_options() -> Optional[Dict]:
+    """ParityWriter arguments from settings, or None when parity is off"""
+    if not settings.PARITY_PERCENT:
+        return None
+    return {"percent": settings.PARITY_PERCENT, "block_size": settings.PARITY_BLOCK_KB * 1024,
+            "data_blocks": settings.PARITY_STRIPE_BLOCKS}
+
+
+def _excluded(path: str, patterns: List[str]) -> bool:
+    return any(Path(path).match(p) for p in patterns)
+
+
+def _storage_order(location: Dict) -> tuple:
+    """Sort key that reads archives, packs and copies front to back"""
+    return location.get("path") or location.get("store", ""), location.get("offset", 0)
@@ -0,0 +1,400 @@
+"""SQLite catalog of backup snapshots and the files they contain"""
+import os
+import json
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+from app.core.logger import app_logger
+from app.core.walker import scan_files
+from app.services.manifest import SnapshotManifest, location_objects
+
+CATALOG_NAME = ".catalog.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    source TEXT,
+    mode TEXT,
+    created TEXT NOT NULL,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    tier TEXT NOT NULL DEFAULT 'local'
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_name ON snapshots(name);
+CREATE INDEX IF NOT EXISTS idx_snapshots_created ON snapshots(created);
+CREATE TABLE IF NOT EXISTS files (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    rel_path TEXT NOT NULL,
+    source TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    checksum TEXT,
+    location TEXT,
+    PRIMARY KEY (snapshot_id, rel_path)
+);
+CREATE TABLE IF NOT EXISTS objects (path TEXT PRIMARY KEY, size INTEGER NOT NULL DEFAULT 0, remote INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS refs (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_refs_path ON refs(path);
+CREATE TABLE IF NOT EXISTS cache (path TEXT PRIMARY KEY, size INTEGER NOT NULL, used_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class BackupCatalog:
+    """Indexed metadata for every snapshot under a backup base folder.
+
+    Written as each backup completes so listing and lookups never need to walk backup trees.
+    ``refs`` records which stored files (copies, packs, deltas and their bases, chunks) each snapshot
+    needs and ``objects`` their sizes, so pruning finds the data it frees without a rescan.
+    Snapshots in the "remote" tier are kept in the replication bucket; objects only they need are
+    marked ``remote`` and exist locally only while they are in the restore ``cache``.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.logger = app_logger
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _add_column(conn, "snapshots", "tier", "TEXT NOT NULL DEFAULT 'local'")
+            _add_column(conn, "objects", "remote", "INTEGER NOT NULL DEFAULT 0")
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'refs'").fetchone() is None:
+                self._index_refs(conn)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+
+    def is_built(self) -> bool:
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is not None
+
+    def record_manifest(self, manifest: SnapshotManifest, created: Optional[str] = None):
+        """Insert or replace a snapshot and all of its files"""
+        rows = [(rel, e.get("source"), e["size"], e.get("mtime_ns"), e.get("checksum"), json.dumps(e["location"]))
+                for rel, e in manifest.entries.items()]
+        with self._lock, self._connect() as conn:
+            snapshot_id = self._upsert_snapshot(conn, manifest.snapshot_path, manifest.source, manifest.mode,
+                                                created or manifest.created, len(rows), manifest.total_size, manifest.tier)
+            conn.execute("DELETE FROM files WHERE snapshot_id = ?", (snapshot_id,))
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", [(snapshot_id,) + r for r in rows])
+            self._record_refs(conn, snapshot_id, _entry_objects(manifest.entries.values()))
+            if manifest.tier == "local":
+                self._pin(conn, snapshot_id)
+
+    def record_folder(self, folder: Path):
+        """Catalog a folder without a manifest by scanning it once (no checksums)"""
+        folder = Path(folder)
+        root = str(folder.absolute())
+        rows = []
+        for entry in scan_files(root):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            rows.append((Path(os.path.relpath(entry.path, root)).as_posix(), None, st.st_size, st.st_mtime_ns, None,
+                         json.dumps({"type": "file", "path": entry.path})))
+        created = datetime.fromtimestamp(folder.stat().st_ctime).isoformat(sep=' ')
+        with self._lock, self._connect() as conn:
+            snapshot_id = self._upsert_snapshot(conn, folder, None, "legacy", created, len(rows), sum(r[2] for r in rows))
+            conn.execute("DELETE FROM files WHERE snapshot_id = ?", (snapshot_id,))
+            conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", [(snapshot_id,) + r for r in rows])
+            self._record_refs(conn, snapshot_id, {str((folder / r[0]).absolute()): r[2] for r in rows})
+
+    def _record_refs(self, conn: sqlite3.Connection, snapshot_id: int, objects: Dict[str, Optional[int]]):
+        """Replace a snapshot's refs; sizes of objects not seen before are taken from ``objects`` or stat"""
+        conn.execute("DELETE FROM refs WHERE snapshot_id = ?", (snapshot_id,))
+        conn.executemany("INSERT INTO refs VALUES (?, ?)", [(snapshot_id, p) for p in objects])
+        known = {r[0] for r in conn.execute("SELECT o.path FROM refs r JOIN objects o ON o.path = r.path"
+                                            " WHERE r.snapshot_id = ?", (snapshot_id,))}
+        conn.executemany("INSERT INTO objects (path, size) VALUES (?, ?)",
+                         [(p, _file_size(p) if size is None else size) for p, size in objects.items() if p not in known])
+
+    @staticmethod
+    def _pin(conn: sqlite3.Connection, snapshot_id: int):
+        """A local snapshot needs its objects on disk: they are no longer remote or evictable"""
+        conn.execute("DELETE FROM cache WHERE path IN (SELECT o.path FROM refs r JOIN objects o ON o.path = r.path"
+                     " WHERE r.snapshot_id = ? AND o.remote = 1)", (snapshot_id,))
+        conn.execute("UPDATE objects SET remote = 0 WHERE remote = 1 AND path IN (SELECT path FROM refs WHERE snapshot_id = ?)",
+                     (snapshot_id,))
+
+    def _index_refs(self, conn: sqlite3.Connection):
+        """Fill refs from the files of a catalog written before they were tracked"""
+        entries: Dict[int, List[Dict]] = {}
+        for row in conn.execute("SELECT snapshot_id, size, location FROM files"):
+            entries.setdefault(row["snapshot_id"], []).append({"size": row["size"], "location": json.loads(row["location"])})
+        for snapshot_id, files in entries.items():
+            self._record_refs(conn, snapshot_id, _entry_objects(files))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('refs', '1')")
+
+    def _upsert_snapshot(self, conn: sqlite3.Connection, path: Path, source: Optional[str], mode: str,
+                         created: str, file_count: int, size_bytes: int, tier: str = "local") -> int:
+        path = Path(path).absolute()
+        conn.execute("""INSERT INTO snapshots (path, name, source, mode, created, file_count, size_bytes, tier)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(path) DO UPDATE SET source=excluded.source, mode=excluded.mode,
+                        file_count=excluded.file_count, size_bytes=excluded.size_bytes, tier=excluded.tier""",
+                     (str(path), path.name, source, mode, created, file_count, size_bytes, tier))
+        return conn.execute("SELECT id FROM snapshots WHERE path = ?", (str(path),)).fetchone()["id"]
+
+    def remove_snapshot(self, path: Path) -> List[str]:
+        """Forget a snapshot; returns the stored files no other snapshot needs any more"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT id FROM snapshots WHERE path = ?", (str(Path(path).absolute()),)).fetchone()
+            if row is None:
+                return []
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS released (path TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM released")
+            conn.execute("INSERT INTO released SELECT path FROM refs WHERE snapshot_id = ?", (row["id"],))
+            conn.execute("DELETE FROM snapshots WHERE id = ?", (row["id"],))
+            orphans = [r[0] for r in conn.execute("SELECT path FROM released x WHERE NOT EXISTS"
+                                                  " (SELECT 1 FROM refs r WHERE r.path = x.path)")]
+            conn.executemany("DELETE FROM objects WHERE path = ?", [(p,) for p in orphans])
+        return orphans
+
+    def shared_objects(self, path: Path) -> Tuple[List[str], List[str]]:
+        """Stored files inside a snapshot folder that other snapshots need, and those snapshots"""
+        folder = str(Path(path).absolute())
+        prefix = folder.rstrip(os.sep) + os.sep
+        with self._connect() as conn:
+            rows = conn.execute("SELECT r.path, s.path AS snapshot FROM refs r JOIN snapshots s ON s.id = r.snapshot_id"
+                                " WHERE r.path >= ? AND r.path < ? AND s.path != ?",
+                                (prefix, prefix + "\uffff", folder)).fetchall()
+        return sorted({r["path"] for r in rows}), sorted({r["snapshot"] for r in rows})
+
+    def move_objects(self, moved: Dict[str, str]):
+        """Record that stored files were renamed (old path -> new path)"""
+        with self._lock, self._connect() as conn:
+            conn.executemany("UPDATE objects SET path = ? WHERE path = ?", [(new, old) for old, new in moved.items()])
+            conn.executemany("UPDATE cache SET path = ? WHERE path = ?", [(new, old) for old, new in moved.items()])
+
+    def unreferenced(self, paths: Iterable[str]) -> List[str]:
+        """The given stored files that no snapshot needs"""
+        with self._connect() as conn:
+            return [p for p in paths if conn.execute("SELECT 1 FROM refs WHERE path = ? LIMIT 1", (p,)).fetchone() is None]
+
+    def files_after(self, position: int, limit: int) -> List[Dict]:
+        """Files in catalog order after a position (``pos``), so a long scan can stop and resume"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT f.rowid AS pos, s.path AS snapshot, s.tier, f.rel_path, f.size, f.checksum, f.location"
+                                " FROM files f JOIN snapshots s ON s.id = f.snapshot_id WHERE f.rowid > ?"
+                                " ORDER BY f.rowid LIMIT ?", (position, limit)).fetchall()
+        return [dict(r, location=json.loads(r["location"])) for r in rows]
+
+    def objects_after(self, folder: Path, after: str, limit: int) -> List[str]:
+        """Stored files under a folder in path order, after a given path"""
+        prefix = str(Path(folder).absolute()).rstrip(os.sep) + os.sep
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path FROM objects WHERE path > ? AND path >= ? AND path < ? AND remote = 0"
+                                " ORDER BY path LIMIT ?",
+                                (after, prefix, prefix + "\uffff", limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def files_using(self, stored_path: str, needle: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Files of the snapshots needing a stored file whose location contains ``needle`` (default: its path)"""
+        needle = needle or json.dumps(stored_path)[1:-1]
+        pattern = "%" + needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._connect() as conn:
+            rows = conn.execute("SELECT s.path AS snapshot, f.rel_path FROM refs r JOIN snapshots s ON s.id = r.snapshot_id"
+                                " JOIN files f ON f.snapshot_id = r.snapshot_id WHERE r.path = ? AND f.location LIKE ? ESCAPE '\\'"
+                                " LIMIT ?", (stored_path, pattern, limit)).fetchall()
+        return [{"snapshot": r["snapshot"], "rel_path": r["rel_path"]} for r in rows]
+
+    def set_tier(self, path: Path, tier: str) -> List[str]:
+        """Move a snapshot to the "local" or "remote" tier; returns the objects that became remote"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT id FROM snapshots WHERE path = ?", (str(Path(path).absolute()),)).fetchone()
+            if row is None:
+                return []
+            conn.execute("UPDATE snapshots SET tier = ? WHERE id = ?", (tier, row["id"]))
+            if tier == "local":
+                self._pin(conn, row["id"])
+                return []
+            return self._mark_remote(conn, row["id"])
+
+    @staticmethod
+    def _mark_remote(conn: sqlite3.Connection, snapshot_id: Optional[int] = None) -> List[str]:
+        """Mark the objects (of one snapshot, or all) that no local snapshot needs as remote"""
+        scope = "r.snapshot_id = ?" if snapshot_id is not None else "1"
+        rows = conn.execute(f"SELECT DISTINCT o.path FROM refs r JOIN objects o ON o.path = r.path WHERE {scope}"
+                            " AND o.remote = 0 AND NOT EXISTS (SELECT 1 FROM refs x JOIN snapshots s ON s.id = x.snapshot_id"
+                            " WHERE x.path = o.path AND s.tier = 'local')", () if snapshot_id is None else (snapshot_id,)).fetchall()
+        paths = [r[0] for r in rows]
+        conn.executemany("UPDATE objects SET remote = 1 WHERE path = ?", [(p,) for p in paths])
+        return paths
+
+    def snapshot_tier(self, path: Path) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT tier FROM snapshots WHERE path = ?", (str(Path(path).absolute()),)).fetchone()
+        return row["tier"] if row else None
+
+    def remote_objects(self, paths: Iterable[str]) -> List[str]:
+        """The given stored files that are kept in the replication bucket only"""
+        with self._connect() as conn:
+            return [p for p in paths if conn.execute("SELECT 1 FROM objects WHERE path = ? AND remote = 1", (p,)).fetchone()]
+
+    def cached_paths(self) -> List[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT path FROM cache")]
+
+    def cache_add(self, paths: Dict[str, int], used_at: float):
+        """Record remote objects fetched into the restore cache (path -> size), or that were read again"""
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", [(p, size, used_at) for p, size in paths.items()])
+
+    def cache_touch(self, paths: Iterable[str], used_at: float):
+        with self._lock, self._connect() as conn:
+            conn.executemany("UPDATE cache SET used_at = ? WHERE path = ?", [(used_at, p) for p in paths])
+
+    def cache_evict(self, max_bytes: int, keep: Iterable[str] = ()) -> List[str]:
+        """Forget the least recently used cache entries until the cache fits; returns their paths"""
+        keep, evicted = set(keep), []
+        with self._lock, self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            for r in conn.execute("SELECT path, size FROM cache ORDER BY used_at").fetchall():
+                if total <= max_bytes:
+                    break
+                if r["path"] not in keep:
+                    evicted.append(r["path"])
+                    total -= r["size"]
+            conn.executemany("DELETE FROM cache WHERE path = ?", [(p,) for p in evicted])
+        return evicted
+
+    def cache_bytes(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def stored_bytes(self) -> int:
+        """Bytes of every stored file some snapshot needs"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+
+    def snapshot_objects(self, path: Optional[Path] = None) -> Dict[str, Dict[str, int]]:
+        """Stored files and their sizes for every snapshot (or just one), keyed by snapshot path"""
+        result: Dict[str, Dict[str, int]] = {}
+        where, args = (" WHERE s.path = ?", (str(Path(path).absolute()),)) if path else ("", ())
+        with self._connect() as conn:
+            for r in conn.execute("SELECT s.path AS snapshot, r.path, o.size FROM refs r"
+                                  " JOIN snapshots s ON s.id = r.snapshot_id JOIN objects o ON o.path = r.path" + where, args):
+                result.setdefault(r["snapshot"], {})[r["path"]] = r["size"]
+        return result
+
+    def list_snapshots(self, name_prefix: Optional[str] = None) -> List[Dict]:
+        """Snapshots, newest first, optionally limited to names starting with a prefix"""
+        query = "SELECT path, name, source, mode, created, file_count, size_bytes, tier FROM snapshots"
+        params: tuple = ()
+        if name_prefix:
+            query += " WHERE name >= ? AND name < ?"
+            params = (name_prefix, name_prefix + "\uffff")
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created DESC", params).fetchall()
+        return [{"path": r["path"], "name": r["name"], "source": r["source"], "mode": r["mode"],
+                 "file_count": r["file_count"], "size_bytes": r["size_bytes"],
+                 "size_mb": round(r["size_bytes"] / 1048576, 2), "created": r["created"], "tier": r["tier"]} for r in rows]
+
+    def list_files(self, snapshot_path: Path, pattern: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Files of one snapshot, optionally only those whose path contains a pattern"""
+        query = ("SELECT f.rel_path, f.size, f.mtime_ns FROM files f JOIN snapshots s ON s.id = f.snapshot_id"
+                 " WHERE s.path = ?")
+        params: list = [str(Path(snapshot_path).absolute())]
+        if pattern:
+            query += " AND f.rel_path LIKE ? ESCAPE '\\'"
+            params.append("%" + pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY f.rel_path LIMIT ?", params + [limit]).fetchall()
+        return [{"rel_path": r["rel_path"], "size_bytes": r["size"], "mtime_ns": r["mtime_ns"]} for r in rows]
+
+    def snapshot_entries(self, snapshot_path: Path) -> Optional[Dict[str, Dict]]:
+        """Every file of a snapshot in manifest entry form, or None if the snapshot is not cataloged"""
+        with self._connect() as conn:
+            snapshot = conn.execute("SELECT id FROM snapshots WHERE path = ?", (str(Path(snapshot_path).absolute()),)).fetchone()
+            if snapshot is None:
+                return None
+            rows = conn.execute("SELECT * FROM files WHERE snapshot_id = ?", (snapshot["id"],)).fetchall()
+        return {r["rel_path"]: {"source": r["source"], "size": r["size"], "mtime_ns": r["mtime_ns"], "checksum": r["checksum"],
+                                "location": json.loads(r["location"])} for r in rows}
+
+    def find_file(self, file_path: Path) -> Optional[Dict]:
+        """Catalog entry for a path inside a snapshot, in manifest entry form"""
+        file_path = Path(file_path).absolute()
+        parents = [str(p) for p in file_path.parents]
+        with self._connect() as conn:
+            snapshot = conn.execute(f"SELECT id, path FROM snapshots WHERE path IN ({','.join('?' * len(parents))})"
+                                    " ORDER BY length(path) DESC LIMIT 1", parents).fetchone()
+            if snapshot is None:
+                return None
+            rel = file_path.relative_to(snapshot["path"]).as_posix()
+            row = conn.execute("SELECT * FROM files WHERE snapshot_id = ? AND rel_path = ?", (snapshot["id"], rel)).fetchone()
+        if row is None:
+            return None
+        return {"source": row["source"], "size": row["size"], "mtime_ns": row["mtime_ns"], "checksum": row["checksum"],
+                "location": json.loads(row["location"])}
+
+    def rebuild(self, backup_base_path: Path) -> Dict:
+        """Rescan every snapshot folder under the backup base once and mark the catalog built"""
+        count = 0
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM snapshots")
+            conn.execute("DELETE FROM objects")
+        for folder in sorted(Path(backup_base_path).iterdir()):
+            if not folder.is_dir() or folder.name.startswith("."):
+                continue
+            try:
+                manifest = SnapshotManifest.load(folder)
+                if manifest:
+                    self.record_manifest(manifest)
+                else:
+                    self.record_folder(folder)
+                count += 1
+            except Exception as e:
+                self.logger.warning(f"Catalog rebuild skipped {folder}: {e}")
+        with self._lock, self._connect() as conn:
+            self._mark_remote(conn)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', ?)", (datetime.now().isoformat(sep=' '),))
+        return {"success": True, "snapshots": count}
+
+
+def _entry_objects(entries: Iterable[Dict]) -> Dict[str, Optional[int]]:
+    """Stored files of manifest entries; plain copies are as large as the file, others unknown"""
+    objects: Dict[str, Optional[int]] = {}
+    for e in entries:
+        location = e["location"]
+        for p in location_objects(location):
+            objects.setdefault(p, e["size"] if location.get("type") == "file" else None)
+    return objects
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """Add a column to a table of a catalog written before it existed"""
+    if column not in {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+if __name__ == "__main__":
+    import sys
+    from app.core.config import settings
+
+    base = Path(sys.argv[1] if len(sys.argv) > 1 else settings.DEFAULT_BACKUP_PATH)
+    print(BackupCatalog(base / CATALOG_NAME).rebuild(base))
@@ -0,0 +1,160 @@
+"""Content-addressed, deduplicating chunk store"""
+import io
+import os
+import re
+import zlib
+import uuid
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from app.core.hashing import Hasher
+from app.core.throttle import throttle
+
+# Boundary candidates are newlines and bytes whose low six bits are zero (about 1 in 51 positions
+# for random data, and line ends for text). A candidate becomes a cut point when the CRC32 of the
+# window ending at it matches a mask, so boundaries depend only on local content and survive
+# insertions, while the scanning itself runs at C speed in the regex engine and zlib.
+_ANCHOR = re.compile(rb"[\x00\x0a\x40\x80\xc0]")
+_ANCHOR_DENSITY = 51
+_WINDOW = 32
+
+_RAW, _ZLIB = b"R", b"Z"
+
+
+class ChunkStore:
+    """Splits files into content-defined chunks and stores each unique chunk once under
+    ``chunks/<hh>/<sha256>``.
+
+    Chunks are immutable and published with an atomic rename, so any number of readers can
+    restore concurrently while a backup is writing new chunks.
+    """
+
+    def __init__(self, root: Path, min_size: int = 65536, avg_size: int = 262144, max_size: int = 1048576,
+                 compress: bool = True):
+        if not min_size < avg_size < max_size:
+            raise ValueError("Chunk sizes must satisfy min < avg < max")
+        self.root = Path(root)
+        self.chunks_path = self.root / "chunks"
+        self.min_size, self.avg_size, self.max_size = min_size, avg_size, max_size
+        self.compress = compress
+        bits = max(((avg_size - min_size) // _ANCHOR_DENSITY).bit_length() - 1, 2)
+        # Normalized chunking: harder to cut before the average size, easier after it
+        self._mask_small, self._mask_large = (1 << (bits + 1)) - 1, (1 << (bits - 1)) - 1
+
+    def chunk_path(self, digest: str) -> Path:
+        return self.chunks_path / digest[:2] / digest
+
+    def has_chunk(self, digest: str) -> bool:
+        return self.chunk_path(digest).exists()
+
+    def _cut(self, data: bytes, start: int, end: int) -> int:
+        """Return the offset where the chunk starting at ``start`` ends"""
+        if end - start <= self.min_size:
+            return end
+        limit = start + min(end - start, self.max_size)
+        normal = start + self.avg_size
+        for match in _ANCHOR.finditer(data, start + self.min_size, limit):
+            i = match.end()
+            mask = self._mask_small if i < normal else self._mask_large
+            if not zlib.crc32(data[i - _WINDOW:i]) & mask:
+                return i
+        return limit
+
+    def split(self, stream: BinaryIO, read_size: int = 8388608) -> Iterator[bytes]:
+        """Yield the content-defined chunks of a stream"""
+        buf = b""
+        eof = False
+        while True:
+            if not eof and len(buf) < self.max_size:
+                data = throttle.read(stream, read_size)
+                eof = not data
+                buf += data
+                continue
+            if not buf:
+                return
+            pos = 0
+            while len(buf) - pos >= self.max_size or (eof and pos < len(buf)):
+                cut = self._cut(buf, pos, len(buf))
+                yield buf[pos:cut]
+                pos = cut
+            buf = buf[pos:]
+
+    def put_chunk(self, data: bytes) -> Dict:
+        """Store a chunk if it is not present yet; returns its digest and the bytes written"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if path.exists():
+            return {"digest": digest, "written": 0}
+        payload = _RAW + data
+        if self.compress:
+            packed = zlib.compress(data, 1)
+            if len(packed) < len(data):
+                payload = _ZLIB + packed
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{digest}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+        return {"digest": digest, "written": len(payload)}
+
+    def get_chunk(self, digest: str) -> bytes:
+        """Read and verify one chunk"""
+        payload = self.chunk_path(digest).read_bytes()
+        data = zlib.decompress(payload[1:]) if payload[:1] == _ZLIB else payload[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise IOError(f"Corrupt chunk: {digest}")
+        return data
+
+    def store_file(self, file_path: Path) -> Dict:
+        """Chunk a file into the store; returns its chunk list, checksum and dedup stats"""
+        file_path = Path(file_path)
+        st = file_path.stat()
+        h = Hasher()
+        chunks, size, written, new = [], 0, 0, 0
+        with open(file_path, "rb") as f:
+            for data in self.split(f):
+                h.update(data)
+                size += len(data)
+                stored = self.put_chunk(data)
+                chunks.append(stored["digest"])
+                if stored["written"]:
+                    written += stored["written"]
+                    new += 1
+        return {"chunks": chunks, "checksum": h.checksum(), "size_bytes": size, "mtime_ns": st.st_mtime_ns,
+                "stored_bytes": written, "new_chunks": new}
+
+    def open(self, chunks: List[str]) -> BinaryIO:
+        """Readable stream over a file's chunks; each reader is independent of all others"""
+        return io.BufferedReader(_ChunkReader(self, chunks), buffer_size=self.max_size)
+
+    def stats(self) -> Dict:
+        count = size = 0
+        if self.chunks_path.exists():
+            for prefix in os.scandir(self.chunks_path):
+                for entry in os.scandir(prefix.path):
+                    count += 1
+                    size += entry.stat().st_size
+        return {"chunk_count": count, "stored_bytes": size, "stored_mb": round(size / 1048576, 2)}
+
+
+class _ChunkReader(io.RawIOBase):
+    """Raw stream that loads chunks lazily, one at a time"""
+
+    def __init__(self, store: ChunkStore, chunks: List[str]):
+        self._store = store
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not len(self._current):
+            digest: Optional[str] = next(self._chunks, None)
+            if digest is None:
+                return 0
+            self._current = memoryview(self._store.get_chunk(digest))
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
@@ -0,0 +1,215 @@
+"""Single-pass copy engine that hashes data while writing it"""
+import io
+import os
+import errno
+import random
+import shutil
+import threading
+import time
+import zlib
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Literal
+from app.core.hashing import Hasher, hasher_for
+from app.core.throttle import Throttle, throttle
+
+VerifyMode = Literal["none", "full", "sample"]
+VERIFY_MODES = ("none", "full", "sample")
+
+# Errors meaning "this kernel copy call is not supported for these files", so the next method is tried
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.EPERM,
+                errno.ENOTSOCK}
+_buffers = threading.local()
+
+
+def iter_blocks(f: BinaryIO, block_size: int = 1048576) -> Iterator[memoryview]:
+    """Yield the blocks of a stream read into one reusable buffer per thread.
+
+    Each block is a view that is only valid until the next block is read.
+    """
+    buf = getattr(_buffers, "buf", None)
+    if buf is None or len(buf) != block_size:
+        buf = _buffers.buf = memoryview(bytearray(block_size))
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            return
+        yield buf[:n]
+
+
+def throttled_blocks(f: BinaryIO, block_size: int = 1048576, limiter: Optional[Throttle] = None) -> Iterator[memoryview]:
+    """iter_blocks that waits for the I/O throttle (or another limiter) before every read"""
+    limiter = limiter or throttle
+    blocks = iter_blocks(f, block_size)
+    while True:
+        limiter.acquire(block_size)
+        start = time.perf_counter()
+        block = next(blocks, None)
+        if block is None:
+            return
+        limiter.observe(time.perf_counter() - start, len(block))
+        yield block
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, offset: int, size: int, dst_offset: int = 0) -> int:
+    """Copy up to size bytes from offset inside the kernel; returns the bytes copied (0 if unsupported)"""
+    copied = 0
+    for method in ("copy_file_range", "sendfile"):
+        if not hasattr(os, method):
+            continue
+        try:
+            if method == "sendfile":
+                os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+            while copied < size:
+                count = min(size - copied, 1 << 30)
+                if method == "copy_file_range":
+                    n = os.copy_file_range(src_fd, dst_fd, count, offset + copied, dst_offset + copied)
+                else:
+                    n = os.sendfile(dst_fd, src_fd, offset + copied, count)
+                if not n:
+                    break
+                copied += n
+            return copied
+        except OSError as e:
+            if copied or e.errno not in _UNSUPPORTED:
+                raise
+    return copied
+
+
+def copy_data(fin: BinaryIO, fout: BinaryIO, size: int, block_size: int = 1048576) -> int:
+    """Copy the rest of fin into an empty fout, in the kernel when both are plain files"""
+    copied = 0
+    try:
+        src_fd, dst_fd, offset = fin.fileno(), fout.fileno(), fin.tell()
+    except (OSError, io.UnsupportedOperation):
+        src_fd = None
+    if src_fd is not None and size:
+        # Under a throttle the kernel copies one block at a time so each block can wait its turn
+        step = block_size if throttle.active else size
+        while copied < size:
+            count = min(step, size - copied)
+            throttle.acquire(count)
+            start = time.perf_counter()
+            n = _kernel_copy(src_fd, dst_fd, offset + copied, count, copied)
+            throttle.observe(time.perf_counter() - start, n)
+            copied += n
+            if n < count:
+                break
+        if copied == size:
+            return copied
+        if copied:
+            fin.seek(offset + copied)
+            fout.seek(copied)
+    for block in throttled_blocks(fin, block_size):
+        fout.write(block)
+        copied += len(block)
+    return copied
+
+
+def copy_file(src: Path, dest: Path) -> Path:
+    """Drop-in for shutil.copy2 (file destinations only) that uses the kernel copy path"""
+    with open(src, "rb") as fin, open(dest, "wb") as fout:
+        copy_data(fin, fout, os.fstat(fin.fileno()).st_size)
+    shutil.copystat(src, dest)
+    return Path(dest)
+
+
+class ChecksumMismatchError(Exception):
+    """Raised when a copied file does not match the checksum of its source"""
+
+
+class CopyEngine:
+    """Streams each source block once, hashing it as it is written to the destination.
+
+    Verify policies:
+        none   - trust the write, no re-read
+        full   - re-read the whole destination and compare its checksum
+        sample - re-read a few random blocks of the destination and compare them
+    """
+
+    def __init__(self, block_size: int = 1048576, verify: VerifyMode = "full", sample_blocks: int = 8,
+                 algorithm: Optional[str] = None):
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode: {verify}")
+        self.block_size = block_size
+        self.verify = verify
+        self.sample_blocks = sample_blocks
+        self.algorithm = algorithm
+
+    def copy(self, src: Path, dest: Path, hash_data: bool = True, verify: Optional[VerifyMode] = None,
+             expected_checksum: Optional[str] = None) -> Dict:
+        """Copy src to dest in one read pass, returning the source checksum, size and mtime"""
+        src = Path(src)
+        st = src.stat()
+        with open(src, "rb") as fin:
+            return self.copy_stream(fin, dest, st.st_size, hash_data, verify, expected_checksum,
+                                    mtime_ns=st.st_mtime_ns, stat_from=src)
+
+    def copy_stream(self, fin: BinaryIO, dest: Path, size: int, hash_data: bool = True, verify: Optional[VerifyMode] = None,
+                    expected_checksum: Optional[str] = None, mtime_ns: Optional[int] = None,
+                    stat_from: Optional[Path] = None) -> Dict:
+        """Write a readable stream of known size to dest, hashing and verifying like copy()"""
+        dest = Path(dest)
+        verify = (verify or self.verify) if hash_data else "none"
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode: {verify}")
+
+        samples = self._pick_samples(size) if verify == "sample" else {}
+        h = None
+        if hash_data:
+            # Verify against a stored checksum with the algorithm it was made with
+            h = hasher_for(expected_checksum) if expected_checksum else Hasher(self.algorithm)
+        tmp = dest.with_name(f"{dest.name}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            with open(tmp, "wb") as fout:
+                if h is None:
+                    written = copy_data(fin, fout, size, self.block_size)
+                else:
+                    index = written = 0
+                    for block in throttled_blocks(fin, self.block_size):
+                        h.update(block)
+                        if index in samples:
+                            samples[index] = zlib.crc32(block)
+                        fout.write(block)
+                        written += len(block)
+                        index += 1
+            if stat_from is not None:
+                shutil.copystat(stat_from, tmp)
+            elif mtime_ns is not None:
+                os.utime(tmp, ns=(mtime_ns, mtime_ns))
+
+            # Check the temporary file, so a bad copy never replaces what dest already holds
+            checksum = h.checksum() if h else None
+            if expected_checksum and checksum != expected_checksum:
+                raise ChecksumMismatchError(f"Checksum mismatch: {stat_from or dest}")
+            if verify == "full" and checksum != self.file_checksum(tmp, h.algorithm):
+                raise ChecksumMismatchError(f"Checksum mismatch: {dest}")
+            if verify == "sample" and not self._verify_samples(tmp, samples):
+                raise ChecksumMismatchError(f"Sampled block mismatch: {dest}")
+            os.replace(tmp, dest)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return {"checksum": checksum, "size_bytes": written, "mtime_ns": mtime_ns}
+
+    def file_checksum(self, file_path: Path, algorithm: Optional[str] = None) -> str:
+        """Calculate the checksum of a file with the given or configured algorithm"""
+        h = Hasher(algorithm or self.algorithm)
+        with open(file_path, "rb") as f:
+            for block in throttled_blocks(f, self.block_size):
+                h.update(block)
+        return h.checksum()
+
+    def _pick_samples(self, size: int) -> Dict[int, Optional[int]]:
+        blocks = (size + self.block_size - 1) // self.block_size
+        if blocks <= self.sample_blocks:
+            return dict.fromkeys(range(blocks))
+        return dict.fromkeys(random.sample(range(blocks), self.sample_blocks))
+
+    def _verify_samples(self, dest: Path, samples: Dict[int, Optional[int]]) -> bool:
+        with open(dest, "rb") as f:
+            for index, crc in samples.items():
+                f.seek(index * self.block_size)
+                if zlib.crc32(f.read(self.block_size)) != crc:
+                    return False
+        return True
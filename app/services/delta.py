@@ -0,0 +1,328 @@
+"""Rsync-style delta versions of large files: block signatures, diffing and reconstruction"""
+import io
+import os
+import zlib
+import struct
+import bisect
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+from app.core.hashing import Hasher
+from app.core.throttle import throttle
+
+SIGNATURES_DIR = ".signatures"
+DELTAS_DIR = ".deltas"
+DELTA_SUFFIX = ".delta"
+
+_SIG_MAGIC, _DELTA_MAGIC = b"BWS1", b"BWD1"
+_SIG_HEADER, _SIG_BLOCK = struct.Struct(">4sIQ"), struct.Struct(">I16s")
+_DELTA_HEADER, _COPY, _DATA = struct.Struct(">4sIQ"), struct.Struct(">QQ"), struct.Struct(">I")
+_MOD = 65521
+_MAX_LITERAL = 1048576
+# After this many blocks in a row without a match, stop rolling through every byte and only test
+# block-aligned positions (a rolling search is retried every _RESYNC_EVERY blocks)
+_MISS_STREAK = 8
+_RESYNC_EVERY = 64
+
+
+class Signature:
+    """Weak (Adler-32) and strong (MD5) checksums of every ``block_size`` block of a file"""
+
+    def __init__(self, block_size: int, size: int = 0, blocks: Optional[List[tuple]] = None):
+        self.block_size = block_size
+        self.size = size
+        self.blocks = blocks if blocks is not None else []
+        self._weak: Optional[Dict[int, List[int]]] = None
+        self._carry = bytearray()
+
+    @classmethod
+    def of_stream(cls, stream: BinaryIO, block_size: int) -> "Signature":
+        sig = cls(block_size)
+        for data in iter(lambda: stream.read(8 * block_size), b""):
+            sig.update(data)
+        return sig.finish()
+
+    def update(self, data: bytes):
+        """Feed the next bytes of the file"""
+        self.size += len(data)
+        view = memoryview(data)
+        if self._carry:
+            take = self.block_size - len(self._carry)
+            self._carry += view[:take]
+            view = view[take:]
+            if len(self._carry) < self.block_size:
+                return
+            self._add(self._carry)
+            self._carry = bytearray()
+        while len(view) >= self.block_size:
+            self._add(view[:self.block_size])
+            view = view[self.block_size:]
+        self._carry += view
+
+    def finish(self) -> "Signature":
+        if self._carry:
+            self._add(self._carry)
+            self._carry = bytearray()
+        return self
+
+    def _add(self, block):
+        self.blocks.append((zlib.adler32(block), hashlib.md5(block).digest()))
+
+    @property
+    def weak(self) -> Dict[int, List[int]]:
+        if self._weak is None:
+            self._weak = {}
+            for i, (weak, _) in enumerate(self.blocks):
+                self._weak.setdefault(weak, []).append(i)
+        return self._weak
+
+    def to_bytes(self) -> bytes:
+        return _SIG_HEADER.pack(_SIG_MAGIC, self.block_size, self.size) + b"".join(_SIG_BLOCK.pack(*b) for b in self.blocks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Signature":
+        magic, block_size, size = _SIG_HEADER.unpack_from(data)
+        if magic != _SIG_MAGIC:
+            raise ValueError("Not a signature file")
+        return cls(block_size, size, [b for b in _SIG_BLOCK.iter_unpack(data[_SIG_HEADER.size:])])
+
+
+class SignatureCache:
+    """Signatures of backed-up file versions under ``<backup base>/.signatures``, keyed by checksum"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, checksum: str, block_size: int) -> Path:
+        name = checksum.replace(":", "-")
+        return self.root / name.rpartition("-")[2][:2] / f"{name}-{block_size}"
+
+    def get(self, checksum: Optional[str], block_size: int) -> Optional[Signature]:
+        if not checksum:
+            return None
+        try:
+            return Signature.from_bytes(self.path(checksum, block_size).read_bytes())
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def put(self, checksum: Optional[str], sig: Signature):
+        if not checksum:
+            return
+        path = self.path(checksum, sig.block_size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(sig.to_bytes())
+        os.replace(tmp, path)
+
+
+def write_delta(src: Path, base: Signature, out_path: Path, max_literal_ratio: float = 0.5) -> Optional[Dict]:
+    """Write ``src`` as copy/data instructions against the file described by ``base``.
+
+    Returns the source checksum, size, mtime, the delta size and the signature of ``src`` (so the
+    new version never has to be read again to be diffed), or None if more than
+    ``max_literal_ratio`` of the file turned out to be new data, in which case a plain copy is
+    cheaper to store and restore.
+    """
+    block_size, count = base.block_size, len(base.blocks)
+    tail_size = base.size - (count - 1) * block_size if count else 0
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".part")
+    h, sig = Hasher(), Signature(block_size)
+    literal_total = 0
+    try:
+        with open(src, "rb") as f, open(tmp, "wb") as out:
+            st = os.fstat(f.fileno())
+            out.write(_DELTA_HEADER.pack(_DELTA_MAGIC, block_size, st.st_size))
+            buf, pos, lit, eof = bytearray(), 0, 0, False
+            expect, misses, run = 0, 0, None  # run: pending [base offset, length] copy
+
+            def flush_copy():
+                nonlocal run
+                if run:
+                    out.write(b"C" + _COPY.pack(*run))
+                    run = None
+
+            def flush_literal(end: int):
+                nonlocal lit, literal_total
+                while lit < end:
+                    n = min(end - lit, _MAX_LITERAL)
+                    flush_copy()
+                    out.write(b"D" + _DATA.pack(n))
+                    out.write(buf[lit:lit + n])
+                    lit += n
+                    literal_total += n
+
+            def emit_copy(index: int, length: int):
+                nonlocal run
+                offset = index * block_size
+                if run and run[0] + run[1] == offset:
+                    run[1] += length
+                else:
+                    flush_copy()
+                    run = [offset, length]
+
+            def match(window, weak: int) -> Optional[int]:
+                candidates = base.weak.get(weak)
+                if not candidates:
+                    return None
+                strong = hashlib.md5(window).digest()
+                if expect in candidates and base.blocks[expect][1] == strong:
+                    return expect
+                return next((i for i in candidates if base.blocks[i][1] == strong), None)
+
+            while True:
+                if not eof and len(buf) - pos < 2 * block_size:
+                    flush_literal(pos)
+                    del buf[:pos]
+                    pos = lit = 0
+                    data = throttle.read(f, max(8 * block_size, 8388608))
+                    if data:
+                        h.update(data)
+                        sig.update(data)
+                        buf += data
+                    else:
+                        eof = True
+                    continue
+                remaining = len(buf) - pos
+                if remaining < block_size:
+                    if remaining and remaining == tail_size and base.blocks[-1][1] == hashlib.md5(buf[pos:]).digest():
+                        flush_literal(pos)
+                        emit_copy(count - 1, remaining)
+                        pos = lit = len(buf)
+                    break
+
+                window = memoryview(buf)[pos:pos + block_size]
+                weak = zlib.adler32(window)
+                index = match(window, weak)
+                window.release()
+                if index is None and (misses < _MISS_STREAK or not misses % _RESYNC_EVERY):
+                    found = _roll(buf, pos, min(pos + block_size, len(buf) - block_size), block_size, weak, base.weak, match)
+                    if found is not None:
+                        pos, index = found
+                if index is not None:
+                    flush_literal(pos)
+                    emit_copy(index, block_size)
+                    pos = lit = pos + block_size
+                    expect, misses = index + 1, 0
+                else:
+                    pos += block_size
+                    misses += 1
+                    if literal_total + pos - lit > max_literal_ratio * st.st_size:
+                        return None
+            flush_literal(len(buf))
+            flush_copy()
+        if literal_total > max_literal_ratio * st.st_size:
+            return None
+        os.replace(tmp, out_path)
+        return {"checksum": h.checksum(), "size_bytes": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "stored_bytes": out_path.stat().st_size, "literal_bytes": literal_total, "signature": sig.finish()}
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _roll(buf: bytearray, pos: int, limit: int, block_size: int, weak: int, weak_table: Dict, match) -> Optional[tuple]:
+    """Slide the window from pos + 1 to limit one byte at a time; returns (position, block) of a match"""
+    a, b = weak & 0xffff, weak >> 16
+    for q in range(pos + 1, limit + 1):
+        out, new = buf[q - 1], buf[q + block_size - 1]
+        a = (a - out + new) % _MOD
+        b = (b - block_size * out + a - 1) % _MOD
+        if (b << 16) | a in weak_table:
+            index = match(memoryview(buf)[q:q + block_size], (b << 16) | a)
+            if index is not None:
+                return q, index
+    return None
+
+
+def open_delta(location: Dict, base_reader) -> BinaryIO:
+    """Stream a delta version; ``base_reader(location)`` returns a positional reader for its base"""
+    return io.BufferedReader(_DeltaReader(DeltaFile(location, base_reader)), buffer_size=1048576)
+
+
+class DeltaFile:
+    """Random access to a file version stored as a delta against its base"""
+
+    def __init__(self, location: Dict, base_reader):
+        self.path = Path(location["path"])
+        self.base = base_reader(location["base"])
+        self._f = open(self.path, "rb")
+        magic, self.block_size, self.size = _DELTA_HEADER.unpack(self._f.read(_DELTA_HEADER.size))
+        if magic != _DELTA_MAGIC:
+            raise ValueError(f"Not a delta file: {self.path}")
+        # Each op: (offset in this version, length, True for base bytes, offset in base or delta file)
+        self.ops, position = [], 0
+        while True:
+            kind = self._f.read(1)
+            if not kind:
+                break
+            if kind == b"C":
+                offset, length = _COPY.unpack(self._f.read(_COPY.size))
+                self.ops.append((position, length, True, offset))
+            elif kind == b"D":
+                (length,) = _DATA.unpack(self._f.read(_DATA.size))
+                self.ops.append((position, length, False, self._f.tell()))
+                self._f.seek(length, io.SEEK_CUR)
+            else:
+                raise IOError(f"Corrupt delta file: {self.path}")
+            position += length
+        if position != self.size:
+            raise IOError(f"Delta file ended early: {self.path}")
+        self._starts = [op[0] for op in self.ops]
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        parts = []
+        i = bisect.bisect_right(self._starts, offset) - 1
+        while size > 0 and 0 <= i < len(self.ops):
+            start, length, from_base, source = self.ops[i]
+            skip = offset - start
+            n = min(length - skip, size)
+            if from_base:
+                data = self.base.read_at(source + skip, n)
+            else:
+                self._f.seek(source + skip)
+                data = self._f.read(n)
+            if len(data) != n:
+                raise IOError(f"Delta base ended early: {self.path}")
+            parts.append(data)
+            offset, size, i = offset + n, size - n, i + 1
+        return b"".join(parts)
+
+    def close(self):
+        self._f.close()
+        self.base.close()
+
+
+class FileRange:
+    """Positional reads from a plain file"""
+
+    def __init__(self, path: Path):
+        self._f = open(path, "rb")
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        self._f.seek(offset)
+        return self._f.read(size)
+
+    def close(self):
+        self._f.close()
+
+
+class _DeltaReader(io.RawIOBase):
+    """Raw stream over a DeltaFile from start to end"""
+
+    def __init__(self, delta: DeltaFile):
+        self._delta = delta
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._delta.read_at(self._position, min(len(buffer), self._delta.size - self._position))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._delta.close()
+        super().close()
@@ -1,17 +1,20 @@
 """Duplicate file finder service"""
-import hashlib
 from pathlib import Path
 from typing import List, Dict, Optional, Callable, Literal
 from collections import defaultdict
 from datetime import datetime
 from app.core.logger import app_logger
+from app.core.hashing import Hasher
+from app.core.walker import scan_files
+from app.services.copy_engine import iter_blocks
 
 
 class DuplicateFinderService:
     """Service for finding and managing duplicate files"""
 
-    def __init__(self):
+    def __init__(self, algorithm: Optional[str] = None):
         self.logger = app_logger
+        self.algorithm = algorithm
 
     def scan_for_duplicates(self, scan_paths: List[str], comparison_method: Literal["hash", "size_name", "quick"] = "hash",
                             min_file_size: int = 0, file_extensions: Optional[List[str]] = None,
@@ -44,18 +47,17 @@ class DuplicateFinderService:
 
     def _collect_files(self, path: str, min_size: int, extensions: Optional[List[str]], recursive: bool) -> List[Path]:
         files = []
+        extensions = {e.lower() for e in extensions} if extensions else None
         try:
-            for f in Path(path).glob("**/*" if recursive else "*"):
-                if not f.is_file():
+            for entry in scan_files(path, recursive):
+                if extensions and Path(entry.name).suffix.lower() not in extensions:
                     continue
                 try:
-                    if f.stat().st_size < min_size:
+                    if entry.stat().st_size < min_size:
                         continue
-                except:
+                except OSError:
                     continue
-                if extensions and f.suffix.lower() not in [e.lower() for e in extensions]:
-                    continue
-                files.append(f)
+                files.append(Path(entry.path))
         except Exception as e:
             self.logger.warning(f"Collect error {path}: {e}")
         return files
@@ -117,11 +119,11 @@ class DuplicateFinderService:
         return self._find_by_hash(potential, progress_callback)
 
     def _calculate_hash(self, file_path: Path) -> str:
-        h = hashlib.md5()
+        h = Hasher(self.algorithm)
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                h.update(chunk)
-        return h.hexdigest()
+            for block in iter_blocks(f):
+                h.update(block)
+        return h.checksum()
 
     def delete_duplicates(self, group: Dict, keep_index: int = 0) -> Dict:
         """Delete duplicate files, keeping one"""
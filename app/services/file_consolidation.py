@@ -5,6 +5,7 @@ from pathlib import Path
 from typing import List, Optional, Dict, Callable, Literal
 from datetime import datetime
 from app.core.logger import app_logger
+from app.services.copy_engine import copy_file
 
 
 class FileConsolidationService:
@@ -54,9 +55,9 @@ class FileConsolidationService:
 
                     final_path.parent.mkdir(parents=True, exist_ok=True)
                     if operation == "copy":
-                        shutil.copy2(src, final_path)
+                        copy_file(src, final_path)
                     else:
-                        shutil.move(str(src), str(final_path))
+                        shutil.move(str(src), str(final_path), copy_function=copy_file)
 
                     results["successful"] += 1
                     if action == "rename":
@@ -0,0 +1,429 @@
+"""Persistent SQLite index of the files under chosen folders, for searches without a walk"""
+import os
+import re
+import stat
+import time
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.core.logger import app_logger
+from app.core.walker import parallel_scan_files, scan_files
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, indexed_at TEXT, file_count INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY, path TEXT NOT NULL, key TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ctime REAL NOT NULL,
+    UNIQUE (dir_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files(name_lower);
+CREATE INDEX IF NOT EXISTS idx_files_ext ON files(ext);
+CREATE INDEX IF NOT EXISTS idx_files_size ON files(size);
+CREATE INDEX IF NOT EXISTS idx_files_mtime ON files(mtime);
+"""
+_TRIGRAMS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS name_trigrams USING fts5(
+    name, content='files', content_rowid='id', tokenize='trigram', detail='none');
+CREATE TRIGGER IF NOT EXISTS files_trigrams_ai AFTER INSERT ON files BEGIN
+    INSERT INTO name_trigrams (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_trigrams_ad AFTER DELETE ON files BEGIN
+    INSERT INTO name_trigrams (name_trigrams, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+_BATCH = 10000
+
+
+class FileIndex:
+    """Name, folder, size and dates of every file under the indexed roots.
+
+    Folder paths are stored once in ``dirs``, next to the ``os.path.normcase`` key folders are
+    looked up and scoped by (so on Windows a folder typed in another case still matches); ``files`` keeps the lower-cased name and extension so
+    case-insensitive patterns, extension, size and date filters are answered from B-tree indexes
+    (a pattern with a fixed start such as ``report_*`` is a range scan). Patterns without one, such
+    as ``*report*2024*``, go through ``name_trigrams``, an FTS5 trigram index of the names: the
+    posting lists of the trigrams in the pattern's literal runs are intersected, and only those
+    candidates are matched against the pattern. Indexing a root replaces its rows in one
+    transaction, so searches see the old contents until the new ones are complete.
+
+    Everything lives on disk. Memory is bounded by ``cache_mb`` of SQLite page cache per
+    connection plus the walk's current folder, whatever the number of names; status() reports
+    the bound and the size of the tables and of the trigram index. Nothing is written to disk
+    until a root is indexed.
+    """
+
+    def __init__(self, db_path: Path, cache_mb: int = 64):
+        self.db_path = Path(db_path)
+        self.cache_mb = cache_mb
+        self.logger = app_logger
+        self._lock = threading.Lock()
+        self._ready = False
+        self.trigrams = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self._ready:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA cache_size = -{self.cache_mb * 1024}")
+            conn.execute("PRAGMA recursive_triggers = ON")  # INSERT OR REPLACE removes trigrams too
+            if not self._ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._add_dir_keys(conn)
+                self.trigrams = self._create_trigrams(conn)
+                self._ready = True
+            with conn:
+                yield conn
+
+    @staticmethod
+    def _add_dir_keys(conn: sqlite3.Connection):
+        """Give folders of an index made before lookups were case-normalized their key"""
+        if "key" not in {r[1] for r in conn.execute("PRAGMA table_info(dirs)")}:
+            with conn:
+                conn.execute("ALTER TABLE dirs ADD COLUMN key TEXT NOT NULL DEFAULT ''")
+                conn.executemany("UPDATE dirs SET key = ? WHERE id = ?",
+                                 [(os.path.normcase(path), i) for i, path in conn.execute("SELECT id, path FROM dirs").fetchall()])
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dirs_key ON dirs(key)")
+
+    def _create_trigrams(self, conn: sqlite3.Connection) -> bool:
+        """Create the trigram index (filled from ``files`` for an index made before it existed)"""
+        existed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'name_trigrams'").fetchone()
+        try:
+            conn.executescript(_TRIGRAMS)
+        except sqlite3.OperationalError as e:  # SQLite before 3.34 has no trigram tokenizer
+            self.logger.warning(f"File index without trigram search: {e}")
+            return False
+        if not existed and conn.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+            with conn:
+                conn.execute("INSERT INTO name_trigrams (name_trigrams) VALUES ('rebuild')")
+        return True
+
+    def roots(self) -> List[Dict]:
+        if not self.db_path.is_file():
+            return []
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute("SELECT path, indexed_at, file_count FROM roots ORDER BY path")]
+
+    def covering_root(self, path: str) -> Optional[str]:
+        """The indexed root a folder lies in, if any"""
+        return _root_of(os.path.abspath(path), [r["path"] for r in self.roots()])
+
+    def index_root(self, root: str, workers: int = 8) -> Dict:
+        """Walk a folder and replace everything the index holds under it.
+
+        A folder inside an indexed root is refreshed as part of that root; a folder containing
+        indexed roots takes their place, so roots never overlap and their file counts add up.
+        """
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Folder not found: {root}")
+        start, count = time.perf_counter(), 0
+        with self._lock, self._connect() as conn:
+            others = [r[0] for r in conn.execute("SELECT path FROM roots") if os.path.normcase(r[0]) != os.path.normcase(root)]
+            outer = _root_of(root, others)
+            removed = self._delete_under(conn, root)
+            folder, dir_id = None, None
+            batch = []
+            for entry in parallel_scan_files(root, workers):  # a folder's files come out together
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if os.path.dirname(entry.path) != folder:
+                    folder = os.path.dirname(entry.path)
+                    dir_id = conn.execute("INSERT INTO dirs (path, key) VALUES (?, ?)", (folder, os.path.normcase(folder))).lastrowid
+                batch.append(_row(dir_id, entry.name, st))
+                if len(batch) >= _BATCH:
+                    count += self._insert(conn, batch)
+                    batch = []
+            count += self._insert(conn, batch)
+            if outer:
+                conn.execute("UPDATE roots SET file_count = file_count + ? WHERE path = ?", (count - removed, outer))
+            else:
+                conn.executemany("DELETE FROM roots WHERE path = ?", [(r,) for r in others if _root_of(r, [root])])
+                conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?, ?)",
+                             (root, datetime.now().isoformat(sep=' '), count))
+        seconds = round(time.perf_counter() - start, 2)
+        self.logger.info(f"Indexed {count} files under {root}{f' (part of {outer})' if outer else ''} in {seconds} s")
+        return {"path": outer or root, "file_count": count, "seconds": seconds}
+
+    def reconcile(self, root: str, workers: int = 8) -> Dict:
+        """Bring an indexed folder up to date by comparing sizes and modification times with the disk.
+
+        Only rows that differ are written, so on an unchanged tree this costs a listing and a stat
+        per file. Folders that cannot be listed keep their rows.
+        """
+        root = os.path.abspath(root)
+        start = time.perf_counter()
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        failed: List[str] = []
+        with self._lock, self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id INTEGER PRIMARY KEY)")
+            folder, entries = None, []
+            for entry in parallel_scan_files(root, workers, on_error=lambda e: failed.append(e.filename)):
+                parent = os.path.dirname(entry.path)
+                if parent != folder:
+                    if folder is not None:
+                        self._sync_folder(conn, folder, entries, counts)
+                    folder, entries = parent, []
+                entries.append(entry)
+            if folder is not None:
+                self._sync_folder(conn, folder, entries, counts)
+            scope, params = _scope(root, True, "key")
+            gone = [(r["id"],) for r in conn.execute(f"SELECT id, path FROM dirs WHERE ({scope}) AND id NOT IN (SELECT id FROM seen)", params)
+                    if not any(r["path"] == f or r["path"].startswith(f.rstrip(os.sep) + os.sep) for f in failed)]
+            counts["removed"] += conn.executemany("DELETE FROM files WHERE dir_id = ?", gone).rowcount
+            conn.executemany("DELETE FROM dirs WHERE id = ?", gone)
+            conn.execute("DROP TABLE seen")
+            count = self._count(conn, root)
+            conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?, ?)", (root, datetime.now().isoformat(sep=' '), count))
+        seconds = round(time.perf_counter() - start, 2)
+        self.logger.info(f"Reconciled {root} in {seconds} s: {counts['added']} added, {counts['updated']} updated, "
+                         f"{counts['removed']} removed")
+        return dict(counts, path=root, file_count=count, seconds=seconds)
+
+    def _sync_folder(self, conn: sqlite3.Connection, folder: str, entries: List[os.DirEntry], counts: Dict):
+        """Write the files of one listed folder that differ from the index, and mark the folder seen"""
+        dir_id = self._dir_id(conn, folder)
+        conn.execute("INSERT OR IGNORE INTO seen (id) VALUES (?)", (dir_id,))
+        stored = {r[0]: (r[1], r[2]) for r in conn.execute("SELECT name, size, mtime FROM files WHERE dir_id = ?", (dir_id,))}
+        rows = []
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            old = stored.pop(entry.name, None)
+            if old != (st.st_size, st.st_mtime):
+                rows.append(_row(dir_id, entry.name, st))
+                counts["added" if old is None else "updated"] += 1
+        self._insert(conn, rows)
+        if stored:
+            conn.executemany("DELETE FROM files WHERE dir_id = ? AND name = ?", [(dir_id, n) for n in stored])
+            counts["removed"] += len(stored)
+
+    def refresh(self, paths: Iterable[str]) -> Dict:
+        """Re-read files and folders under the indexed roots from disk.
+
+        A file is added or updated, a folder has every file below it added or updated, and a path that
+        no longer exists is dropped along with anything the index holds below it. Paths outside the
+        indexed roots are ignored. All changes are written in one transaction.
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        with self._lock, self._connect() as conn:
+            roots = [r[0] for r in conn.execute("SELECT path FROM roots")]
+            delta: Dict[str, int] = {}
+            for path in sorted({os.path.abspath(p) for p in paths}):
+                root = _root_of(path, roots)
+                if root is None:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+                folder, name = os.path.split(path)
+                changes = {"added": 0, "updated": 0, "removed": 0}
+                if st is None or not stat.S_ISREG(st.st_mode):
+                    changes["removed"] += self._delete_file(conn, folder, name)
+                if st is None or not stat.S_ISDIR(st.st_mode):
+                    changes["removed"] += self._delete_under(conn, path)
+                if st is not None and stat.S_ISREG(st.st_mode):
+                    changes["added" if self._put(conn, folder, name, st) else "updated"] += 1
+                elif st is not None and stat.S_ISDIR(st.st_mode):
+                    for entry in scan_files(path):
+                        try:
+                            changes["added" if self._put(conn, os.path.dirname(entry.path), entry.name, entry.stat()) else "updated"] += 1
+                        except OSError:
+                            continue
+                for key, n in changes.items():
+                    counts[key] += n
+                delta[root] = delta.get(root, 0) + changes["added"] - changes["removed"]
+            conn.executemany("UPDATE roots SET file_count = file_count + ? WHERE path = ?", [(n, r) for r, n in delta.items() if n])
+        return counts
+
+    def _put(self, conn: sqlite3.Connection, folder: str, name: str, st: os.stat_result) -> bool:
+        """Add or update one file; True when it was not indexed before"""
+        dir_id = self._dir_id(conn, folder)
+        row = _row(dir_id, name, st)
+        if conn.execute("UPDATE files SET size = ?, mtime = ?, ctime = ? WHERE dir_id = ? AND name = ?",
+                        (*row[4:], dir_id, name)).rowcount:
+            return False
+        self._insert(conn, [row])
+        return True
+
+    @staticmethod
+    def _dir_id(conn: sqlite3.Connection, folder: str) -> int:
+        key = os.path.normcase(folder)
+        row = conn.execute("SELECT id FROM dirs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else conn.execute("INSERT INTO dirs (path, key) VALUES (?, ?)", (folder, key)).lastrowid
+
+    @staticmethod
+    def _delete_file(conn: sqlite3.Connection, folder: str, name: str) -> int:
+        return conn.execute("DELETE FROM files WHERE name = ? AND dir_id = (SELECT id FROM dirs WHERE key = ?)",
+                            (name, os.path.normcase(folder))).rowcount
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, root: str) -> int:
+        scope, params = _scope(root, True, "key")
+        return conn.execute(f"SELECT COUNT(*) FROM files WHERE dir_id IN (SELECT id FROM dirs WHERE {scope})", params).fetchone()[0]
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, rows: List[Tuple]) -> int:
+        conn.executemany("INSERT OR REPLACE INTO files (dir_id, name, name_lower, ext, size, mtime, ctime)"
+                         " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    @staticmethod
+    def _delete_under(conn: sqlite3.Connection, folder: str) -> int:
+        scope, params = _scope(folder, True, "key")
+        removed = conn.execute(f"DELETE FROM files WHERE dir_id IN (SELECT id FROM dirs WHERE {scope})", params).rowcount
+        conn.execute(f"DELETE FROM dirs WHERE {scope}", params)
+        return removed
+
+    def remove_root(self, root: str):
+        """Stop indexing a folder and drop its files"""
+        root = os.path.abspath(root)
+        with self._lock, self._connect() as conn:
+            self._delete_under(conn, root)
+            conn.execute("DELETE FROM roots WHERE path = ?", (root,))
+
+    def search(self, search_path: str, file_pattern: str = "*", file_extension: Optional[str] = None,
+               recursive: bool = True, max_results: Optional[int] = None, case_sensitive: bool = False,
+               min_size: Optional[int] = None, max_size: Optional[int] = None,
+               modified_after: Optional[datetime] = None, modified_before: Optional[datetime] = None,
+               ordered: bool = False) -> Iterator[Dict]:
+        """Indexed files matching a search, in the same form as FileSearchService.search_files"""
+        folder = os.path.abspath(search_path)
+        where, params = [], []
+        root = self.covering_root(folder)
+        if not recursive or root is None or os.path.normcase(root) != os.path.normcase(folder):
+            scope, scope_params = _scope(folder, recursive)
+            where.append(scope)
+            params += scope_params
+        names = []
+        if file_pattern and file_pattern != "*":
+            where.append("f.name GLOB ?" if case_sensitive else "f.name_lower GLOB ?")
+            params.append(_glob(file_pattern if case_sensitive else file_pattern.lower()))
+            ext = _pattern_extension(file_pattern)
+            if ext and not case_sensitive:
+                where.append("f.ext = ?")
+                params.append(ext)
+            elif file_pattern[0] in "*?":
+                names.append(file_pattern)
+        if file_extension:
+            ext = file_extension.lower()
+            if ext.startswith(".") and ext.count(".") == 1:
+                where.append("f.ext = ?")
+                params.append(ext)
+            else:
+                where.append("f.name_lower GLOB ?")
+                params.append("*" + _glob(ext))
+                names.append("*" + ext)
+        match = " AND ".join(filter(None, map(_trigram_query, names))) if self.trigrams else ""
+        if match:
+            where.append("f.id IN (SELECT rowid FROM name_trigrams WHERE name_trigrams MATCH ?)")
+            params.append(match)
+        for condition, value in (("f.size >= ?", min_size), ("f.size <= ?", max_size),
+                                 ("f.mtime >= ?", modified_after.timestamp() if modified_after else None),
+                                 ("f.mtime < ?", modified_before.timestamp() if modified_before else None)):
+            if value is not None:
+                where.append(condition)
+                params.append(value)
+        query = "SELECT d.path AS folder, f.name, f.size, f.mtime, f.ctime FROM files f JOIN dirs d ON d.id = f.dir_id"
+        if where:
+            query += " WHERE " + " AND ".join(f"({w})" for w in where)
+        if ordered:
+            query += " ORDER BY d.path, f.name"
+        if max_results:
+            query += " LIMIT ?"
+            params.append(max_results)
+        with self._connect() as conn:
+            for r in conn.execute(query, params):
+                yield {
+                    "path": os.path.join(r["folder"], r["name"]),
+                    "name": r["name"],
+                    "size": r["size"],
+                    "size_mb": round(r["size"] / 1048576, 2),
+                    "created": datetime.fromtimestamp(r["ctime"]).isoformat(sep=' '),
+                    "modified": datetime.fromtimestamp(r["mtime"]).isoformat(sep=' '),
+                    "extension": os.path.splitext(r["name"])[1]
+                }
+
+    def status(self) -> Dict:
+        roots = self.roots()
+        size = sum(os.path.getsize(p) for p in (self.db_path, Path(f"{self.db_path}-wal")) if os.path.isfile(p))
+        return {"roots": roots, "file_count": sum(r["file_count"] for r in roots), "db_mb": round(size / 1048576, 2),
+                "trigram_mb": self._trigram_mb() if roots else 0.0, "cache_mb": self.cache_mb}
+
+    def _trigram_mb(self) -> Optional[float]:
+        """Disk size of the trigram index, when SQLite has the dbstat table to measure it"""
+        if not self.trigrams:
+            return None
+        try:
+            with self._connect() as conn:
+                size = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE aggregate = TRUE AND name IN"
+                                    " ('name_trigrams_data', 'name_trigrams_idx')").fetchone()[0]
+            return round((size or 0) / 1048576, 2)
+        except sqlite3.OperationalError:
+            return None
+
+
+def _row(dir_id: int, name: str, st: os.stat_result) -> Tuple:
+    lower = name.lower()
+    return dir_id, name, lower, os.path.splitext(lower)[1], st.st_size, st.st_mtime, st.st_ctime
+
+
+def _root_of(path: str, roots: List[str]) -> Optional[str]:
+    key = os.path.normcase(path)
+    for root in roots:
+        prefix = os.path.normcase(root)
+        if key == prefix or key.startswith(prefix.rstrip(os.sep) + os.sep):
+            return root
+    return None
+
+
+def _scope(folder: str, recursive: bool, column: str = "d.key") -> Tuple[str, List]:
+    """SQL condition on a folder key column for a folder, and with recursive everything below it.
+
+    Everything below ``folder`` sorts from ``folder + sep`` up to (not including) the string with the
+    separator's successor in its place, whatever characters follow."""
+    folder = os.path.normcase(folder)
+    if not recursive:
+        return f"{column} = ?", [folder]
+    base = folder.rstrip(os.sep)
+    return f"{column} = ? OR ({column} >= ? AND {column} < ?)", [folder, base + os.sep, base + chr(ord(os.sep) + 1)]
+
+
+def _glob(pattern: str) -> str:
+    """GLOB pattern for a search wildcard: ``*`` and ``?`` stay, brackets are literal"""
+    return re.sub(r"[\[\]]", lambda m: f"[{m.group(0)}]", pattern)
+
+
+def _trigram_query(pattern: str) -> str:
+    """FTS5 query for the trigrams every name matching a wildcard pattern contains (may be empty).
+    The tokenizer folds case itself, the same way for names and queries."""
+    grams = {run[i:i + 3] for run in re.split(r"[*?]", pattern) for i in range(len(run) - 2)}
+    return " AND ".join('"' + g.replace('"', '""') + '"' for g in sorted(grams))
+
+
+def _pattern_extension(pattern: str) -> Optional[str]:
+    """Extension every name matching ``*.ext`` has, so the extension index can be used"""
+    match = re.fullmatch(r"\*(\.[^.*?\[\]]+)", pattern)
+    return match.group(1).lower() if match else None
+
+
+def index_roots(setting: str) -> List[str]:
+    """Folders listed in FILE_INDEX_ROOTS (separated by ``;``)"""
+    return [p.strip() for p in setting.split(";") if p.strip()]
@@ -1,12 +1,14 @@
 """File Organizer - Core logic for file classification"""
 import os
-import sys
 import json
 import shutil
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 from send2trash import send2trash
+from app.core.config import categories_config_path
+from app.core.walker import scan_files
+from app.services.copy_engine import copy_file
 
 
 class FileOrganizer:
@@ -16,11 +18,7 @@ class FileOrganizer:
 
     def __init__(self, config_path: str = None):
         if config_path is None:
-            if getattr(sys, 'frozen', False):
-                base = sys._MEIPASS if hasattr(sys, '_MEIPASS') else os.path.dirname(sys.executable)
-            else:
-                base = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            config_path = os.path.join(base, 'config', 'file_categories.json')
+            config_path = categories_config_path()
 
         with open(config_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -68,7 +66,7 @@ class FileOrganizer:
         d = Path(directory)
         if not d.exists():
             raise FileNotFoundError(f"Not found: {directory}")
-        files = [str(f) for f in (d.rglob("*") if recursive else d.iterdir()) if f.is_file()]
+        files = [entry.path for entry in scan_files(d, recursive)]
         self.stats['total_files'] = len(files)
         return files
 
@@ -124,11 +122,11 @@ class FileOrganizer:
                             counter += 1
 
                         if mode == 'move':
-                            shutil.move(str(project_root), proj_dest)
+                            shutil.move(str(project_root), proj_dest, copy_function=copy_file)
                         elif mode == 'copy':
-                            shutil.copytree(str(project_root), proj_dest)
+                            shutil.copytree(str(project_root), proj_dest, copy_function=copy_file)
                         else:
-                            shutil.copytree(str(project_root), proj_dest)
+                            shutil.copytree(str(project_root), proj_dest, copy_function=copy_file)
                             send2trash(str(project_root))
 
                         count = sum(1 for _ in Path(proj_dest).rglob('*') if _.is_file())
@@ -146,11 +144,11 @@ class FileOrganizer:
                     counter += 1
 
                 if mode == 'move':
-                    shutil.move(file_path, dest_path)
+                    shutil.move(file_path, dest_path, copy_function=copy_file)
                 elif mode == 'copy':
-                    shutil.copy2(file_path, dest_path)
+                    copy_file(file_path, dest_path)
                 else:
-                    shutil.copy2(file_path, dest_path)
+                    copy_file(file_path, dest_path)
                     send2trash(file_path)
 
                 self.stats['organized_files'] += 1
@@ -6,13 +6,19 @@ from pathlib import Path
 from typing import List, Optional, Dict, Generator
 from datetime import datetime
 from app.core.logger import app_logger
+from app.core.config import settings
+from app.core.walker import folder_size, parallel_scan_files
+from app.services.file_index import FileIndex, index_roots
+from app.services.index_watcher import IndexWatcher
 
 
 class FileSearchService:
     """Service for searching files in Windows drives and folders"""
 
-    def __init__(self):
+    def __init__(self, index: Optional[FileIndex] = None):
         self.logger = app_logger
+        self.index = index or FileIndex(Path(settings.FILE_INDEX_PATH), settings.FILE_INDEX_CACHE_MB)
+        self.watcher = IndexWatcher(self.index)
 
     def get_available_drives(self) -> List[str]:
         """Get all available drives on Windows system"""
@@ -25,8 +31,17 @@ class FileSearchService:
             return []
 
     def search_files(self, search_path: str, file_pattern: str = "*", file_extension: Optional[str] = None,
-                     recursive: bool = True, max_results: Optional[int] = None, case_sensitive: bool = False) -> Generator[Dict, None, None]:
-        """Search for files in specified path"""
+                     recursive: bool = True, max_results: Optional[int] = None, case_sensitive: bool = False,
+                     workers: Optional[int] = None, ordered: bool = False, min_size: Optional[int] = None,
+                     max_size: Optional[int] = None, modified_after: Optional[datetime] = None,
+                     modified_before: Optional[datetime] = None, use_index: bool = True) -> Generator[Dict, None, None]:
+        """Search for files in specified path.
+
+        Paths under a root of the file index are answered from the index while its watcher keeps it
+        current; an unwatched index may be stale, so it is not used. Otherwise folders are
+        listed by ``workers`` threads (default SEARCH_WORKERS) and results stream out as listings
+        finish; ``ordered`` returns them in folder and name order instead.
+        """
         try:
             path = Path(search_path)
             if not path.exists():
@@ -34,33 +49,45 @@ class FileSearchService:
                 return
 
             self.logger.info(f"Searching: {search_path}, pattern: {file_pattern}, ext: {file_extension}")
-            regex = self._wildcard_to_regex(file_pattern, case_sensitive)
             count = 0
+            if use_index and self.watcher.running and self.index.covering_root(search_path):
+                for f in self.index.search(search_path, file_pattern, file_extension, recursive, max_results, case_sensitive,
+                                           min_size, max_size, modified_after, modified_before, ordered):
+                    yield f
+                    count += 1
+                self.logger.info(f"Found {count} files in the index")
+                return
 
-            for item in (path.rglob("*") if recursive else path.glob("*")):
-                try:
-                    if not item.is_file():
-                        continue
-                    if file_extension and not item.name.lower().endswith(file_extension.lower()):
-                        continue
-                    if not regex.match(item.name):
-                        continue
+            regex = self._wildcard_to_regex(file_pattern, case_sensitive)
+            extension = file_extension.lower() if file_extension else None
+            after = modified_after.timestamp() if modified_after else None
+            before = modified_before.timestamp() if modified_before else None
 
-                    stats = item.stat()
-                    yield {
-                        "path": str(item.absolute()),
-                        "name": item.name,
-                        "size": stats.st_size,
-                        "size_mb": round(stats.st_size / 1048576, 2),
-                        "created": datetime.fromtimestamp(stats.st_ctime).isoformat(sep=' '),
-                        "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(sep=' '),
-                        "extension": item.suffix
-                    }
-                    count += 1
-                    if max_results and count >= max_results:
-                        break
-                except (PermissionError, OSError):
+            for entry in parallel_scan_files(path.absolute(), workers or settings.SEARCH_WORKERS, recursive, ordered=ordered):
+                name = entry.name
+                if extension and not name.lower().endswith(extension):
                     continue
+                if not regex.match(name):
+                    continue
+                try:
+                    stats = entry.stat()
+                except OSError:
+                    continue
+                if ((min_size is not None and stats.st_size < min_size) or (max_size is not None and stats.st_size > max_size)
+                        or (after is not None and stats.st_mtime < after) or (before is not None and stats.st_mtime >= before)):
+                    continue
+                yield {
+                    "path": entry.path,
+                    "name": name,
+                    "size": stats.st_size,
+                    "size_mb": round(stats.st_size / 1048576, 2),
+                    "created": datetime.fromtimestamp(stats.st_ctime).isoformat(sep=' '),
+                    "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(sep=' '),
+                    "extension": os.path.splitext(name)[1]
+                }
+                count += 1
+                if max_results and count >= max_results:
+                    break
 
             self.logger.info(f"Found {count} files")
         except Exception as e:
@@ -80,6 +107,25 @@ class FileSearchService:
             except Exception as e:
                 self.logger.error(f"Error on {drive}: {e}")
 
+    def build_index(self, roots: Optional[List[str]] = None, workers: Optional[int] = None) -> Dict:
+        """Index folders (default FILE_INDEX_ROOTS) so searches under them skip the walk"""
+        try:
+            roots = roots or index_roots(settings.FILE_INDEX_ROOTS)
+            if not roots:
+                raise ValueError("No folders to index (FILE_INDEX_ROOTS)")
+            for root in roots:
+                if not self.index.covering_root(root):
+                    self.watcher.watch(root)
+                self.index.index_root(root, workers or settings.SEARCH_WORKERS)
+            return dict(self.index.status(), **self.watcher.status(), success=True)
+        except Exception as e:
+            self.logger.error(f"Index error: {e}")
+            return {"success": False, "error": str(e)}
+
+    def index_status(self) -> Dict:
+        """Indexed folders, their file counts, the index size and whether it follows changes"""
+        return dict(self.index.status(), **self.watcher.status(), success=True)
+
     def _wildcard_to_regex(self, pattern: str, case_sensitive: bool = False) -> re.Pattern:
         """Convert wildcard pattern to regex"""
         pattern = re.escape(pattern).replace(r"\*", ".*").replace(r"\?", ".")
@@ -91,14 +137,7 @@ class FileSearchService:
             path = Path(folder_path)
             if not path.exists():
                 raise ValueError(f"Folder not found: {folder_path}")
-            total, count = 0, 0
-            for item in path.rglob("*"):
-                if item.is_file():
-                    try:
-                        total += item.stat().st_size
-                        count += 1
-                    except (PermissionError, OSError):
-                        continue
+            total, count = folder_size(path)
             return {"path": folder_path, "total_size_bytes": total, "total_size_mb": round(total / 1048576, 2), "total_size_gb": round(total / 1073741824, 2), "file_count": count}
         except Exception as e:
             self.logger.error(f"Folder size error: {e}")
@@ -0,0 +1,147 @@
+"""Keeps the file index current from filesystem events instead of periodic rescans"""
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Set
+from app.core.logger import app_logger
+from app.core.config import settings
+from app.services.file_index import FileIndex, index_roots
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional: only needed to keep the file index current
+    FileSystemEventHandler = object
+    Observer = None
+
+_EVENTS = ("created", "deleted", "modified", "moved", "closed")
+
+
+class _Collector(FileSystemEventHandler):
+    """Hands the paths an event touches to the watcher; a folder's "modified" only means its
+    contents changed, and those changes come as events of their own"""
+
+    def __init__(self, queue: Callable[[Iterable[str]], None]):
+        super().__init__()
+        self.queue = queue
+
+    def on_any_event(self, event):
+        if event.event_type in _EVENTS and not (event.is_directory and event.event_type == "modified"):
+            self.queue((os.fsdecode(event.src_path), os.fsdecode(event.dest_path or "")))
+
+
+class IndexWatcher:
+    """Applies filesystem events under the indexed folders to a FileIndex.
+
+    Events only queue the paths they touch. Every ``delay`` seconds the queued paths are read back
+    from disk and written in one transaction, so a file saved many times in a burst costs one
+    update. When started, each indexed folder is reconciled with the disk (sizes and modification
+    times, writing only what changed) to catch up on changes made while nothing was watching, and
+    FILE_INDEX_ROOTS folders not indexed yet are indexed in full. Watching starts before that pass,
+    so nothing changed during it is missed.
+    """
+
+    def __init__(self, index: FileIndex, delay: Optional[float] = None, workers: Optional[int] = None):
+        self.index = index
+        self.logger = app_logger
+        self.delay = delay if delay is not None else settings.FILE_INDEX_WATCH_DELAY
+        self.workers = workers or settings.SEARCH_WORKERS
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._watches: Dict[str, object] = {}
+        db = str(index.db_path.absolute())
+        self._ignored = {db + suffix for suffix in ("", "-wal", "-shm", "-journal")}
+        self.last_update: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Catch up with the disk, then apply events on a background thread until stop()"""
+        if self.running:
+            return True
+        if Observer is None:
+            self.logger.warning("File index watcher not started: the watchdog package is missing")
+            return False
+        self._stop.clear()
+        self._observer = Observer()
+        self._observer.start()
+        self._thread = threading.Thread(target=self._loop, name="index-watcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"File index watcher started, applying changes every {self.delay} s")
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        self._watches.clear()
+        self.flush()
+
+    def watch(self, root: str):
+        """Start receiving events for a folder (no-op when not running or already watched)"""
+        root = os.path.abspath(root)
+        if self._observer is None or root in self._watches:
+            return
+        try:
+            self._watches[root] = self._observer.schedule(_Collector(self._queue), root, recursive=True)
+        except OSError as e:
+            self.logger.error(f"Cannot watch {root}: {e}")
+
+    def _queue(self, paths: Iterable[str]):
+        with self._lock:
+            self._pending.update(p for p in paths if p and p not in self._ignored)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> Dict:
+        """Write the queued changes to the index now"""
+        with self._lock:
+            paths, self._pending = self._pending, set()
+        if not paths:
+            return {"added": 0, "updated": 0, "removed": 0}
+        result = self.index.refresh(paths)
+        self.last_update = dict(result, paths=len(paths), at=datetime.now().isoformat(sep=' '))
+        self.logger.debug(f"File index: {len(paths)} changed paths, {result}")
+        return result
+
+    def _loop(self):
+        try:
+            self._catch_up()
+        except Exception as e:
+            self.logger.error(f"File index catch-up error: {e}")
+        while not self._stop.wait(self.delay):
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"File index update error: {e}")
+
+    def _catch_up(self):
+        indexed = [r["path"] for r in self.index.roots()]
+        configured = [os.path.abspath(p) for p in index_roots(settings.FILE_INDEX_ROOTS)]
+        for root in indexed + [p for p in configured if p not in indexed]:
+            if self._stop.is_set():
+                return
+            if not os.path.isdir(root):
+                self.logger.warning(f"Indexed folder not available: {root}")
+                continue
+            self.watch(root)
+            if root in indexed:
+                self.index.reconcile(root, self.workers)
+            else:
+                self.index.index_root(root, self.workers)
+
+    def status(self) -> Dict:
+        return {"watching": self.running, "watched_roots": sorted(self._watches), "pending_changes": self.pending(),
+                "last_update": self.last_update}
@@ -0,0 +1,194 @@
+"""Write-ahead journal that makes folder backup jobs resumable"""
+import os
+import json
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+from app.core.config import settings
+from app.core.logger import app_logger
+
+try:
+    from app.core import database
+    from app.models.backup import BackupJob, BackupFile, BackupStatus
+except ImportError:  # GUI-only installs ship without SQLAlchemy
+    database = None
+
+JOBS_DIR = ".jobs"
+JOURNAL_SUFFIX = ".journal"
+IN_PROGRESS, COMPLETED = "in_progress", "completed"  # BackupStatus values, usable without SQLAlchemy
+
+
+class BackupJournal:
+    """Append-only JSON-lines record of a backup job, kept under ``<backup base>/.jobs``.
+
+    The first line describes the job (source, concrete destination and options); every further
+    line is a file that was copied and verified. Lines are fsynced in batches, so a crash loses at
+    most the last unsynced batch, and those files are simply copied again on resume. While the
+    database is available the job is mirrored into BackupJob/BackupFile rows.
+    """
+
+    def __init__(self, path: Path, header: Dict, completed: Optional[Dict[str, Dict]] = None,
+                 valid_bytes: Optional[int] = None, batch_size: Optional[int] = None, batch_seconds: float = 2.0):
+        self.path = Path(path)
+        self.header = header
+        self.completed = completed if completed is not None else {}
+        self.completed_bytes = sum(r["size_bytes"] for r in self.completed.values())
+        self.batch_size = batch_size or settings.BACKUP_JOURNAL_BATCH
+        self.batch_seconds = batch_seconds
+        self.logger = app_logger
+        self._valid_bytes = valid_bytes
+        self._file = None
+        self._unsynced: List[Dict] = []
+        self._last_sync = time.monotonic()
+        self._db_failed = False
+
+    @property
+    def job_id(self) -> str:
+        return self.header["job_id"]
+
+    @property
+    def source(self) -> str:
+        return self.header["source"]
+
+    @property
+    def destination(self) -> str:
+        return self.header["destination"]
+
+    @property
+    def options(self) -> Dict:
+        return self.header.get("options", {})
+
+    @property
+    def status(self) -> str:
+        return self.header["status"]
+
+    def info(self) -> Dict:
+        return {"job_id": self.job_id, "source": self.source, "destination": self.destination, "status": self.status,
+                "started_at": self.header.get("started_at"), "completed_files": len(self.completed),
+                "completed_size_mb": round(self.completed_bytes / 1048576, 2), "options": self.options}
+
+    @classmethod
+    def create(cls, jobs_path: Path, source: str, destination: str, options: Dict) -> "BackupJournal":
+        """Start a new job and durably write its header"""
+        job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        header = {"type": "job", "job_id": job_id, "status": IN_PROGRESS, "source": source,
+                  "destination": destination, "options": options, "started_at": datetime.now().isoformat(sep=' ')}
+        journal = cls(Path(jobs_path) / f"{job_id}{JOURNAL_SUFFIX}", header)
+        journal.path.parent.mkdir(parents=True, exist_ok=True)
+        header["db_id"] = journal._db(journal._db_create)
+        journal._append(header)
+        journal.checkpoint()
+        return journal
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BackupJournal"]:
+        """Read a journal back, ignoring a torn last line left by a crash"""
+        header, completed, valid = None, {}, 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid += len(line)
+                if record.get("type") == "job":
+                    header = record
+                elif record.get("type") == "file":
+                    completed[record["key"]] = record["result"]
+        return cls(path, header, completed, valid) if header else None
+
+    def record(self, key: str, result: Dict):
+        """Append a finished file; syncs once a batch is full or old enough"""
+        result = dict(result)
+        self.completed[key] = result
+        self.completed_bytes += result["size_bytes"]
+        self._append({"type": "file", "key": key, "result": result})
+        self._unsynced.append(result)
+        if len(self._unsynced) >= self.batch_size or time.monotonic() - self._last_sync >= self.batch_seconds:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Flush and fsync everything written so far"""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        rows, self._unsynced = self._unsynced, []
+        self._last_sync = time.monotonic()
+        if rows and self.header.get("db_id") is not None:
+            self._db(lambda db: self._db_sync(db, rows))
+
+    def close(self):
+        self.checkpoint()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def finish(self, results: Dict):
+        """Mark the job completed and drop its journal"""
+        self.close()
+        self.header["status"] = COMPLETED
+        if self.header.get("db_id") is not None:
+            self._db(lambda db: self._db_finish(db, results))
+        self.path.unlink(missing_ok=True)
+
+    def _append(self, record: Dict):
+        if self._file is None:
+            if self._valid_bytes is not None and self.path.stat().st_size > self._valid_bytes:
+                os.truncate(self.path, self._valid_bytes)
+            self._file = open(self.path, "ab")
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _db(self, action: Callable):
+        """Run a database mirror action; the first failure disables mirroring for this job"""
+        if database is None or database.SessionLocal is None or self._db_failed:
+            return None
+        try:
+            with closing(database.SessionLocal()) as db:
+                value = action(db)
+                db.commit()
+                return value
+        except Exception as e:
+            self._db_failed = True
+            self.logger.warning(f"Job {self.job_id} not mirrored to database: {e}")
+            return None
+
+    def _db_create(self, db) -> int:
+        job = BackupJob(name=f"backup_{self.job_id}", source_path=self.source, destination_path=self.destination,
+                        status=BackupStatus.IN_PROGRESS, started_at=datetime.now())
+        db.add(job)
+        db.flush()
+        return job.id
+
+    def _db_sync(self, db, rows: List[Dict]):
+        job_id = self.header["db_id"]
+        db.add_all([BackupFile(backup_job_id=job_id, source_path=r["source"], destination_path=r["destination"],
+                               file_name=Path(r["source"]).name, file_size_bytes=r["size_bytes"],
+                               file_extension=Path(r["source"]).suffix or None, checksum=r["checksum"],
+                               status=BackupStatus.COMPLETED, backed_up_at=datetime.now()) for r in rows])
+        db.query(BackupJob).filter(BackupJob.id == job_id).update(
+            {BackupJob.successful_count: len(self.completed), BackupJob.total_size_bytes: self.completed_bytes})
+
+    def _db_finish(self, db, results: Dict):
+        db.query(BackupJob).filter(BackupJob.id == self.header["db_id"]).update(
+            {BackupJob.status: BackupStatus.COMPLETED, BackupJob.completed_at: datetime.now(),
+             BackupJob.file_count: results["total_files"], BackupJob.successful_count: results["successful"],
+             BackupJob.failed_count: results["failed"], BackupJob.total_size_bytes: sum(r["size_bytes"] for r in results["files"])})
+
+
+def list_journals(jobs_path: Path) -> List[BackupJournal]:
+    """Journals of jobs that never completed, oldest first"""
+    journals = []
+    if Path(jobs_path).is_dir():
+        for path in sorted(Path(jobs_path).glob(f"*{JOURNAL_SUFFIX}")):
+            try:
+                journal = BackupJournal.load(path)
+            except OSError:
+                continue
+            if journal and journal.status == IN_PROGRESS:
+                journals.append(journal)
+    return journals
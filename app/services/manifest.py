@@ -0,0 +1,181 @@
+"""Snapshot manifests: per-backup records of every file and where its data lives"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+from datetime import datetime
+from app.services.archive import index_path, open_member
+from app.services.chunk_store import ChunkStore
+from app.services.delta import DeltaFile, FileRange, open_delta
+from app.services.pack_store import INDEX_SUFFIX as PACK_INDEX_SUFFIX, open_packed
+from app.services.parity import parity_path
+
+MANIFEST_NAME = ".backupwin_manifest.json"
+SOURCES_DIR = ".manifests"
+
+
+class SnapshotManifest:
+    """Manifest stored inside a backup folder.
+
+    ``entries`` maps the path of a file relative to the snapshot folder (posix style) to
+    ``{"source", "size", "mtime_ns", "checksum", "location"}``. ``location`` says where the bytes
+    are stored: ``{"type": "file", "path": ...}`` points at a plain file, which for unchanged files
+    of an incremental snapshot lives inside an older snapshot; ``{"type": "chunks", "store": ...,
+    "chunks": [...]}`` lists the chunk digests of a file kept in a deduplicating ChunkStore;
+    ``{"type": "archive", "path": ..., "offset": ..., "size": ...}`` is a byte range of the
+    uncompressed tar stream of an archive backup; ``{"type": "pack", ...}`` with the same keys is a
+    byte range of a pack file holding small files; ``{"type": "delta", "path": ..., "base": ...,
+    "depth": ..., "size": ...}`` is a delta file that rebuilds the file from the location in
+    ``base`` (a plain file or another delta, ``depth`` deltas deep). ``tier`` is "remote" once the
+    snapshot's data has been offloaded to the replication bucket.
+    """
+
+    def __init__(self, snapshot_path: Path, source: Optional[str] = None, mode: str = "full",
+                 base: Optional[str] = None, created: Optional[str] = None, entries: Optional[Dict[str, Dict]] = None,
+                 tier: str = "local"):
+        self.snapshot_path = Path(snapshot_path)
+        self.source = source
+        self.mode = mode
+        self.base = base
+        self.created = created or datetime.now().isoformat(sep=' ')
+        self.entries = entries if entries is not None else {}
+        self.tier = tier
+
+    @property
+    def file_path(self) -> Path:
+        return self.snapshot_path / MANIFEST_NAME
+
+    @property
+    def total_size(self) -> int:
+        return sum(e["size"] for e in self.entries.values())
+
+    def add(self, rel_path: str, source: str, size: int, mtime_ns: int, checksum: Optional[str], location: Dict):
+        self.entries[rel_path] = {"source": source, "size": size, "mtime_ns": mtime_ns, "checksum": checksum, "location": location}
+
+    def save(self):
+        """Atomically write the manifest into the snapshot folder"""
+        self.snapshot_path.mkdir(parents=True, exist_ok=True)
+        data = {"version": 1, "source": self.source, "mode": self.mode, "base": self.base,
+                "created": self.created, "tier": self.tier, "entries": self.entries}
+        tmp = self.file_path.with_name(self.file_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.file_path)
+
+    @classmethod
+    def load(cls, snapshot_path: Path) -> Optional["SnapshotManifest"]:
+        """Load the manifest of a snapshot folder, or None if it has none"""
+        path = Path(snapshot_path) / MANIFEST_NAME
+        if not path.is_file():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(Path(snapshot_path), data.get("source"), data.get("mode", "full"), data.get("base"),
+                   data.get("created"), data.get("entries", {}), data.get("tier", "local"))
+
+    @classmethod
+    def find(cls, file_path: Path, stop: Optional[Path] = None) -> Optional["SnapshotManifest"]:
+        """Find the manifest of the snapshot that contains file_path"""
+        for parent in Path(file_path).parents:
+            if (parent / MANIFEST_NAME).is_file():
+                return cls.load(parent)
+            if stop is not None and parent == stop:
+                break
+        return None
+
+    def entry_for(self, file_path: Path) -> Optional[Dict]:
+        try:
+            return self.entries.get(Path(file_path).relative_to(self.snapshot_path).as_posix())
+        except ValueError:
+            return None
+
+
+def location_path(location: Dict) -> Path:
+    """Physical path holding the bytes of a plain-file manifest location"""
+    if location.get("type") != "file":
+        raise ValueError(f"Unsupported location type: {location.get('type')}")
+    return Path(location["path"])
+
+
+def open_location(location: Dict) -> BinaryIO:
+    """Open the bytes of a manifest location for reading"""
+    kind = location.get("type")
+    if kind == "file":
+        return open(location["path"], "rb")
+    if kind == "chunks":
+        return ChunkStore(Path(location["store"])).open(location["chunks"])
+    if kind == "archive":
+        return open_member(location)
+    if kind == "pack":
+        return open_packed(location)
+    if kind == "delta":
+        return open_delta(location, _range_reader)
+    raise ValueError(f"Unsupported location type: {kind}")
+
+
+def location_objects(location: Dict) -> List[str]:
+    """Paths of every stored file a location needs, including indexes, parity files, delta bases and chunks"""
+    kind = location.get("type")
+    if kind == "chunks":
+        store = ChunkStore(Path(location["store"]))
+        return [str(store.chunk_path(d)) for d in location["chunks"]]
+    path = location["path"]
+    if kind == "pack":
+        return [path, str(Path(path).with_suffix(PACK_INDEX_SUFFIX)), str(parity_path(Path(path)))]
+    if kind == "archive":
+        return [path, str(index_path(Path(path))), str(parity_path(Path(path)))]
+    if kind == "delta":
+        return [path] + location_objects(location["base"])
+    return [path]
+
+
+def relocate_location(location: Dict, moved: Dict[str, str]) -> Dict:
+    """Copy of a location with stored files renamed as in ``moved`` (old path -> new path)"""
+    location = dict(location)
+    if "path" in location:
+        location["path"] = moved.get(location["path"], location["path"])
+    if "base" in location:
+        location["base"] = relocate_location(location["base"], moved)
+    return location
+
+
+def _range_reader(location: Dict):
+    """Positional reader for the base of a delta"""
+    kind = location.get("type")
+    if kind == "file":
+        return FileRange(Path(location["path"]))
+    if kind == "delta":
+        return DeltaFile(location, _range_reader)
+    raise ValueError(f"Unsupported delta base: {kind}")
+
+
+class SourceHistory:
+    """Per-source list of snapshots, kept under ``<backup base>/.manifests``"""
+
+    def __init__(self, backup_base_path: Path, source: Path):
+        self.source = str(Path(source).absolute())
+        key = hashlib.sha1(os.path.normcase(self.source).encode("utf-8")).hexdigest()
+        self.path = Path(backup_base_path) / SOURCES_DIR / f"{key}.json"
+
+    def snapshots(self) -> List[str]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8")).get("snapshots", [])
+        except (OSError, ValueError):
+            return []
+
+    def latest(self) -> Optional[SnapshotManifest]:
+        """Manifest of the newest snapshot of this source that still exists"""
+        for snapshot in reversed(self.snapshots()):
+            try:
+                manifest = SnapshotManifest.load(Path(snapshot))
+            except (OSError, ValueError):
+                continue
+            if manifest:
+                return manifest
+        return None
+
+    def record(self, snapshot_path: Path):
+        snapshots = [s for s in self.snapshots() if s != str(snapshot_path)] + [str(snapshot_path)]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"source": self.source, "snapshots": snapshots}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,111 @@
+"""Append-only pack files that hold many small backed-up files"""
+import io
+import os
+import json
+import uuid
+import random
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+from datetime import datetime
+from app.core.hashing import checksum_algorithm, checksum_bytes
+from app.core.throttle import throttle
+from app.services.copy_engine import ChecksumMismatchError, VerifyMode
+from app.services.parity import ParityWriter
+
+PACKS_DIR = ".packs"
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+
+
+class PackWriter:
+    """Appends whole small files to ``<folder>/pack-*.pack``, starting a new pack at ``max_size``.
+
+    Each pack has a JSON-lines index next to it (``name``, ``offset``, ``size``, ``checksum``,
+    ``mtime_ns``) so its contents can be recovered without a manifest. Files are read outside the
+    lock, so several copy workers can feed one writer. ``parity`` (ParityWriter keyword arguments)
+    adds a parity file to every pack.
+    """
+
+    def __init__(self, folder: Path, max_size: int = 268435456, parity: Optional[Dict] = None):
+        self.folder = Path(folder)
+        self.max_size = max_size
+        self.parity = parity
+        self.entries: List[Dict] = []
+        self._lock = threading.Lock()
+        self._pack: Optional[BinaryIO] = None
+        self._index = None
+        self._path: Optional[Path] = None
+        self._parity: Optional[ParityWriter] = None
+        self._size = 0
+
+    def add(self, src: Path, name: str) -> Dict:
+        """Append one file; returns its checksum, size, mtime and pack location"""
+        with open(src, "rb") as f:
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            data = throttle.read(f)
+        checksum = checksum_bytes(data)
+        with self._lock:
+            if self._pack is None or (self._size and self._size + len(data) > self.max_size):
+                self._roll()
+            offset = self._size
+            self._pack.write(data)
+            if self._parity:
+                self._parity.update(data)
+            self._size += len(data)
+            entry = {"name": name, "offset": offset, "size": len(data), "checksum": checksum, "mtime_ns": mtime_ns}
+            self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.entries.append(dict(entry, path=str(self._path.absolute())))
+            path = self._path
+        return {"checksum": checksum, "size_bytes": len(data), "mtime_ns": mtime_ns,
+                "location": {"type": "pack", "path": str(path.absolute()), "offset": offset, "size": len(data)}}
+
+    def close(self, verify: VerifyMode = "none", sample: int = 8):
+        """Flush the open pack and check what was written against the source checksums"""
+        with self._lock:
+            self._close_pack()
+        entries = self.entries
+        if verify == "sample":
+            entries = random.sample(entries, min(sample, len(entries)))
+        if verify != "none":
+            for entry in sorted(entries, key=lambda e: (e["path"], e["offset"])):
+                with open(entry["path"], "rb") as f:
+                    f.seek(entry["offset"])
+                    data = f.read(entry["size"])
+                    if checksum_bytes(data, checksum_algorithm(entry["checksum"])) != entry["checksum"]:
+                        raise ChecksumMismatchError(f"Checksum mismatch: {entry['name']} in {entry['path']}")
+
+    def _roll(self):
+        self._close_pack()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._path = self.folder / f"pack-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:8]}{PACK_SUFFIX}"
+        self._pack = open(self._path, "wb")
+        self._index = open(self._path.with_suffix(INDEX_SUFFIX), "w", encoding="utf-8")
+        self._parity = ParityWriter(self._path, **self.parity) if self.parity else None
+        self._size = 0
+
+    def _close_pack(self):
+        if self._pack is not None:
+            self._pack.close()
+            self._index.close()
+            if self._parity:
+                self._parity.close()
+            self._pack = self._index = self._parity = None
+
+
+def open_packed(location: Dict) -> BinaryIO:
+    """Read one packed file"""
+    with open(location["path"], "rb") as f:
+        f.seek(location["offset"])
+        data = f.read(location["size"])
+    if len(data) != location["size"]:
+        raise IOError(f"Pack ended early: {location['path']}")
+    return io.BytesIO(data)
+
+
+def pack_intact(location: Dict) -> bool:
+    """True if a pack still holds the bytes of a location (used when resuming a journaled job)"""
+    try:
+        return Path(location["path"]).stat().st_size >= location["offset"] + location["size"]
+    except OSError:
+        return False
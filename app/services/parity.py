@@ -0,0 +1,228 @@
+"""Reed-Solomon parity files that can rebuild damaged blocks of pack files and archives"""
+import os
+import json
+import math
+import zlib
+import struct
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+PARITY_SUFFIX = ".par"
+_MAGIC = b"BWPARITY"
+_TRAILER = struct.Struct("<Q8s")
+_repair_lock = threading.Lock()
+
+# GF(2^8) with the polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 510
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _EXP[_i + 255] = _x
+    _LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+
+
+def _mul(a: int, b: int) -> int:
+    return _EXP[_LOG[a] + _LOG[b]] if a and b else 0
+
+
+def _inv(a: int) -> int:
+    return _EXP[255 - _LOG[a]]
+
+
+@lru_cache(maxsize=256)
+def _table(c: int) -> bytes:
+    """Translation table that multiplies every byte of a block by ``c``"""
+    return bytes(_mul(c, x) for x in range(256))
+
+
+@lru_cache(maxsize=16)
+def _matrix(k: int, m: int) -> List[List[int]]:
+    """Parity rows of a systematic Cauchy code; every square submatrix is invertible, so any ``m``
+    lost blocks of a stripe can be rebuilt. Columns are scaled so the first row is plain XOR."""
+    rows = [[_inv((k + j) ^ i) for i in range(k)] for j in range(m)]
+    scale = [_inv(c) for c in rows[0]]
+    return [[_mul(c, s) for c, s in zip(row, scale)] for row in rows]
+
+
+def _combine(coefficients: List[int], blocks: List) -> int:
+    """Sum of coefficient * block over GF(2^8), a whole block at a time (blocks as little-endian ints)"""
+    acc = 0
+    for c, block in zip(coefficients, blocks):
+        if c and block:
+            acc ^= int.from_bytes(block if c == 1 else bytes(block).translate(_table(c)), "little")
+    return acc
+
+
+def _solve(matrix: List[List[int]]) -> List[List[int]]:
+    """Inverse of a small square matrix over GF(2^8)"""
+    n = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next(r for r in range(col, n) if rows[r][col])
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = _inv(rows[col][col])
+        rows[col] = [_mul(v, scale) for v in rows[col]]
+        for r in range(n):
+            if r != col and rows[r][col]:
+                f = rows[r][col]
+                rows[r] = [v ^ _mul(f, p) for v, p in zip(rows[r], rows[col])]
+    return [row[n:] for row in rows]
+
+
+def parity_path(path: Path) -> Path:
+    """Parity file written next to a pack file or archive"""
+    return Path(path).with_name(Path(path).name + PARITY_SUFFIX)
+
+
+def parity_blocks(percent: float, data_blocks: int) -> int:
+    """Parity blocks per stripe for a redundancy percentage"""
+    return min(max(math.ceil(data_blocks * percent / 100), 1), 256 - data_blocks)
+
+
+class ParityWriter:
+    """Computes the parity of a file from the bytes written to it, in stripes of ``data_blocks``
+    blocks of ``block_size`` bytes.
+
+    ``<file>.par`` holds the parity blocks of every stripe, then a CRC-32 of each data and parity
+    block (to tell which blocks are damaged) and a JSON header. Each parity block is built with one
+    table lookup pass and one XOR per data block, so encoding runs at C speed in whole blocks.
+    """
+
+    def __init__(self, path: Path, percent: float, block_size: int = 65536, data_blocks: int = 32):
+        self.path = parity_path(path)
+        self.block_size = block_size
+        self.data_blocks = data_blocks
+        self.parity_blocks = parity_blocks(percent, data_blocks)
+        self.size = 0
+        self._matrix = _matrix(data_blocks, self.parity_blocks)
+        self._stripe = bytearray()
+        self._crcs = bytearray()
+        self._parity_crcs = bytearray()
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._out: Optional[BinaryIO] = open(self._tmp, "wb")
+
+    def update(self, data):
+        self._stripe += data
+        self.size += len(data)
+        stripe_bytes = self.block_size * self.data_blocks
+        while len(self._stripe) >= stripe_bytes:
+            self._encode(bytes(self._stripe[:stripe_bytes]))
+            del self._stripe[:stripe_bytes]
+
+    def _encode(self, stripe: bytes):
+        view = memoryview(stripe)
+        blocks = [view[i:i + self.block_size] for i in range(0, len(stripe), self.block_size)]
+        for block in blocks:
+            self._crcs += struct.pack("<I", zlib.crc32(block))
+        for row in self._matrix:
+            parity = _combine(row, blocks).to_bytes(self.block_size, "little")
+            self._parity_crcs += struct.pack("<I", zlib.crc32(parity))
+            self._out.write(parity)
+
+    def close(self):
+        """Encode the last stripe and move the parity file into place"""
+        if self._stripe:
+            self._encode(bytes(self._stripe))
+            self._stripe = bytearray()
+        header = json.dumps({"version": 1, "size": self.size, "block_size": self.block_size,
+                             "data_blocks": self.data_blocks, "parity_blocks": self.parity_blocks}).encode("utf-8")
+        self._out.write(bytes(self._crcs) + bytes(self._parity_crcs) + header + _TRAILER.pack(len(header), _MAGIC))
+        self._out.close()
+        self._out = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """Stop writing and remove the partial parity file"""
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        self._tmp.unlink(missing_ok=True)
+
+
+def _read_parity(f: BinaryIO) -> Dict:
+    f.seek(-_TRAILER.size, os.SEEK_END)
+    length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+    if magic != _MAGIC:
+        raise ValueError("Not a parity file")
+    f.seek(-_TRAILER.size - length, os.SEEK_END)
+    info = json.loads(f.read(length))
+    blocks = math.ceil(info["size"] / info["block_size"])
+    stripes = math.ceil(blocks / info["data_blocks"])
+    count = blocks + stripes * info["parity_blocks"]
+    f.seek(stripes * info["parity_blocks"] * info["block_size"])
+    crcs = struct.unpack(f"<{count}I", f.read(4 * count))
+    info.update(blocks=blocks, stripes=stripes, crcs=crcs[:blocks], parity_crcs=crcs[blocks:])
+    return info
+
+
+def _read_block(f: BinaryIO, offset: int, size: int) -> Optional[bytes]:
+    try:
+        f.seek(offset)
+        data = f.read(size)
+    except OSError:  # unreadable sector
+        return None
+    return data if len(data) == size else None
+
+
+def repair_file(path: Path, dry_run: bool = False) -> Dict:
+    """Check a file against its parity file and rewrite the damaged blocks that can be rebuilt.
+
+    Returns the number of damaged, repaired and unrecoverable blocks; with dry_run nothing is written.
+    Repairs run one at a time, so readers that hit the same damage can all call this.
+    """
+    result = {"success": False, "path": str(path), "bad_blocks": 0, "repaired_blocks": 0, "unrecoverable_blocks": 0}
+    if not parity_path(path).is_file():
+        return dict(result, error="No parity file")
+    try:
+        with _repair_lock:
+            _repair(Path(path), dry_run, result)
+    except (OSError, ValueError, struct.error) as e:
+        return dict(result, error=str(e))
+    result["success"] = not result["unrecoverable_blocks"]
+    return result
+
+
+def _repair(path: Path, dry_run: bool, result: Dict):
+    with open(parity_path(path), "rb") as pf, open(path, "rb" if dry_run else "r+b") as f:
+        info = _read_parity(pf)
+        size, bs, k, m = info["size"], info["block_size"], info["data_blocks"], info["parity_blocks"]
+        matrix = _matrix(k, m)
+        for s in range(info["stripes"]):
+            first = s * k
+            count = min(k, info["blocks"] - first)
+            blocks: List[Optional[bytes]] = []
+            for b in range(first, first + count):
+                length = min(bs, size - b * bs)
+                data = _read_block(f, b * bs, length)
+                blocks.append(data if data is not None and zlib.crc32(data) == info["crcs"][b] else None)
+            bad = [i for i, block in enumerate(blocks) if block is None]
+            if not bad:
+                continue
+            result["bad_blocks"] += len(bad)
+            good = []
+            for j in range(m):
+                parity = _read_block(pf, (s * m + j) * bs, bs)
+                if parity is not None and zlib.crc32(parity) == info["parity_crcs"][s * m + j]:
+                    good.append((j, parity))
+            if len(good) < len(bad):
+                result["unrecoverable_blocks"] += len(bad)
+                continue
+            # For each used parity row j: sum over bad i of M[j][i] * d_i = p_j - sum over good i of M[j][i] * d_i
+            used = good[:len(bad)]
+            sums = [(int.from_bytes(p, "little") ^ _combine(matrix[j], blocks)).to_bytes(bs, "little") for j, p in used]
+            inverse = _solve([[matrix[j][i] for i in bad] for j, _ in used])
+            for n, i in enumerate(bad):
+                b = first + i
+                data = _combine(inverse[n], sums).to_bytes(bs, "little")[:min(bs, size - b * bs)]
+                if zlib.crc32(data) != info["crcs"][b]:
+                    result["unrecoverable_blocks"] += 1
+                    continue
+                if not dry_run:
+                    f.seek(b * bs)
+                    f.write(data)
+                result["repaired_blocks"] += 1
@@ -0,0 +1,277 @@
+"""Offsite copies of backup folders in S3-compatible buckets (Cloudflare R2, AWS S3, MinIO)"""
+import os
+import base64
+import hashlib
+import sqlite3
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from app.core.logger import app_logger
+from app.core.config import settings
+from app.core.hashing import Hasher
+from app.core.parallel import run_bounded
+from app.core.throttle import Throttle, throttle
+from app.services.copy_engine import throttled_blocks
+
+try:
+    import boto3
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:  # optional: only needed for replication
+    boto3 = None
+    ClientError = Exception
+
+REPLICATION_STATE_NAME = ".replication.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS remote (
+    target TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    PRIMARY KEY (target, key)
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    target TEXT NOT NULL,
+    key TEXT NOT NULL,
+    upload_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    part_size INTEGER NOT NULL,
+    PRIMARY KEY (target, key)
+);
+"""
+
+
+def s3_client(endpoint_url: Optional[str] = None, workers: Optional[int] = None):
+    """boto3 S3 client for the configured endpoint: S3_ENDPOINT_URL, else R2 when R2_ACCOUNT_ID is set,
+    else AWS S3"""
+    if boto3 is None:
+        raise ValueError("Replication needs the boto3 package")
+    endpoint = endpoint_url or settings.S3_ENDPOINT_URL
+    if not endpoint and settings.R2_ACCOUNT_ID:
+        endpoint = f"https://{settings.R2_ACCOUNT_ID}.r2.cloudflarestorage.com"
+    config = Config(max_pool_connections=max((workers or settings.REPLICATION_WORKERS) * 2, 10),
+                    retries={"max_attempts": 5, "mode": "standard"},
+                    s3={"addressing_style": "path"} if endpoint else None)
+    return boto3.client("s3", endpoint_url=endpoint, region_name=settings.S3_REGION or ("auto" if endpoint else None),
+                        aws_access_key_id=settings.R2_ACCESS_KEY_ID or None,
+                        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY or None,
+                        config=config)
+
+
+class ReplicationState:
+    """What has been uploaded where, and the multipart uploads still open, kept in a SQLite file"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def remote(self, target: str, key: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT size, mtime_ns, checksum FROM remote WHERE target = ? AND key = ?", (target, key)).fetchone()
+        return dict(row) if row else None
+
+    def record(self, target: str, key: str, size: int, mtime_ns: int, checksum: str):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO remote VALUES (?, ?, ?, ?, ?)", (target, key, size, mtime_ns, checksum))
+            conn.execute("DELETE FROM uploads WHERE target = ? AND key = ?", (target, key))
+
+    def upload(self, target: str, key: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT upload_id, size, mtime_ns, checksum, part_size FROM uploads WHERE target = ? AND key = ?",
+                               (target, key)).fetchone()
+        return dict(row) if row else None
+
+    def start_upload(self, target: str, key: str, upload_id: str, size: int, mtime_ns: int, checksum: str, part_size: int):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (target, key, upload_id, size, mtime_ns, checksum, part_size))
+
+
+class S3Replicator:
+    """Uploads files of a backup base into a bucket under ``prefix``, keyed by their path in the base.
+
+    A file is skipped when the state says this exact version (size, mtime) is already there, or when
+    the bucket holds an object of the same size whose ``checksum`` metadata matches its SHA-256.
+    Files smaller than ``part_size`` are sent whole on a pool of ``workers``; larger ones go as
+    multipart uploads with their parts sent in parallel. Open uploads are kept in the state, so an
+    interrupted upload continues with the parts the bucket is missing.
+    """
+
+    def __init__(self, base: Path, client, bucket: str, prefix: str = "", workers: int = 4,
+                 part_size: int = 16777216, mbps: float = 0, state_path: Optional[Path] = None):
+        self.logger = app_logger
+        self.base = Path(base).absolute()
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.workers = workers
+        self.part_size = max(part_size, 5242880)  # S3 minimum part size
+        self.limiter = Throttle(mbps)
+        self.state = ReplicationState(state_path or self.base / REPLICATION_STATE_NAME)
+        self.target = f"{client.meta.endpoint_url}/{bucket}"
+
+    def key(self, path: Path) -> str:
+        return object_key(self.base, path, self.prefix)
+
+    def replicate(self, files: Iterable[Path], progress_callback: Optional[Callable] = None, last: Iterable[Path] = ()) -> Dict:
+        """Upload every file the bucket does not hold yet; ``last`` files (manifests) go once all others made it"""
+        files, last = [Path(f) for f in files], [Path(f) for f in last]
+        results = {"total_files": len(files) + len(last), "uploaded": 0, "skipped": 0, "resumed": 0, "failed": 0,
+                   "uploaded_mb": 0.0, "errors": []}
+        sizes = {f: _size(f) for f in files}
+        small = [f for f in files if sizes[f] < self.part_size]
+        large = [f for f in files if sizes[f] >= self.part_size]
+
+        def on_done(_count: int, f: Path, outcome: Dict):
+            if outcome["success"]:
+                results["skipped" if outcome["skipped"] else "uploaded"] += 1
+                results["resumed"] += outcome.get("resumed", False)
+                results["uploaded_mb"] += outcome["uploaded_bytes"] / 1048576
+            else:
+                results["failed"] += 1
+                results["errors"].append({"path": outcome["path"], "error": outcome["error"]})
+            if progress_callback:
+                progress_callback(results["uploaded"] + results["skipped"] + results["failed"], results["total_files"], str(f))
+
+        for f in large:
+            on_done(0, f, self._replicate_one(f))
+        run_bounded(small, self._replicate_one, self.workers, self.workers * self.part_size, sizes.get, on_done)
+        if results["failed"]:
+            results["failed"] += len(last)
+            results["errors"] += [{"path": str(f), "error": "Not uploaded: the data it refers to failed"} for f in last]
+        else:
+            run_bounded(last, self._replicate_one, self.workers, on_done=on_done)
+        results["uploaded_mb"] = round(results["uploaded_mb"], 2)
+        results["success"] = results["failed"] == 0
+        self.logger.info(f"Replicated to {self.target}: {results['uploaded']} uploaded, {results['skipped']} skipped, "
+                         f"{results['failed']} failed")
+        return results
+
+    def _replicate_one(self, path: Path) -> Dict:
+        result = {"path": str(path), "skipped": False, "uploaded_bytes": 0}
+        try:
+            key, st = self.key(path), path.stat()
+            known = self.state.remote(self.target, key)
+            if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+                return dict(result, success=True, skipped=True)
+            checksum = _checksum(path)
+            if self._remote_matches(key, st.st_size, checksum):
+                result["skipped"] = True
+            elif st.st_size < self.part_size:
+                with open(path, "rb") as f:
+                    data = throttle.read(f)
+                self.limiter.acquire(len(data))
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentMD5=_content_md5(data),
+                                       Metadata={"checksum": checksum})
+                result["uploaded_bytes"] = len(data)
+            else:
+                result.update(self._multipart(path, key, st.st_size, st.st_mtime_ns, checksum))
+            self.state.record(self.target, key, st.st_size, st.st_mtime_ns, checksum)
+            return dict(result, success=True)
+        except Exception as e:
+            self.logger.error(f"Replication error {path}: {e}")
+            return dict(result, success=False, error=str(e))
+
+    def _remote_matches(self, key: str, size: int, checksum: str) -> bool:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return head["ContentLength"] == size and head.get("Metadata", {}).get("checksum") == checksum
+
+    def _multipart(self, path: Path, key: str, size: int, mtime_ns: int, checksum: str) -> Dict:
+        upload, parts = self.state.upload(self.target, key), {}
+        if upload and (upload["size"], upload["mtime_ns"], upload["checksum"]) == (size, mtime_ns, checksum):
+            try:
+                parts = self._list_parts(key, upload["upload_id"])
+            except ClientError:  # the bucket has expired or aborted it
+                upload = None
+        else:
+            upload = None
+        resumed = upload is not None
+        if upload is None:
+            upload = {"upload_id": self.client.create_multipart_upload(Bucket=self.bucket, Key=key,
+                                                                       Metadata={"checksum": checksum})["UploadId"],
+                      "part_size": self.part_size}
+            self.state.start_upload(self.target, key, upload["upload_id"], size, mtime_ns, checksum, self.part_size)
+        upload_id, part_size = upload["upload_id"], upload["part_size"]
+
+        def send(number: int) -> Dict:
+            with open(path, "rb") as f:
+                f.seek((number - 1) * part_size)
+                data = throttle.read(f, part_size)
+            done = parts.get(number)
+            if done and done["Size"] == len(data) and done["ETag"].strip('"') == hashlib.md5(data).hexdigest():
+                return {"PartNumber": number, "ETag": done["ETag"], "sent": 0}
+            self.limiter.acquire(len(data))
+            etag = self.client.upload_part(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number,
+                                           Body=data, ContentMD5=_content_md5(data))["ETag"]
+            return {"PartNumber": number, "ETag": etag, "sent": len(data)}
+
+        count = (size + part_size - 1) // part_size
+        sent = run_bounded(range(1, count + 1), send, self.workers, self.workers * part_size, lambda n: part_size)
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={
+            "Parts": [{"PartNumber": p["PartNumber"], "ETag": p["ETag"]} for p in sent]})
+        return {"uploaded_bytes": sum(p["sent"] for p in sent), "resumed": resumed}
+
+    def _list_parts(self, key: str, upload_id: str) -> Dict[int, Dict]:
+        parts, marker = {}, 0
+        while True:
+            page = self.client.list_parts(Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumberMarker=marker)
+            parts.update({p["PartNumber"]: p for p in page.get("Parts", [])})
+            if not page.get("IsTruncated"):
+                return parts
+            marker = page["NextPartNumberMarker"]
+
+
+def object_key(base: Path, path: Path, prefix: str = "") -> str:
+    """Bucket key of a file under the backup base folder"""
+    rel = Path(path).absolute().relative_to(Path(base).absolute()).as_posix()
+    prefix = prefix.strip("/")
+    return f"{prefix}/{rel}" if prefix else rel
+
+
+def _size(path: Path) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def _checksum(path: Path) -> str:
+    h = Hasher("sha256")
+    with open(path, "rb") as f:
+        for block in throttled_blocks(f):
+            h.update(block)
+    return h.checksum()
+
+
+def _content_md5(data: bytes) -> str:
+    """Content-MD5 header value, so the bucket rejects a body damaged in transit"""
+    return base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+
+
+def replication_files(root: Path, skip_dirs: Iterable[str] = (), skip_prefixes: Iterable[str] = ()) -> List[Path]:
+    """Files under a folder worth replicating: no temporary files, skipped folders or names starting with a skipped prefix"""
+    skip_dirs, skip_prefixes = set(skip_dirs), tuple(skip_prefixes)
+    files = []
+    for folder, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in skip_dirs]
+        files += [Path(folder) / n for n in names
+                  if not (skip_prefixes and n.startswith(skip_prefixes)) and not n.endswith((".tmp", ".part"))]
+    return files
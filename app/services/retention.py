@@ -0,0 +1,230 @@
+"""Retention policies and snapshot pruning with garbage collection of shared data"""
+import os
+import stat
+import uuid
+import time
+import threading
+from pathlib import Path
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.core.logger import app_logger
+from app.core.parallel import run_bounded
+from app.services.catalog import BackupCatalog
+from app.services.manifest import SnapshotManifest, relocate_location
+
+TRASH_DIR = ".trash"
+RETAINED_DIR = ".retained"
+ORPHANS_SUFFIX = ".orphans"
+
+
+def plan_retention(snapshots: List[Dict], keep_last: int = 0, keep_daily: int = 0, keep_weekly: int = 0,
+                   keep_monthly: int = 0, max_bytes: int = 0, objects: Optional[Dict[str, Dict[str, int]]] = None) -> List[Dict]:
+    """Snapshots to prune, oldest first, each with the ``reason`` it goes.
+
+    Snapshots are grouped by source and the newest of every group is always kept. Within a group
+    the newest ``keep_last`` are kept, plus the newest snapshot of each of the last ``keep_daily``
+    days, ``keep_weekly`` ISO weeks and ``keep_monthly`` months that have one ("policy"). When
+    ``objects`` (BackupCatalog.snapshot_objects) is given and the data the kept snapshots need is
+    over ``max_bytes``, the oldest kept snapshots go as well until it fits ("size"); data shared
+    with a snapshot that stays counts as not freed.
+    """
+    ordered = sorted(snapshots, key=lambda s: s["created"], reverse=True)
+    groups: Dict[Optional[str], List[Dict]] = {}
+    for s in ordered:
+        groups.setdefault(s.get("source"), []).append(s)
+    keep, newest = set(), {g[0]["path"] for g in groups.values()}
+    for group in groups.values():
+        keep.update(s["path"] for s in group[:max(keep_last, 1)])
+        for fmt, count in (("%Y-%m-%d", keep_daily), ("%G-%V", keep_weekly), ("%Y-%m", keep_monthly)):
+            periods = set()
+            for s in group:
+                period = _created(s).strftime(fmt)
+                if period not in periods and len(periods) < count:
+                    periods.add(period)
+                    keep.add(s["path"])
+    prune = [dict(s, reason="policy") for s in reversed(ordered) if s["path"] not in keep]
+
+    if max_bytes and objects is not None:
+        counts = Counter(p for paths in objects.values() for p in paths)
+        sizes = {p: size for paths in objects.values() for p, size in paths.items()}
+        remaining = sum(sizes.values())
+
+        def release(path: str):
+            nonlocal remaining
+            for p in objects.get(path, {}):
+                counts[p] -= 1
+                if not counts[p]:
+                    remaining -= sizes[p]
+
+        for s in prune:
+            release(s["path"])
+        for s in reversed(ordered):
+            if remaining <= max_bytes:
+                break
+            if s["path"] in keep and s["path"] not in newest:
+                release(s["path"])
+                prune.append(dict(s, reason="size"))
+    return sorted(prune, key=lambda s: s["created"])
+
+
+def _created(snapshot: Dict) -> datetime:
+    try:
+        return datetime.fromisoformat(snapshot["created"])
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+class Pruner:
+    """Removes snapshots from a backup base without breaking the snapshots that share their data.
+
+    Stored files inside a pruned snapshot that other snapshots still need (unchanged files of later
+    incremental snapshots, delta bases, packs, archives) are moved to ``.retained`` and those
+    snapshots' manifests are rewritten. The snapshot folder is then renamed into ``.trash`` and
+    forgotten by the catalog, which also reports the retained files and chunks nothing needs any
+    more; their list is written next to it. ``purge`` deletes the trash with parallel unlinks, and
+    can run in the background since the snapshot is already gone from every listing.
+    """
+
+    def __init__(self, backup_base_path: Path, catalog: BackupCatalog, workers: int = 8):
+        self.logger = app_logger
+        self.base = Path(backup_base_path).absolute()
+        self.catalog = catalog
+        self.workers = workers
+        self.trash_path = self.base / TRASH_DIR
+        self.retained_path = self.base / RETAINED_DIR
+        self.last_purge: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._trash_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._again = False
+
+    def prune(self, folder: Path) -> Dict:
+        """Take one snapshot out of the backup base; its disk space comes back with ``purge``"""
+        with self._trash_lock:
+            return self._prune(Path(folder).absolute())
+
+    def _prune(self, folder: Path) -> Dict:
+        shared, referrers = self.catalog.shared_objects(folder)
+        moved = {}
+        if shared:
+            keep = self.retained_path / f"{folder.name}-{uuid.uuid4().hex[:8]}"
+            for p in shared:
+                target = keep / Path(p).relative_to(folder)
+                try:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(p, target)
+                except FileNotFoundError:
+                    continue
+                moved[p] = str(target)
+            self.catalog.move_objects(moved)
+            for snapshot in referrers:
+                manifest = SnapshotManifest.load(Path(snapshot))
+                if manifest is None:
+                    continue
+                for entry in manifest.entries.values():
+                    entry["location"] = relocate_location(entry["location"], moved)
+                manifest.save()
+                self.catalog.record_manifest(manifest)
+
+        trash = self.trash_path / f"{folder.name}-{uuid.uuid4().hex[:8]}"
+        if folder.exists():
+            self.trash_path.mkdir(parents=True, exist_ok=True)
+            os.replace(folder, trash)
+        prefix = str(folder) + os.sep
+        orphans = [p for p in self.catalog.remove_snapshot(folder) if not p.startswith(prefix)]
+        if orphans:
+            self.trash_path.mkdir(parents=True, exist_ok=True)
+            trash.with_name(trash.name + ORPHANS_SUFFIX).write_text("\n".join(orphans), encoding="utf-8")
+        self.logger.info(f"Pruned {folder}: {len(moved)} shared files kept for {len(referrers)} snapshots, "
+                         f"{len(orphans)} unused files released")
+        return {"path": str(folder), "retained_files": len(moved), "released_files": len(orphans)}
+
+    def purge(self, busy: Optional[Callable[[], bool]] = None) -> Dict:
+        """Delete the trash with parallel unlinks.
+
+        Released-file lists wait while ``busy()`` is true (a backup may be about to reuse a chunk)
+        and are checked against the catalog again before anything in them is deleted.
+        """
+        files, dirs, lists, deferred = [], [], [], 0
+        # Only the listing excludes prune(); whatever it adds to the trash later waits for the next purge
+        with self._trash_lock:
+            entries = list(os.scandir(self.trash_path)) if self.trash_path.is_dir() else []
+            for entry in entries:
+                if entry.name.endswith(ORPHANS_SUFFIX):
+                    if busy and busy():
+                        deferred += 1
+                        continue
+                    listed = Path(entry.path).read_text(encoding="utf-8").splitlines()
+                    files += self.catalog.unreferenced(p for p in listed if p)
+                    lists.append(entry.path)
+                elif entry.is_dir(follow_symlinks=False):
+                    for root, _, names in os.walk(entry.path):
+                        dirs.append(root)
+                        files += [os.path.join(root, n) for n in names]
+                else:
+                    files.append(entry.path)
+
+        freed = sum(run_bounded(files, _unlink, self.workers))
+        retained = str(self.retained_path) + os.sep
+        for p in files:
+            parent = os.path.dirname(p)
+            while parent.startswith(retained):
+                dirs.append(parent)
+                parent = os.path.dirname(parent)
+        for d in sorted(set(dirs), key=len, reverse=True):
+            try:
+                os.rmdir(d)
+            except OSError:
+                pass
+        for path in lists:
+            os.remove(path)
+        result = {"success": True, "deleted_files": len(files), "freed_mb": round(freed / 1048576, 2), "deferred": deferred}
+        self.logger.info(f"Trash purged: {len(files)} files, {result['freed_mb']} MB")
+        return result
+
+    def purge_in_background(self, busy: Optional[Callable[[], bool]] = None, poll_seconds: float = 5.0):
+        """Run ``purge`` on a daemon thread, again while it is deferred or when asked during a run"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                self._again = True
+                return
+            self._again = False
+            self._thread = threading.Thread(target=self._purge_loop, args=(busy, poll_seconds), name="backup-purge", daemon=True)
+            self._thread.start()
+
+    def _purge_loop(self, busy: Optional[Callable[[], bool]], poll_seconds: float):
+        while True:
+            try:
+                self.last_purge = self.purge(busy)
+            except Exception as e:
+                self.logger.error(f"Purge error: {e}")
+                self.last_purge = {"success": False, "error": str(e)}
+            with self._lock:
+                if not self._again and not (self.last_purge or {}).get("deferred"):
+                    return
+                self._again = False
+            time.sleep(poll_seconds)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until a background purge has finished"""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+
+def _unlink(path: str) -> int:
+    """Delete one file; returns the bytes freed"""
+    try:
+        size = os.lstat(path).st_size
+        try:
+            os.unlink(path)
+        except PermissionError:  # read-only files on Windows
+            os.chmod(path, stat.S_IWRITE)
+            os.unlink(path)
+        return size
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        app_logger.warning(f"Cannot delete {path}: {e}")
+        return 0
@@ -0,0 +1,248 @@
+"""Runs the backups defined by BackupSchedule rows"""
+import os
+import calendar
+import threading
+from contextlib import closing
+from pathlib import Path
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+from app.core.logger import app_logger
+from app.core.config import settings
+from app.services.backup import BackupService
+
+try:  # optional: GUI installs run without SQLAlchemy
+    from sqlalchemy import text
+    from app.core import database
+    from app.models.backup import BackupSchedule
+except ImportError:
+    database = None
+
+_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+_NAMES = ({}, {}, {}, {m.lower(): i for i, m in enumerate(calendar.month_abbr) if m},
+          {d.lower(): (i + 1) % 7 for i, d in enumerate(calendar.day_abbr)})
+_MACROS = {"@yearly": "0 0 1 1 *", "@annually": "0 0 1 1 *", "@monthly": "0 0 1 * *", "@weekly": "0 0 * * 0",
+           "@daily": "0 0 * * *", "@midnight": "0 0 * * *", "@hourly": "0 * * * *"}
+
+
+class CronExpression:
+    """Standard five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Fields accept ``*``, numbers, ranges, ``/step``, comma lists and month/day names; day-of-week
+    0 and 7 are Sunday. As in cron, when both day fields are restricted a day matching either runs.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = _MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(f, i) for i, f in enumerate(fields))
+        self._any_day, self._any_weekday = fields[2] == "*", fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, index: int) -> Set[int]:
+        low, high = _FIELDS[index]
+        names = _NAMES[index]
+        values = set()
+        for part in field.lower().split(","):
+            spec, _, step = part.partition("/")
+            if spec == "*":
+                start, end = low, high
+            else:
+                first, _, last = spec.partition("-")
+                start = names[first] if first in names else int(first)
+                end = (names[last] if last in names else int(last)) if last else (high if step else start)
+            if not low <= start <= end <= high or (step and int(step) < 1):
+                raise ValueError(f"Cron field out of range: {part}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return {v % 7 for v in values} if index == 4 else values
+
+    def _day_matches(self, day: datetime) -> bool:
+        in_month, in_week = day.day in self.days, (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after ``after``"""
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+            elif t.hour not in self.hours:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+def destination_disk(path: str):
+    """Identity of the disk a destination lives on, so jobs to one disk can be limited together"""
+    p = Path(path).absolute()
+    for candidate in (p, *p.parents):
+        try:
+            return os.stat(candidate).st_dev
+        except OSError:
+            continue
+    return p.anchor
+
+
+class BackupScheduler:
+    """Dispatches due BackupSchedule rows to a bounded pool of backup workers.
+
+    Every tick loads the active schedules, fills in missing ``next_run_at`` values and starts
+    those that are due. A schedule never runs twice at once, and at most ``per_destination`` jobs
+    write to the same destination disk; due schedules over either limit wait for a later tick.
+    ``last_run_at``/``next_run_at`` are saved when a job starts, so a restart neither repeats it nor
+    loses it; runs missed while the machine was off happen once, at the first tick.
+
+    Each run is an incremental snapshot ``<destination>/<source name>_<timestamp>`` made with a
+    BackupService rooted at the destination, followed by its retention policy when RETENTION_AUTO is on.
+    """
+
+    def __init__(self, workers: Optional[int] = None, per_destination: Optional[int] = None,
+                 poll_seconds: Optional[float] = None, session_factory: Optional[Callable] = None):
+        self.logger = app_logger
+        self.workers = workers or settings.SCHEDULER_WORKERS
+        self.per_destination = per_destination or settings.SCHEDULER_PER_DESTINATION
+        self.poll_seconds = poll_seconds or settings.SCHEDULER_POLL_SECONDS
+        self.session_factory = session_factory
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._running: Dict[int, object] = {}
+        self._services: Dict[str, BackupService] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_results: Dict[int, Dict] = {}
+
+    def _session(self):
+        factory = self.session_factory or (database.SessionLocal if database is not None else None)
+        if factory is None:
+            raise RuntimeError("Scheduling needs the database")
+        return closing(factory())
+
+    def start(self) -> bool:
+        """Run ticks on a background thread until stop()"""
+        if self._thread and self._thread.is_alive():
+            return True
+        try:
+            with self._session() as db:
+                db.execute(text("SELECT 1"))
+        except Exception as e:
+            self.logger.warning(f"Backup scheduler not started: {e}")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="backup-scheduler", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Backup scheduler started: {self.workers} workers, {self.per_destination} per destination")
+        return True
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._pool:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                self.logger.error(f"Scheduler tick error: {e}")
+            self._stop.wait(self.poll_seconds)
+
+    def tick(self, now: Optional[datetime] = None) -> List[int]:
+        """Start every due schedule the limits allow; returns the ids started"""
+        now = now or datetime.now()
+        started, submitted = [], set()
+        try:
+            with self._session() as db:
+                for schedule in db.query(BackupSchedule).filter(BackupSchedule.is_active.is_(True)).order_by(BackupSchedule.next_run_at, BackupSchedule.id):
+                    try:
+                        next_run = CronExpression(schedule.cron_expression).next_after(now)
+                    except ValueError as e:
+                        self.logger.error(f"Schedule {schedule.id} ({schedule.name}): {e}")
+                        continue
+                    if schedule.next_run_at is None:
+                        schedule.next_run_at = next_run
+                    if _naive(schedule.next_run_at) > now or not self._claim(schedule):
+                        continue
+                    started.append(schedule.id)
+                    schedule.last_run_at = now
+                    schedule.next_run_at = next_run
+                db.commit()
+                jobs = [(s.id, s.name, s.source_path, s.destination_path) for s in
+                        db.query(BackupSchedule).filter(BackupSchedule.id.in_(started))] if started else []
+            for job in jobs:
+                self.logger.info(f"Starting scheduled backup {job[1]}: {job[2]} -> {job[3]}")
+                self._executor().submit(self._run, *job)
+                submitted.add(job[0])
+        except Exception:
+            # Only _run releases a claim, so give back the slots of schedules that will not run
+            with self._lock:
+                for schedule_id in started:
+                    if schedule_id not in submitted:
+                        self._running.pop(schedule_id, None)
+            raise
+        return started
+
+    def _claim(self, schedule) -> bool:
+        """Reserve a worker slot for a schedule unless it is running or its disk is busy"""
+        disk = destination_disk(schedule.destination_path)
+        with self._lock:
+            if schedule.id in self._running or len(self._running) >= self.workers:
+                return False
+            if sum(1 for d in self._running.values() if d == disk) >= self.per_destination:
+                return False
+            self._running[schedule.id] = disk
+            return True
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scheduled-backup")
+        return self._pool
+
+    def _run(self, schedule_id: int, name: str, source: str, destination: str):
+        try:
+            with self._lock:
+                service = self._services.get(destination)
+                if service is None:
+                    service = self._services[destination] = BackupService(backup_base_path=destination)
+            snapshot = Path(destination) / f"{Path(source).name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            result = service.backup_folder(source, str(snapshot), incremental=True)
+            if "error" in result:
+                self.logger.error(f"Scheduled backup {name} failed: {result['error']}")
+            else:
+                self.logger.info(f"Scheduled backup {name} done: {result['successful']} files, {result['failed']} failed")
+                if settings.RETENTION_AUTO:
+                    service.apply_retention()
+                if settings.REPLICATION_AUTO and result.get("snapshot"):
+                    service.replicate(result["snapshot"])
+                if settings.TIER_LOCAL_DAYS:
+                    service.offload_backups()
+            self.last_results[schedule_id] = result
+        except Exception as e:
+            self.logger.error(f"Scheduled backup {name} error: {e}")
+            self.last_results[schedule_id] = {"success": False, "error": str(e)}
+        finally:
+            with self._lock:
+                self._running.pop(schedule_id, None)
+
+    def running(self) -> List[int]:
+        with self._lock:
+            return list(self._running)
+
+
+def _naive(value: datetime) -> datetime:
+    """Compare stored times as local wall-clock times, like cron"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
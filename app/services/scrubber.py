@@ -0,0 +1,203 @@
+"""Background verification of backup data against the checksums recorded at backup time"""
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+from app.core.logger import app_logger
+from app.core.config import settings
+from app.core.hashing import hasher_for
+from app.core.parallel import run_bounded
+from app.core.throttle import Throttle
+from app.services.catalog import BackupCatalog
+from app.services.chunk_store import ChunkStore
+from app.services.copy_engine import throttled_blocks
+from app.services.manifest import open_location
+from app.services.parity import parity_path, repair_file
+from app.services.retention import RETAINED_DIR
+
+SCRUB_STATE_NAME = ".scrub.json"
+
+
+class Scrubber:
+    """Re-reads stored backup data at a limited rate and checks it against the recorded checksums.
+
+    A pass goes through the catalog's files in order, then through the chunk store. A file whose
+    data another snapshot stored (unchanged files of incremental backups) is checked with that
+    snapshot, and chunks are checked one by one against the SHA-256 they are named after, so shared
+    data is read once per pass. Damaged pack files and archives with a parity file are repaired
+    and checked again. Backups offloaded to the bucket are skipped. The position, repairs and every bad file found are saved to ``.scrub.json``
+    after each batch, so a pass over terabytes can be spread over many runs with time or byte budgets.
+    """
+
+    def __init__(self, backup_base_path: Path, catalog: BackupCatalog, chunk_store: ChunkStore,
+                 workers: Optional[int] = None, mbps: Optional[float] = None):
+        self.logger = app_logger
+        self.base = Path(backup_base_path).absolute()
+        self.catalog = catalog
+        self.chunk_store = chunk_store
+        self.workers = workers or settings.SCRUB_WORKERS
+        self.limiter = Throttle(settings.SCRUB_MBPS if mbps is None else mbps)
+        self.state_path = self.base / SCRUB_STATE_NAME
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._retained = str(self.base / RETAINED_DIR) + os.sep
+
+    def load_state(self) -> Dict:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return self._new_pass(None)
+
+    @staticmethod
+    def _new_pass(previous: Optional[Dict]) -> Dict:
+        last = None
+        if previous and previous.get("completed_at"):
+            last = {k: previous.get(k, []) for k in ("started_at", "completed_at", "checked_files", "checked_bytes", "bad", "repaired")}
+        return {"started_at": datetime.now().isoformat(sep=' '), "completed_at": None, "phase": "files", "cursor": 0,
+                "checked_files": 0, "checked_bytes": 0, "skipped_files": 0, "bad": [], "repaired": [], "last_pass": last}
+
+    def _save(self, state: Dict):
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def run(self, max_seconds: Optional[float] = None, max_bytes: Optional[int] = None, restart: bool = False,
+            batch: int = 256) -> Dict:
+        """Scrub until the pass is complete, a budget is used up or stop() is called; returns the status"""
+        self._stop.clear()
+        state = self.load_state()
+        if restart or state.get("completed_at"):
+            state = self._new_pass(state)
+        start, read = time.monotonic(), 0
+        bad = {b["stored_path"] for b in state["bad"]}
+        while not self._stop.is_set():
+            if state["phase"] == "files":
+                rows = self.catalog.files_after(state["cursor"], batch)
+                if not rows:
+                    state["phase"], state["cursor"] = "chunks", ""
+                    continue
+                rows.sort(key=lambda r: (r["location"].get("path", ""), r["location"].get("offset", 0)))
+                outcomes = run_bounded(rows, self._check_file, self.workers, settings.BACKUP_MAX_INFLIGHT_MB * 1048576,
+                                       lambda r: r["size"])
+                state["cursor"] = max(r["pos"] for r in rows)
+            else:
+                paths = self.catalog.objects_after(self.chunk_store.chunks_path, state["cursor"], batch)
+                if not paths:
+                    state["completed_at"] = datetime.now().isoformat(sep=' ')
+                    break
+                outcomes = run_bounded(paths, self._check_chunk, self.workers)
+                state["cursor"] = paths[-1]
+
+            for outcome in outcomes:
+                if outcome is None:
+                    state["skipped_files"] += 1
+                    continue
+                state["checked_files"] += 1
+                state["checked_bytes"] += outcome["bytes"]
+                read += outcome["bytes"]
+                if outcome.get("repaired_blocks"):
+                    state.setdefault("repaired", []).append({"stored_path": outcome["stored_path"], "blocks": outcome["repaired_blocks"],
+                                                             "repaired_at": datetime.now().isoformat(sep=' ')})
+                if outcome.get("error") and outcome["stored_path"] not in bad:
+                    bad.add(outcome["stored_path"])
+                    state["bad"].append({k: v for k, v in outcome.items() if k not in ("bytes", "repaired_blocks")})
+                    self.logger.error(f"Scrub found bad data: {outcome['stored_path']}: {outcome['error']}")
+            self._save(state)
+            if (max_seconds and time.monotonic() - start >= max_seconds) or (max_bytes and read >= max_bytes):
+                break
+        self._save(state)
+        self.logger.info(f"Scrub {'completed' if state['completed_at'] else 'paused'}: {state['checked_files']} checked, "
+                         f"{len(state['bad'])} bad")
+        return self.status(state)
+
+    def _owned(self, snapshot: str, location: Dict) -> bool:
+        """True if the data of a file was stored by its own snapshot (or kept after that was pruned)"""
+        path = location.get("path", "")
+        return path.startswith(snapshot.rstrip(os.sep) + os.sep) or path.startswith(self._retained)
+
+    def _check_file(self, row: Dict) -> Optional[Dict]:
+        location = row["location"]
+        if (location["type"] == "chunks" or not row["checksum"] or row["tier"] == "remote"
+                or not self._owned(row["snapshot"], location)):
+            return None
+        result = {"snapshot": row["snapshot"], "rel_path": row["rel_path"], "type": location["type"],
+                  "stored_path": location["path"]}
+        result["bytes"], error = self._read(location, row["checksum"])
+        if error and location["type"] in ("pack", "archive") and parity_path(location["path"]).is_file():
+            repaired = repair_file(location["path"])
+            if repaired["repaired_blocks"]:
+                result["repaired_blocks"] = repaired["repaired_blocks"]
+                self.logger.warning(f"Scrub repaired {repaired['repaired_blocks']} blocks of {location['path']}")
+            if repaired["success"]:
+                error = self._read(location, row["checksum"])[1]
+        if error:
+            result["error"] = error
+            # Pruning may have moved or removed the data since the row was read
+            current = self.catalog.find_file(Path(row["snapshot"]) / row["rel_path"])
+            if current is None or current["location"] != location:
+                return None
+            result["affected"] = self.catalog.files_using(location["path"])
+            result["found_at"] = datetime.now().isoformat(sep=' ')
+        return result
+
+    def _read(self, location: Dict, checksum: str) -> tuple:
+        """Bytes read and the error found, if any, checking one stored file"""
+        h, read = hasher_for(checksum), 0
+        try:
+            with open_location(location) as f:
+                for block in throttled_blocks(f, limiter=self.limiter):
+                    h.update(block)
+                    read += len(block)
+        except Exception as e:
+            return read, str(e)
+        return read, None if h.checksum() == checksum else "Checksum mismatch"
+
+    def _check_chunk(self, path: str) -> Dict:
+        digest = Path(path).name
+        result = {"type": "chunk", "stored_path": path, "bytes": 0}
+        try:
+            self.limiter.acquire(os.stat(path).st_size)
+            result["bytes"] = len(self.chunk_store.get_chunk(digest))
+        except Exception as e:
+            result["error"] = str(e)
+            result["affected"] = self.catalog.files_using(path, digest)
+            result["found_at"] = datetime.now().isoformat(sep=' ')
+        return result
+
+    def start(self, max_seconds: Optional[float] = None, max_bytes: Optional[int] = None, restart: bool = False) -> bool:
+        """Run a scrub slice on a background thread; False if one is already running"""
+        if self.running:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_logged, args=(max_seconds, max_bytes, restart),
+                                        name="backup-scrub", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run_logged(self, max_seconds: Optional[float], max_bytes: Optional[int], restart: bool):
+        try:
+            self.run(max_seconds, max_bytes, restart)
+        except Exception as e:
+            self.logger.error(f"Scrub error: {e}")
+
+    def stop(self):
+        """Ask a running scrub to stop after its current batch"""
+        self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def status(self, state: Optional[Dict] = None) -> Dict:
+        state = state or self.load_state()
+        return {"success": True, "running": self.running, "phase": state["phase"], "started_at": state["started_at"],
+                "completed_at": state["completed_at"], "checked_files": state["checked_files"],
+                "checked_mb": round(state["checked_bytes"] / 1048576, 2), "skipped_files": state["skipped_files"],
+                "bad": state["bad"], "repaired": state.get("repaired", []), "last_pass": state.get("last_pass")}
@@ -0,0 +1,139 @@
+"""Local hot tier in front of the replication bucket: offloaded snapshots and the restore cache"""
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+from app.core.logger import app_logger
+from app.core.config import settings
+from app.core.parallel import run_bounded
+from app.services.catalog import BackupCatalog
+from app.services.manifest import SnapshotManifest, location_objects
+from app.services.replication import ClientError, object_key, s3_client
+
+
+class TieredStore:
+    """Keeps recent snapshots on local disk and older ones in the replication bucket only.
+
+    Offloading a replicated snapshot deletes the stored files no local snapshot needs and marks
+    them remote in the catalog; manifests stay, so offloaded backups are still listed and browsed
+    without the bucket. Restores fetch remote files back to their own paths. Fetched files form an
+    LRU cache of at most ``cache_bytes``: reading them again costs no round trip, and the least
+    recently used ones are deleted once the cache is full.
+    """
+
+    def __init__(self, base: Path, catalog: BackupCatalog, cache_bytes: Optional[int] = None, client=None):
+        self.logger = app_logger
+        self.base = Path(base).absolute()
+        self.catalog = catalog
+        self.cache_bytes = settings.TIER_CACHE_MB * 1048576 if cache_bytes is None else cache_bytes
+        self._client = client
+        self._cached: Optional[Set[str]] = None
+        self._absent: Set[str] = set()  # optional files (parity, indexes) the bucket does not have
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = s3_client()
+        return self._client
+
+    def offload(self, snapshot: Path) -> Dict:
+        """Move a snapshot that is already in the bucket to the remote tier"""
+        folder = Path(snapshot).absolute()
+        manifest = SnapshotManifest.load(folder)
+        if manifest is None:
+            raise FileNotFoundError(f"Not a manifest backup: {snapshot}")
+        manifest.tier = "remote"
+        manifest.save()
+        released = self.catalog.set_tier(folder, "remote")
+        freed = sum(_unlink(p) for p in released)
+        for parent, dirs, files in os.walk(folder, topdown=False):
+            if not dirs and not files:
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    pass
+        self.logger.info(f"Offloaded {folder}: {len(released)} files, {freed / 1048576:.1f} MB freed")
+        return {"success": True, "snapshot": str(folder), "released_files": len(released), "freed_bytes": freed}
+
+    def fetch_missing(self, locations: Iterable[Dict], workers: Optional[int] = None) -> int:
+        """Download the remote files the given manifest locations need and that are not on disk.
+
+        Downloads run in parallel and one batch at a time, so concurrent readers of the same pack
+        file wait for it instead of fetching it twice. Returns the number of files fetched.
+        """
+        with self._lock:
+            missing = sorted({p for loc in locations for p in location_objects(loc)
+                              if p not in self._absent and not os.path.exists(p)})
+            paths = self.catalog.remote_objects(missing) if missing else []
+            if not paths:
+                return 0
+            if not settings.R2_BUCKET_NAME:
+                raise ValueError("No bucket configured (R2_BUCKET_NAME)")
+            sizes = run_bounded(paths, self._download, workers or settings.REPLICATION_WORKERS)
+            fetched = {p: size for p, size in zip(paths, sizes) if size is not None}
+            self._absent.update(p for p in paths if p not in fetched)
+            if not fetched:
+                return 0
+            self.catalog.cache_add(fetched, time.time())
+            self._cached_paths().update(fetched)
+            self._evict(fetched)
+        self.logger.info(f"Fetched {len(fetched)} files ({sum(fetched.values()) / 1048576:.1f} MB) from the bucket")
+        return len(fetched)
+
+    def _download(self, path: str) -> Optional[int]:
+        """Download one file to its own path; None when the bucket does not have it"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        try:
+            self.client.download_file(settings.R2_BUCKET_NAME, object_key(self.base, path, settings.REPLICATION_PREFIX), tmp)
+            os.replace(tmp, path)
+        except ClientError as e:
+            _unlink(tmp)
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return None
+            raise
+        except BaseException:
+            _unlink(tmp)
+            raise
+        return os.path.getsize(path)
+
+    def touch(self, locations: Iterable[Dict]):
+        """Mark cached files the given locations read as recently used"""
+        cached = self._cached_paths()
+        if not cached:
+            return
+        hits = [p for loc in locations for p in location_objects(loc) if p in cached]
+        if hits:
+            self.catalog.cache_touch(hits, time.time())
+
+    def evict(self) -> int:
+        """Delete least recently used cached files until the cache fits its limit"""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self, keep: Iterable[str] = ()) -> int:
+        evicted = self.catalog.cache_evict(self.cache_bytes, keep)
+        for path in evicted:
+            _unlink(path)
+        self._cached_paths().difference_update(evicted)
+        return len(evicted)
+
+    def _cached_paths(self) -> Set[str]:
+        if self._cached is None:
+            self._cached = set(self.catalog.cached_paths())
+        return self._cached
+
+    def status(self) -> Dict:
+        return {"cache_files": len(self._cached_paths()), "cache_mb": round(self.catalog.cache_bytes() / 1048576, 2),
+                "cache_limit_mb": round(self.cache_bytes / 1048576, 2)}
+
+
+def _unlink(path: str) -> int:
+    try:
+        size = os.path.getsize(path)
+        os.unlink(path)
+        return size
+    except OSError:
+        return 0
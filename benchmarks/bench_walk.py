@@ -0,0 +1,82 @@
+"""Compare directory traversal with rglob, scandir and parallel scandir.
+
+Usage: python -m benchmarks.bench_walk [--files 1000000] [--per-dir 100] [--workers 4,8,16] [--tree PATH]
+
+Builds a synthetic tree of empty files (two levels of folders, ``--per-dir`` files each) and times
+finding every file and its size. ``--tree`` keeps the tree in a folder and reuses it on later
+runs; point it at a network share to see what parallel listing buys where latency dominates.
+The first pass is not timed, so every method sees a warm directory cache.
+"""
+import os
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from app.core.walker import parallel_scan_files, scan_files
+
+
+def build_tree(root: Path, files: int, per_dir: int):
+    """Empty files spread over folders of ``per_dir`` files under folders of ``per_dir`` folders"""
+    marker = root / f".tree-{files}-{per_dir}"
+    if marker.exists():
+        return
+    for n in range(0, files, per_dir):
+        folder = root / f"d{n // (per_dir * per_dir):04d}" / f"d{n // per_dir % per_dir:04d}"
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(min(per_dir, files - n)):
+            os.close(os.open(folder / f"file{i:05d}.dat", os.O_CREAT | os.O_WRONLY, 0o644))
+    marker.touch()
+
+
+def rglob_walk(root: Path) -> int:
+    """The original search loop: rglob, is_file and stat per file"""
+    total = 0
+    for item in root.rglob("*"):
+        if item.is_file():
+            total += item.stat().st_size
+    return total
+
+
+def entry_sizes(entries) -> int:
+    return sum(e.stat().st_size for e in entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--per-dir", type=int, default=100)
+    parser.add_argument("--workers", default="4,8,16")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tree", default=None, help="Folder to build (or reuse) the tree in (default: a temporary folder)")
+    args = parser.parse_args()
+
+    walks = {
+        "rglob + is_file + stat": lambda root: rglob_walk(root),
+        "scandir": lambda root: entry_sizes(scan_files(root)),
+    }
+    for w in (int(n) for n in args.workers.split(",")):
+        walks[f"parallel scandir, {w} threads"] = lambda root, w=w: entry_sizes(parallel_scan_files(root, w))
+        walks[f"parallel scandir, {w} threads, ordered"] = lambda root, w=w: entry_sizes(parallel_scan_files(root, w, ordered=True))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.tree or tmp)
+        root.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        build_tree(root, args.files, args.per_dir)
+        print(f"{args.files} files in {root} (ready in {time.perf_counter() - start:.1f} s), best of {args.repeat}")
+        rglob_walk(root)
+
+        baseline = None
+        for name, walk in walks.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                walk(root)
+                best = min(best, time.perf_counter() - start)
+            rate = args.files / best
+            baseline = baseline or rate
+            print(f"  {name:<40} {rate:10.0f} files/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -48,6 +48,23 @@ class BackupTab(ctk.CTkFrame):
         self.create_checksum_var = ctk.BooleanVar(value=True)
         ctk.CTkCheckBox(opts, text=t("backup_create_checksum"), variable=self.create_checksum_var, font=NORMAL_FONT).pack(anchor="w", pady=5)
 
+        # I/O limits apply to running backups and restores as soon as they are changed
+        limits = self.backup_service.get_throttle()
+        throttle_row = ctk.CTkFrame(opts, fg_color="transparent")
+        throttle_row.pack(fill="x", pady=(5, 0))
+        ctk.CTkLabel(throttle_row, text=t("backup_throttle_mbps"), font=NORMAL_FONT).pack(side="left")
+        self.throttle_mbps_entry = ctk.CTkEntry(throttle_row, font=NORMAL_FONT, width=60, height=30)
+        self.throttle_mbps_entry.insert(0, f"{limits['mbps']:g}")
+        self.throttle_mbps_entry.pack(side="left", padx=5)
+        ctk.CTkLabel(throttle_row, text=t("backup_throttle_iops"), font=NORMAL_FONT).pack(side="left")
+        self.throttle_iops_entry = ctk.CTkEntry(throttle_row, font=NORMAL_FONT, width=60, height=30)
+        self.throttle_iops_entry.insert(0, str(limits['iops']))
+        self.throttle_iops_entry.pack(side="left", padx=5)
+        StyledButton(throttle_row, text=t("btn_apply"), command=self._apply_throttle, width=70).pack(side="left")
+        self.throttle_adaptive_var = ctk.BooleanVar(value=limits['adaptive'])
+        ctk.CTkCheckBox(opts, text=t("backup_throttle_adaptive"), variable=self.throttle_adaptive_var, command=self._apply_throttle,
+                        font=NORMAL_FONT).pack(anchor="w", pady=5)
+
         self.folder_options_frame = ctk.CTkFrame(left, fg_color="transparent")
         ctk.CTkLabel(self.folder_options_frame, text=t("backup_extensions"), font=NORMAL_FONT).pack(anchor="w", pady=(5, 2))
         self.extensions_entry = ctk.CTkEntry(self.folder_options_frame, font=NORMAL_FONT, height=35, placeholder_text=t("backup_extensions_placeholder"))
@@ -55,6 +72,16 @@ class BackupTab(ctk.CTkFrame):
         ctk.CTkLabel(self.folder_options_frame, text=t("backup_exclude"), font=NORMAL_FONT).pack(anchor="w", pady=(5, 2))
         self.exclude_entry = ctk.CTkEntry(self.folder_options_frame, font=NORMAL_FONT, height=35, placeholder_text=t("backup_exclude_placeholder"))
         self.exclude_entry.pack(fill="x")
+        self.incremental_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_options_frame, text=t("backup_incremental"), variable=self.incremental_var, font=NORMAL_FONT).pack(anchor="w", pady=(10, 0))
+        self.dedup_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_options_frame, text=t("backup_dedup_store"), variable=self.dedup_var, font=NORMAL_FONT).pack(anchor="w", pady=(5, 0))
+        self.archive_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_options_frame, text=t("backup_archive"), variable=self.archive_var, font=NORMAL_FONT).pack(anchor="w", pady=(5, 0))
+        self.pack_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_options_frame, text=t("backup_pack_small"), variable=self.pack_var, font=NORMAL_FONT).pack(anchor="w", pady=(5, 0))
+        self.delta_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self.folder_options_frame, text=t("backup_delta"), variable=self.delta_var, font=NORMAL_FONT).pack(anchor="w", pady=(5, 0))
 
         StyledButton(left, text=t("btn_start_backup"), command=self._start_backup, variant="success").pack(fill="x", padx=PADDING, pady=20)
 
@@ -127,7 +154,16 @@ class BackupTab(ctk.CTkFrame):
             else:
                 exts = [e.strip() for e in self.extensions_entry.get().split(",")] if self.extensions_entry.get() else None
                 excl = [e.strip() for e in self.exclude_entry.get().split(",")] if self.exclude_entry.get() else None
-                result = self.backup_service.backup_folder(source, dest, exts, excl, self._backup_progress)
+                job = self.backup_service.find_interrupted_job(source)
+                if job and messagebox.askyesno(t("backup_resume_title"), t("backup_resume_prompt", started=job['started_at'],
+                                                                                 count=job['completed_files'])):
+                    result = self.backup_service.resume_job(job['job_id'], self._backup_progress)
+                else:
+                    result = self.backup_service.backup_folder(source, dest, exts, excl, self._backup_progress,
+                                                               incremental=self.incremental_var.get(),
+                                                               storage="archive" if self.archive_var.get()
+                                                               else "chunks" if self.dedup_var.get() else "directory",
+                                                               pack_small_files=self.pack_var.get(), delta=self.delta_var.get())
                 if 'error' in result:
                     self._log(f"Error: {result['error']}\n")
                     self.progress_card.update_progress(0, t("status_error"), result['error'])
@@ -135,6 +171,11 @@ class BackupTab(ctk.CTkFrame):
                 self.files_card.update_value(str(result['successful']))
                 self.size_card.update_value(f"{result['total_size_mb']} MB")
                 self.failed_card.update_value(str(result['failed']))
+                if result.get('resumed'):
+                    self._log(t("backup_resumed_files", count=result['resumed']) + "\n")
+                if 'unchanged' in result:
+                    self._log(t("backup_unchanged_files", count=result['unchanged']) + "\n")
+                    self._log(t("backup_stored_size", size=result['stored_size_mb']) + "\n")
 
             self.progress_card.update_progress(1.0, t("status_completed"), "")
             messagebox.showinfo(t("info"), t("msg_backup_success"))
@@ -147,6 +188,15 @@ class BackupTab(ctk.CTkFrame):
         self.progress_card.update_progress(current / total if total else 0, t("progress_backing_up", current=current, total=total), file_path[:50])
         self._log(f"[{current}/{total}] {file_path}\n")
 
+    def _apply_throttle(self):
+        try:
+            mbps, iops = float(self.throttle_mbps_entry.get() or 0), int(self.throttle_iops_entry.get() or 0)
+        except ValueError:
+            messagebox.showerror(t("error"), t("backup_throttle_invalid"))
+            return
+        limits = self.backup_service.set_throttle(mbps, iops, self.throttle_adaptive_var.get())
+        self._log(t("backup_throttle_applied", mbps=limits['mbps'] or "-", iops=limits['iops'] or "-") + "\n")
+
     def _log(self, msg: str):
         self.log_text.insert("end", msg)
         self.log_text.see("end")
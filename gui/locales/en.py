@@ -35,6 +35,7 @@ en = {
     "search_max_results_placeholder": "Leave empty for unlimited",
     "btn_search_all_drives": "Search All Drives",
     "btn_get_drives": "Get Available Drives",
+    "btn_build_index": "Index Folder for Fast Search",
 
     # Search Results
     "search_results": "Search Results",
@@ -61,11 +62,27 @@ en = {
     "backup_source": "Source:",
     "backup_destination": "Destination (optional):",
     "backup_preserve_structure": "Preserve directory structure",
-    "backup_create_checksum": "Create checksum (MD5)",
+    "backup_create_checksum": "Create checksum",
     "backup_extensions": "File Extensions (comma-separated):",
     "backup_extensions_placeholder": "e.g., .pdf,.docx,.xlsx",
     "backup_exclude": "Exclude Patterns (comma-separated):",
     "backup_exclude_placeholder": "e.g., *.tmp,__pycache__",
+    "backup_incremental": "Incremental (only changed files)",
+    "backup_unchanged_files": "Unchanged (referenced from previous backup): {count}",
+    "backup_dedup_store": "Deduplicate (chunk store)",
+    "backup_archive": "Single compressed archive (tar)",
+    "backup_pack_small": "Pack small files together",
+    "backup_delta": "Save only changed blocks of large files (incremental)",
+    "backup_throttle_mbps": "Limit MB/s",
+    "backup_throttle_iops": "IOPS",
+    "backup_throttle_adaptive": "Slow down while the disk is busy",
+    "backup_throttle_invalid": "Limits must be numbers (0 = unlimited)",
+    "backup_throttle_applied": "I/O limit: {mbps} MB/s, {iops} IOPS",
+    "btn_apply": "Apply",
+    "backup_stored_size": "New data written: {size} MB",
+    "backup_resume_title": "Resume Backup",
+    "backup_resume_prompt": "A backup of this folder started at {started} was interrupted after {count} files.\nResume it?",
+    "backup_resumed_files": "Resumed (already copied before interruption): {count}",
     "btn_start_backup": "Start Backup",
 
     # Backup Stats
@@ -79,16 +96,25 @@ en = {
     "restore_destination": "Restore Destination:",
     "restore_verify_checksum": "Verify checksum",
     "btn_restore_file": "Restore File",
+    "btn_browse_files": "Files",
+    "btn_restore_backup": "Restore",
+    "restore_pick_file": "Select a file to restore",
+    "restore_search_placeholder": "Filter by path, press Enter",
+    "btn_select": "Select",
     "restore_management": "Backup Management",
     "restore_filter_date": "Filter by Date:",
     "restore_filter_placeholder": "YYYYMMDD (optional)",
     "available_backups": "Available Backups",
     "total_backup_size": "Total Backup Size",
     "btn_open_backup_folder": "Open Backup Folder",
+    "btn_rebuild_catalog": "Rebuild Catalog",
+    "btn_verify_backups": "Verify Backups",
+    "backup_tier_remote": "In cloud storage",
 
     # Status messages
     "status_ready": "Ready",
     "status_searching": "Searching...",
+    "status_indexing": "Indexing...",
     "status_backing_up": "Backing up...",
     "status_restoring": "Restoring...",
     "status_completed": "Completed!",
@@ -100,19 +126,28 @@ en = {
     "msg_select_backup": "Please select a backup file!",
     "msg_select_destination": "Please select restore destination!",
     "msg_search_all_drives": "This will search all available drives. This may take a while.",
+    "msg_index_built": "Indexed {count} files in {folders} folder(s). Searches there no longer scan the disk.",
     "msg_confirm_delete": "Are you sure you want to delete this backup?\n\n{path}\n\nThis action cannot be undone!",
     "msg_confirm_restore": "Restore file from:\n{backup}\n\nTo:\n{destination}",
     "msg_backup_success": "Backup completed successfully!",
     "msg_restore_success": "File restored successfully!\n\nDestination: {destination}",
+    "msg_confirm_restore_backup": "Restore every file of:\n{backup}\n\nInto:\n{destination}",
+    "msg_restore_backup_done": "Restored {restored} of {total} files into:\n{destination}",
+    "msg_scrub_done": "All stored data verified: {files} files, {size} MB",
+    "msg_scrub_paused": "Verified {files} files ({size} MB) so far; the next run continues from there",
     "msg_delete_success": "Backup deleted successfully!",
 
     # Error messages
     "error": "Error",
     "error_search_failed": "Search failed: {error}",
+    "error_index_failed": "Indexing failed: {error}",
     "error_backup_failed": "Backup failed: {error}",
     "error_restore_failed": "Restore failed: {error}",
+    "error_restore_partial": "{failed} files could not be restored:\n{errors}",
     "error_delete_failed": "Delete failed: {error}",
     "error_load_backups": "Failed to load backups: {error}",
+    "error_scrub_failed": "Verification failed: {error}",
+    "error_scrub_bad": "{count} damaged backup files found:\n{files}",
     "error_get_drives": "Failed to get drives: {error}",
 
     # Info messages
@@ -215,7 +250,7 @@ Developed with:
     "btn_clear_paths": "Clear All",
     "duplicate_comparison_method": "Comparison Method:",
     "duplicate_method_quick": "Quick (Size then Hash) - Fastest",
-    "duplicate_method_hash": "Hash (MD5) - Most Accurate",
+    "duplicate_method_hash": "Hash - Most Accurate",
     "duplicate_method_size_name": "Size + Name - Fast but less accurate",
     "duplicate_options": "Options:",
     "duplicate_min_size": "Minimum File Size (bytes):",
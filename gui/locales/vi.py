@@ -35,6 +35,7 @@ vi = {
     "search_max_results_placeholder": "Để trống = không giới hạn",
     "btn_search_all_drives": "Tìm Trên Tất Cả Ổ Đĩa",
     "btn_get_drives": "Xem Các Ổ Đĩa",
+    "btn_build_index": "Lập Chỉ Mục Thư Mục",
 
     # Search Results
     "search_results": "Kết Quả Tìm Kiếm",
@@ -61,11 +62,27 @@ vi = {
     "backup_source": "Nguồn:",
     "backup_destination": "Đích (tùy chọn):",
     "backup_preserve_structure": "Giữ nguyên cấu trúc thư mục",
-    "backup_create_checksum": "Tạo mã kiểm tra (MD5)",
+    "backup_create_checksum": "Tạo mã kiểm tra",
     "backup_extensions": "Phần Mở Rộng File (phân cách bằng dấu phẩy):",
     "backup_extensions_placeholder": "VD: .pdf,.docx,.xlsx",
     "backup_exclude": "Loại Trừ (phân cách bằng dấu phẩy):",
     "backup_exclude_placeholder": "VD: *.tmp,__pycache__",
+    "backup_incremental": "Sao lưu gia tăng (chỉ file thay đổi)",
+    "backup_unchanged_files": "Không đổi (tham chiếu từ bản sao lưu trước): {count}",
+    "backup_dedup_store": "Khử trùng lặp (kho chunk)",
+    "backup_archive": "Nén thành một tệp lưu trữ (tar)",
+    "backup_pack_small": "Gộp các tệp nhỏ vào tệp gói",
+    "backup_delta": "Chỉ lưu các khối thay đổi của tệp lớn (gia tăng)",
+    "backup_throttle_mbps": "Giới hạn MB/s",
+    "backup_throttle_iops": "IOPS",
+    "backup_throttle_adaptive": "Giảm tốc khi ổ đĩa đang bận",
+    "backup_throttle_invalid": "Giới hạn phải là số (0 = không giới hạn)",
+    "backup_throttle_applied": "Giới hạn I/O: {mbps} MB/s, {iops} IOPS",
+    "btn_apply": "Áp dụng",
+    "backup_stored_size": "Dữ liệu mới đã ghi: {size} MB",
+    "backup_resume_title": "Tiếp Tục Sao Lưu",
+    "backup_resume_prompt": "Bản sao lưu thư mục này bắt đầu lúc {started} đã bị gián đoạn sau {count} file.\nTiếp tục sao lưu?",
+    "backup_resumed_files": "Tiếp tục (đã sao chép trước khi gián đoạn): {count}",
     "btn_start_backup": "Bắt Đầu Sao Lưu",
 
     # Backup Stats
@@ -79,16 +96,25 @@ vi = {
     "restore_destination": "Đích Khôi Phục:",
     "restore_verify_checksum": "Xác minh mã kiểm tra",
     "btn_restore_file": "Khôi Phục File",
+    "btn_browse_files": "Tệp",
+    "btn_restore_backup": "Khôi phục",
+    "restore_pick_file": "Chọn file để khôi phục",
+    "restore_search_placeholder": "Lọc theo đường dẫn, nhấn Enter",
+    "btn_select": "Chọn",
     "restore_management": "Quản Lý Sao Lưu",
     "restore_filter_date": "Lọc Theo Ngày:",
     "restore_filter_placeholder": "YYYYMMDD (tùy chọn)",
     "available_backups": "Bản Sao Lưu Khả Dụng",
     "total_backup_size": "Tổng Dung Lượng Sao Lưu",
     "btn_open_backup_folder": "Mở Thư Mục Sao Lưu",
+    "btn_rebuild_catalog": "Xây Dựng Lại Danh Mục",
+    "btn_verify_backups": "Kiểm Tra Sao Lưu",
+    "backup_tier_remote": "Trên lưu trữ đám mây",
 
     # Status messages
     "status_ready": "Sẵn Sàng",
     "status_searching": "Đang Tìm Kiếm...",
+    "status_indexing": "Đang Lập Chỉ Mục...",
     "status_backing_up": "Đang Sao Lưu...",
     "status_restoring": "Đang Khôi Phục...",
     "status_completed": "Hoàn Thành!",
@@ -100,19 +126,28 @@ vi = {
     "msg_select_backup": "Vui lòng chọn file sao lưu!",
     "msg_select_destination": "Vui lòng chọn đích khôi phục!",
     "msg_search_all_drives": "Tìm kiếm trên tất cả các ổ đĩa. Có thể mất một chút thời gian.",
+    "msg_index_built": "Đã lập chỉ mục {count} file trong {folders} thư mục. Tìm kiếm tại đó không cần quét ổ đĩa nữa.",
     "msg_confirm_delete": "Bạn có chắc muốn xóa bản sao lưu này?\n\n{path}\n\nHành động này không thể hoàn tác!",
     "msg_confirm_restore": "Khôi phục file từ:\n{backup}\n\nĐến:\n{destination}",
     "msg_backup_success": "Sao lưu hoàn tất thành công!",
     "msg_restore_success": "File đã được khôi phục thành công!\n\nĐích: {destination}",
+    "msg_confirm_restore_backup": "Khôi phục toàn bộ tệp của:\n{backup}\n\nVào:\n{destination}",
+    "msg_restore_backup_done": "Đã khôi phục {restored}/{total} tệp vào:\n{destination}",
+    "msg_scrub_done": "Đã kiểm tra toàn bộ dữ liệu: {files} tệp, {size} MB",
+    "msg_scrub_paused": "Đã kiểm tra {files} tệp ({size} MB); lần chạy sau sẽ tiếp tục từ đó",
     "msg_delete_success": "Đã xóa bản sao lưu thành công!",
 
     # Error messages
     "error": "Lỗi",
     "error_search_failed": "Tìm kiếm thất bại: {error}",
+    "error_index_failed": "Lập chỉ mục thất bại: {error}",
     "error_backup_failed": "Sao lưu thất bại: {error}",
     "error_restore_failed": "Khôi phục thất bại: {error}",
+    "error_restore_partial": "Không khôi phục được {failed} tệp:\n{errors}",
     "error_delete_failed": "Xóa thất bại: {error}",
     "error_load_backups": "Không thể tải danh sách sao lưu: {error}",
+    "error_scrub_failed": "Kiểm tra thất bại: {error}",
+    "error_scrub_bad": "Phát hiện {count} tệp sao lưu bị hỏng:\n{files}",
     "error_get_drives": "Không thể lấy danh sách ổ đĩa: {error}",
 
     # Info messages
@@ -215,7 +250,7 @@ Phát triển bằng:
     "btn_clear_paths": "Xóa Tất Cả",
     "duplicate_comparison_method": "Phương Pháp So Sánh:",
     "duplicate_method_quick": "Nhanh (Kích thước rồi Hash) - Nhanh nhất",
-    "duplicate_method_hash": "Hash (MD5) - Chính xác nhất",
+    "duplicate_method_hash": "Hash - Chính xác nhất",
     "duplicate_method_size_name": "Kích thước + Tên - Nhanh nhưng kém chính xác",
     "duplicate_options": "Tùy Chọn:",
     "duplicate_min_size": "Kích Thước Tối Thiểu (bytes):",
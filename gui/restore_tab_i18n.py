@@ -1,5 +1,6 @@
 """Restore and manage backups tab UI with i18n support"""
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import filedialog, messagebox
 import threading
 from typing import Optional
@@ -54,6 +55,8 @@ class RestoreTab(ctk.CTkFrame):
         btns.pack(fill="x", padx=PADDING, pady=20)
         StyledButton(btns, text=t("btn_refresh"), command=self._refresh_backups, variant="primary").pack(fill="x", pady=5)
         StyledButton(btns, text=t("btn_open_backup_folder"), command=self._open_backup_folder, variant="primary").pack(fill="x", pady=5)
+        StyledButton(btns, text=t("btn_rebuild_catalog"), command=self._rebuild_catalog, variant="warning").pack(fill="x", pady=5)
+        StyledButton(btns, text=t("btn_verify_backups"), command=self._verify_backups, variant="primary").pack(fill="x", pady=5)
 
         # Right panel
         right = ctk.CTkFrame(container, fg_color="transparent")
@@ -93,9 +96,51 @@ class RestoreTab(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror(t("error"), t("error_restore_failed", error=str(e)))
 
+    def _restore_backup(self, backup_path: str):
+        dest = filedialog.askdirectory(title=t("restore_destination"))
+        if not dest or not messagebox.askyesno(t("info"), t("msg_confirm_restore_backup", backup=backup_path, destination=dest)):
+            return
+        threading.Thread(target=self._perform_restore_backup, args=(backup_path, dest), daemon=True).start()
+
+    def _perform_restore_backup(self, backup_path: str, dest: str):
+        try:
+            result = self.backup_service.restore_snapshot(backup_path, dest, verify_checksum=self.verify_checksum_var.get())
+            if "error" in result:
+                messagebox.showerror(t("error"), t("error_restore_failed", error=result['error']))
+            elif result['failed']:
+                errors = "\n".join(f"{e['rel_path']}: {e['error']}" for e in result['errors'][:10])
+                messagebox.showerror(t("error"), t("error_restore_partial", failed=result['failed'], errors=errors))
+            else:
+                messagebox.showinfo(t("info"), t("msg_restore_backup_done", restored=result['restored'], total=result['total_files'],
+                                                 destination=result['destination']))
+        except Exception as e:
+            messagebox.showerror(t("error"), t("error_restore_failed", error=str(e)))
+
     def _refresh_backups(self):
         threading.Thread(target=self._load_backups, daemon=True).start()
 
+    def _rebuild_catalog(self):
+        def run():
+            result = self.backup_service.rebuild_catalog()
+            if not result['success']:
+                messagebox.showerror(t("error"), t("error_load_backups", error=result.get('error')))
+                return
+            self._load_backups()
+        threading.Thread(target=run, daemon=True).start()
+
+    def _verify_backups(self):
+        def run():
+            result = self.backup_service.start_scrub(wait=True)
+            if not result['success']:
+                messagebox.showerror(t("error"), t("error_scrub_failed", error=result.get('error')))
+            elif result['bad']:
+                bad = "\n".join(f"{b.get('rel_path') or b['stored_path']}: {b['error']}" for b in result['bad'][:10])
+                messagebox.showerror(t("error"), t("error_scrub_bad", count=len(result['bad']), files=bad))
+            else:
+                key = "msg_scrub_done" if result['completed_at'] else "msg_scrub_paused"
+                messagebox.showinfo(t("info"), t(key, files=result['checked_files'], size=result['checked_mb']))
+        threading.Thread(target=run, daemon=True).start()
+
     def _load_backups(self):
         try:
             self.backups_list = self.backup_service.list_backups(self.date_filter_entry.get() or None)
@@ -124,14 +169,45 @@ class RestoreTab(ctk.CTkFrame):
         content.pack(fill="both", expand=True, padx=15, pady=10)
 
         ctk.CTkLabel(content, text=backup['name'], font=(FONT_FAMILY, 14, "bold"), text_color=PRIMARY_COLOR, anchor="w").pack(fill="x")
-        ctk.CTkLabel(content, text=f"Files: {backup['file_count']} | Size: {backup['size_mb']} MB | {backup['created'][:19]}", font=SMALL_FONT, text_color=TEXT_COLOR, anchor="w").pack(fill="x", pady=(5, 0))
+        ctk.CTkLabel(content, text=f"Files: {backup['file_count']} | Size: {backup['size_mb']} MB | {backup['created'][:19]}"
+                     + (f" | {t('backup_tier_remote')}" if backup.get("tier") == "remote" else ""), font=SMALL_FONT, text_color=TEXT_COLOR, anchor="w").pack(fill="x", pady=(5, 0))
         ctk.CTkLabel(content, text=f"Path: {backup['path']}", font=SMALL_FONT, text_color=TEXT_COLOR, anchor="w").pack(fill="x", pady=(2, 10))
 
         btns = ctk.CTkFrame(content, fg_color="transparent")
         btns.pack(fill="x")
         ctk.CTkButton(btns, text=t("btn_open_folder"), command=lambda p=backup['path']: self._open_folder(p), font=SMALL_FONT, height=30, width=100, fg_color=PRIMARY_COLOR).pack(side="left", padx=(0, 5))
+        ctk.CTkButton(btns, text=t("btn_browse_files"), command=lambda p=backup['path']: self._browse_backup_files(p), font=SMALL_FONT, height=30, width=100, fg_color=PRIMARY_COLOR).pack(side="left", padx=(0, 5))
+        ctk.CTkButton(btns, text=t("btn_restore_backup"), command=lambda p=backup['path']: self._restore_backup(p), font=SMALL_FONT, height=30, width=100, fg_color=SUCCESS_COLOR).pack(side="left", padx=(0, 5))
         ctk.CTkButton(btns, text=t("btn_delete"), command=lambda p=backup['path']: self._delete_backup(p), font=SMALL_FONT, height=30, width=100, fg_color=DANGER_COLOR).pack(side="left")
 
+    def _browse_backup_files(self, backup_path: str):
+        """Pick a file from the backup catalog; works for archive and chunk backups whose files are not on disk"""
+        win = ctk.CTkToplevel(self)
+        win.title(t("restore_pick_file"))
+        win.geometry("640x480")
+        win.grab_set()
+        search = ctk.CTkEntry(win, font=NORMAL_FONT, height=35, placeholder_text=t("restore_search_placeholder"))
+        search.pack(fill="x", padx=PADDING, pady=(PADDING, 5))
+        listbox = tk.Listbox(win, font=NORMAL_FONT, activestyle="none")
+        listbox.pack(fill="both", expand=True, padx=PADDING, pady=5)
+        files = []
+
+        def load(_event=None):
+            files[:] = self.backup_service.list_backup_files(backup_path, search.get() or None)
+            listbox.delete(0, "end")
+            for f in files:
+                listbox.insert("end", f"{f['rel_path']}  ({f['size_mb']} MB)")
+
+        def choose(_event=None):
+            if listbox.curselection():
+                self.backup_file_input.set(files[listbox.curselection()[0]]['path'])
+                win.destroy()
+
+        search.bind("<Return>", load)
+        listbox.bind("<Double-Button-1>", choose)
+        StyledButton(win, text=t("btn_select"), command=choose, variant="success").pack(fill="x", padx=PADDING, pady=(5, PADDING))
+        load()
+
     def _open_folder(self, path: str):
         try:
             import os
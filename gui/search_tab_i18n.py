@@ -6,6 +6,7 @@ from typing import Optional
 from gui.components import *
 from gui.styles import *
 from gui.i18n import t
+from app.core.config import settings
 from app.services.file_search import FileSearchService
 
 
@@ -15,6 +16,8 @@ class SearchTab(ctk.CTkFrame):
     def __init__(self, parent, **kwargs):
         super().__init__(parent, fg_color=BACKGROUND_COLOR, **kwargs)
         self.search_service = FileSearchService()
+        if settings.FILE_INDEX_WATCH:
+            self.search_service.watcher.start()
         self.search_results = []
         self.on_send_to_backup = self.on_send_to_consolidate = self.on_send_to_organizer = None
         self._create_widgets()
@@ -57,6 +60,7 @@ class SearchTab(ctk.CTkFrame):
         StyledButton(btns, text=t("btn_search"), command=self._start_search, variant="primary").pack(fill="x", pady=5)
         StyledButton(btns, text=t("btn_search_all_drives"), command=self._search_all_drives, variant="success").pack(fill="x", pady=5)
         StyledButton(btns, text=t("btn_get_drives"), command=self._show_drives, variant="primary").pack(fill="x", pady=5)
+        StyledButton(btns, text=t("btn_build_index"), command=self._start_index, variant="primary").pack(fill="x", pady=5)
 
         # Right panel
         right = ctk.CTkFrame(container, fg_color="transparent")
@@ -145,6 +149,23 @@ class SearchTab(ctk.CTkFrame):
         except Exception as e:
             messagebox.showerror(t("error"), t("error_search_failed", error=str(e)))
 
+    def _start_index(self):
+        threading.Thread(target=self._build_index, daemon=True).start()
+
+    def _build_index(self):
+        self.progress_card.update_progress(0, t("status_indexing"), "")
+        result = self.search_service.build_index([self.path_input.get()] if self.path_input.get() else None)
+        if result["success"]:
+            self.progress_card.update_progress(1.0, t("status_completed"), t("progress_found_files", count=result["file_count"]))
+            messagebox.showinfo(t("info"), t("msg_index_built", count=result["file_count"], folders=len(result["roots"])))
+        else:
+            self.progress_card.update_progress(0, t("status_error"), result["error"])
+            messagebox.showerror(t("error"), t("error_index_failed", error=result["error"]))
+
+    def destroy(self):
+        self.search_service.watcher.stop()
+        super().destroy()
+
     def _show_drives(self):
         try:
             drives = self.search_service.get_available_drives()
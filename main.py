@@ -2,10 +2,13 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from app.api.routes import router, file_search_service
 from app.core.config import settings
 from app.core.logger import app_logger
 from app.core.database import init_db
+from app.services.scheduler import BackupScheduler
+
+scheduler = BackupScheduler()
 
 
 @asynccontextmanager
@@ -17,8 +20,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         app_logger.error(f"Startup error: {e}")
         raise
+    if settings.SCHEDULER_ENABLED:
+        scheduler.start()
+    if settings.FILE_INDEX_WATCH:
+        file_search_service.watcher.start()
     yield
     app_logger.info("Shutting down...")
+    scheduler.stop(wait=False)
+    file_search_service.watcher.stop()
 
 
 app = FastAPI(title=settings.API_TITLE, version=settings.API_VERSION, description="BackupWin - Windows File Backup and Search API",
@@ -0,0 +1,170 @@
+"""A small in-process S3-compatible server for replication tests.
+
+Speaks the path-style REST calls the replicator uses (object PUT/HEAD/GET, ranged GETs and multipart uploads),
+keeps objects in memory and ignores request signing.
+"""
+import re
+import uuid
+import base64
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+class S3StandIn:
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> {"data", "metadata", "etag"}
+        self.uploads = {}  # upload id -> {"bucket", "key", "metadata", "parts": {number: (data, etag)}}
+        self.requests = []  # (method, operation, key)
+        self.fail_parts_after = None  # refuse upload_part once this many parts are stored
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "S3StandIn":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, operation: str) -> int:
+        return sum(1 for _, op, _ in self.requests if op == operation)
+
+
+def _handler(s3: S3StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _target(self):
+            url = urlsplit(self.path)
+            bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+            return bucket, key, {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def _reply(self, status: int, body: bytes = b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def _error(self, status: int, code: str):
+            self._reply(status, f"<Error><Code>{code}</Code><Message>{code}</Message></Error>".encode())
+
+        def _metadata(self):
+            return {k[11:].lower(): v for k, v in self.headers.items() if k.lower().startswith("x-amz-meta-")}
+
+        def _check_md5(self, data: bytes) -> bool:
+            md5 = self.headers.get("Content-MD5")
+            return md5 is None or base64.b64decode(md5) == hashlib.md5(data).digest()
+
+        def do_PUT(self):
+            bucket, key, query = self._target()
+            data = self._body()
+            if not self._check_md5(data):
+                return self._error(400, "BadDigest")
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            with s3.lock:
+                if "uploadId" in query:
+                    s3.requests.append(("PUT", "upload_part", key))
+                    upload = s3.uploads.get(query["uploadId"])
+                    if upload is None:
+                        return self._error(404, "NoSuchUpload")
+                    if s3.fail_parts_after is not None and len(upload["parts"]) >= s3.fail_parts_after:
+                        return self._error(403, "AccessDenied")
+                    upload["parts"][int(query["partNumber"])] = (data, etag)
+                else:
+                    s3.requests.append(("PUT", "put_object", key))
+                    s3.objects[(bucket, key)] = {"data": data, "metadata": self._metadata(), "etag": etag}
+            self._reply(200, headers={"ETag": etag})
+
+        def do_HEAD(self):
+            bucket, key, _ = self._target()
+            with s3.lock:
+                s3.requests.append(("HEAD", "head_object", key))
+                obj = s3.objects.get((bucket, key))
+            if obj is None:
+                return self._reply(404)
+            headers = {"ETag": obj["etag"], "Content-Length": str(len(obj["data"]))}
+            headers.update({f"x-amz-meta-{k}": v for k, v in obj["metadata"].items()})
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+        def do_GET(self):
+            bucket, key, query = self._target()
+            with s3.lock:
+                if "uploadId" in query:
+                    s3.requests.append(("GET", "list_parts", key))
+                    upload = s3.uploads.get(query["uploadId"])
+                    if upload is None:
+                        return self._error(404, "NoSuchUpload")
+                    parts = "".join(f"<Part><PartNumber>{n}</PartNumber><ETag>{escape(etag)}</ETag><Size>{len(data)}</Size></Part>"
+                                    for n, (data, etag) in sorted(upload["parts"].items()))
+                    body = (f"<ListPartsResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key><UploadId>{query['uploadId']}</UploadId>"
+                            f"<IsTruncated>false</IsTruncated>{parts}</ListPartsResult>")
+                    return self._reply(200, body.encode())
+                s3.requests.append(("GET", "get_object", key))
+                obj = s3.objects.get((bucket, key))
+            if obj is None:
+                return self._error(404, "NoSuchKey")
+            data, wanted = obj["data"], re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if wanted:
+                start = int(wanted.group(1))
+                end = int(wanted.group(2)) if wanted.group(2) else len(data) - 1
+                return self._reply(206, data[start:end + 1], {"ETag": obj["etag"],
+                                                              "Content-Range": f"bytes {start}-{min(end, len(data) - 1)}/{len(data)}"})
+            self._reply(200, data, {"ETag": obj["etag"]})
+
+        def do_POST(self):
+            bucket, key, query = self._target()
+            body = self._body()
+            with s3.lock:
+                if "uploads" in query:
+                    s3.requests.append(("POST", "create_multipart_upload", key))
+                    upload_id = uuid.uuid4().hex
+                    s3.uploads[upload_id] = {"bucket": bucket, "key": key, "metadata": self._metadata(), "parts": {}}
+                    result = (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                              f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+                    return self._reply(200, result.encode())
+                s3.requests.append(("POST", "complete_multipart_upload", key))
+                upload = s3.uploads.pop(query.get("uploadId"), None)
+                if upload is None:
+                    return self._error(404, "NoSuchUpload")
+                wanted = re.findall(rb"<PartNumber>(\d+)</PartNumber>\s*<ETag>([^<]+)</ETag>", body)
+                chunks = []
+                for number, etag in wanted:
+                    data, stored = upload["parts"].get(int(number), (None, None))
+                    if data is None or stored != etag.decode().replace("&quot;", '"'):
+                        return self._error(400, "InvalidPart")
+                    chunks.append(data)
+                data = b"".join(chunks)
+                etag = f'"{hashlib.md5(b"".join(hashlib.md5(c).digest() for c in chunks)).hexdigest()}-{len(chunks)}"'
+                s3.objects[(bucket, key)] = {"data": data, "metadata": upload["metadata"], "etag": etag}
+            result = f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{escape(key)}</Key><ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>"
+            self._reply(200, result.encode())
+
+        def do_DELETE(self):
+            _, key, query = self._target()
+            with s3.lock:
+                s3.requests.append(("DELETE", "abort_multipart_upload", key))
+                s3.uploads.pop(query.get("uploadId"), None)
+            self._reply(204)
+
+    return Handler
@@ -1,11 +1,29 @@
 """Tests for API endpoints"""
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
-from main import app
+from app.core.config import settings
+
+# The API builds its services on import; keep their catalog out of the default C:\Backups (a relative folder off Windows)
+_default_base = tempfile.TemporaryDirectory(prefix="backupwin-api-")
+settings.DEFAULT_BACKUP_PATH = _default_base.name
+
+from app.api import routes  # noqa: E402
+from app.services.backup import BackupService  # noqa: E402
+from app.services.file_index import FileIndex  # noqa: E402
+from app.services.file_search import FileSearchService  # noqa: E402
+from main import app  # noqa: E402
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def isolated_services(tmp_path, monkeypatch):
+    """Keep backups, catalogs and the file index of these tests in a temporary folder"""
+    monkeypatch.setattr(routes, "backup_service", BackupService(backup_base_path=str(tmp_path / "backups")))
+    monkeypatch.setattr(routes, "file_search_service", FileSearchService(FileIndex(tmp_path / "file_index.db")))
+
+
 def test_root_endpoint():
     """Test root endpoint"""
     response = client.get("/")
@@ -77,3 +95,49 @@ def test_list_backups():
     assert "success" in data
     assert "backups" in data
     assert isinstance(data["backups"], list)
+
+
+def test_throttle_endpoints():
+    """Test I/O limits can be read and changed at runtime"""
+    try:
+        response = client.put("/api/v1/backup/throttle", json={"mbps": 25, "adaptive": True})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["mbps"] == 25 and data["adaptive"] and data["iops"] == 0
+        assert client.get("/api/v1/backup/throttle").json()["effective_mbps"] == 25
+        assert client.put("/api/v1/backup/throttle", json={"mbps": -1}).status_code == 422
+    finally:
+        client.put("/api/v1/backup/throttle", json={"mbps": 0, "iops": 0, "adaptive": False})
+
+
+def test_retention_dry_run():
+    """Test the retention endpoint reports its plan"""
+    response = client.post("/api/v1/backups/retention", json={"keep_last": 1, "dry_run": True})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] and data["dry_run"]
+    assert client.post("/api/v1/backups/retention", json={"keep_daily": -1}).status_code == 422
+
+
+def test_scrub_status():
+    """Test the scrub endpoints report progress and validate their limits"""
+    response = client.get("/api/v1/backups/scrub")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] and data["phase"] in ("files", "chunks")
+    assert client.post("/api/v1/backups/scrub", json={"max_gb": -1}).status_code == 422
+
+
+def test_replicate_without_bucket(monkeypatch):
+    """Test replication reports a missing bucket setting instead of failing the request"""
+    monkeypatch.setattr(settings, "R2_BUCKET_NAME", None)
+    response = client.post("/api/v1/backups/replicate", json={})
+    assert response.status_code == 200
+    assert not response.json()["success"] and "R2_BUCKET_NAME" in response.json()["error"]
+
+
+def test_file_index_status():
+    """Test file index status endpoint"""
+    response = client.get("/api/v1/search/index")
+    assert response.status_code == 200
+    assert response.json()["success"] is True
@@ -0,0 +1,149 @@
+"""Tests for archive backups"""
+import io
+import os
+import tarfile
+import pytest
+from pathlib import Path
+from app.services import archive
+from app.services.archive import ArchiveWriter, index_path, load_compressed_extensions, open_member
+from app.services.backup import BackupService
+
+
+def open_tar(path: Path) -> tarfile.TarFile:
+    """Open an archive with standard tools only"""
+    if path.name.endswith(".tar.zst"):
+        zstandard = pytest.importorskip("zstandard")
+        with open(path, "rb") as f:
+            data = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True).read()
+        return tarfile.open(fileobj=io.BytesIO(data))
+    return tarfile.open(path, "r:gz")
+
+
+@pytest.fixture
+def source_folder(tmp_path):
+    """Create a tree with text, already-compressed and multi-frame files"""
+    src = tmp_path / "src"
+    (src / "docs").mkdir(parents=True)
+    (src / "a.txt").write_text("alpha " * 1000)
+    (src / "docs" / "b.txt").write_text("beta")
+    (src / "photo.jpg").write_bytes(os.urandom(200000))
+    (src / "big.bin").write_bytes(os.urandom(1000) * 3000)
+    (src / "empty.txt").write_bytes(b"")
+    return src
+
+
+@pytest.mark.parametrize("fmt", ["tar.gz", "tar.zst"])
+def test_archive_readable_by_tarfile(tmp_path, source_folder, fmt):
+    """Test the frame-compressed archive is a standard tar archive"""
+    if fmt == "tar.zst":
+        pytest.importorskip("zstandard")
+    writer = ArchiveWriter(tmp_path / f"out.{fmt}", fmt, threads=4, frame_size=65536, store_extensions={".jpg"})
+    files = sorted(f for f in source_folder.rglob("*") if f.is_file())
+    for f in files:
+        writer.add_file(f, f.relative_to(source_folder).as_posix())
+    stats = writer.close()
+    assert stats["frames"] > 10
+
+    with open_tar(tmp_path / f"out.{fmt}") as tar:
+        assert sorted(tar.getnames()) == sorted(f.relative_to(source_folder).as_posix() for f in files)
+        for f in files:
+            assert tar.extractfile(f.relative_to(source_folder).as_posix()).read() == f.read_bytes()
+
+
+def test_archive_output_independent_of_threads(tmp_path, source_folder):
+    """Test parallel compression produces the same bytes as a single thread"""
+    outputs = []
+    for threads in (1, 4):
+        writer = ArchiveWriter(tmp_path / f"t{threads}.tar.gz", threads=threads, frame_size=65536)
+        for f in sorted(source_folder.rglob("*")):
+            if f.is_file():
+                writer.add_file(f, f.name)
+        writer.close()
+        outputs.append((tmp_path / f"t{threads}.tar.gz").read_bytes())
+    assert outputs[0] == outputs[1]
+
+
+def test_compressed_extensions_are_stored(tmp_path):
+    """Test already-compressed files are not recompressed"""
+    assert {".jpg", ".zip", ".mp4"} <= load_compressed_extensions()
+    data = b"x" * 500000
+    (tmp_path / "a.zip").write_bytes(data)
+    writer = ArchiveWriter(tmp_path / "out.tar.gz", store_extensions={".zip"})
+    writer.add_file(tmp_path / "a.zip", "a.zip")
+    assert writer.close()["stored_bytes"] > len(data)
+
+
+@pytest.mark.parametrize("fmt", ["tar.gz", "tar.zst"])
+def test_backup_folder_archive_and_restore(tmp_path, source_folder, fmt):
+    """Test archive backups are cataloged and restorable file by file"""
+    if fmt == "tar.zst":
+        pytest.importorskip("zstandard")
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    result = service.backup_folder(str(source_folder), storage="archive", archive_format=fmt)
+    assert result["successful"] == 5 and result["failed"] == 0
+    snapshot = Path(result["snapshot"])
+    assert sorted(p.name for p in snapshot.iterdir() if not p.name.startswith(".")) == [f"backup.{fmt}", f"backup.{fmt}.idx"]
+    assert 0 < result["stored_size_mb"] < 1
+
+    for rel in ("a.txt", "docs/b.txt", "big.bin", "empty.txt", "photo.jpg"):
+        restored = service.restore_file(str(snapshot / rel), str(tmp_path / "out" / rel))
+        assert restored["success"], restored
+        assert (tmp_path / "out" / rel).read_bytes() == (source_folder / rel).read_bytes()
+
+
+def test_incremental_archive_references_previous(tmp_path, source_folder):
+    """Test an incremental archive holds only changed files"""
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    service.backup_folder(str(source_folder), str(service.backup_base_path / "snap1"), storage="archive", incremental=True)
+    (source_folder / "docs" / "b.txt").write_text("beta changed")
+    result = service.backup_folder(str(source_folder), str(service.backup_base_path / "snap2"), storage="archive",
+                                   incremental=True)
+    assert result["unchanged"] == 4 and len(result["files"]) == 1
+
+    with open_tar(Path(result["snapshot"]) / "backup.tar.gz") as tar:
+        assert tar.getnames() == ["docs/b.txt"]
+    entry = service.catalog.find_file(Path(result["snapshot"]) / "big.bin")
+    with open_member(entry["location"]) as f:
+        assert f.read() == (source_folder / "big.bin").read_bytes()
+
+
+def test_index_reads_only_needed_frames(tmp_path, monkeypatch):
+    """Test restoring one member decompresses only the frames that hold it"""
+    (tmp_path / "big.bin").write_bytes(os.urandom(2000000))
+    (tmp_path / "small.txt").write_text("needle")
+    writer = ArchiveWriter(tmp_path / "out.tar.gz", frame_size=65536)
+    writer.add_file(tmp_path / "big.bin", "big.bin")
+    added = writer.add_file(tmp_path / "small.txt", "small.txt")
+    assert writer.close()["frames"] > 30
+
+    calls = []
+    decompress = archive._decompress
+    monkeypatch.setattr(archive, "_decompress", lambda fmt, data: calls.append(len(data)) or decompress(fmt, data))
+    with open_member({"path": str(tmp_path / "out.tar.gz"), "offset": added["offset"], "size": 6}) as f:
+        assert f.read() == b"needle"
+    assert len(calls) == 1
+
+
+def test_restore_from_archive_member_path(tmp_path, source_folder):
+    """Test files can be restored by their path inside an archive and listed per backup"""
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    result = service.backup_folder(str(source_folder), storage="archive")
+    archive_file = Path(result["snapshot"]) / "backup.tar.gz"
+
+    restored = service.restore_file(str(archive_file / "docs" / "b.txt"), str(tmp_path / "b.txt"))
+    assert restored["success"] and (tmp_path / "b.txt").read_text() == "beta"
+
+    files = service.list_backup_files(result["snapshot"], pattern="b")
+    assert [f["rel_path"] for f in files] == ["big.bin", "docs/b.txt"]
+    assert service.restore_file(files[1]["path"], str(tmp_path / "b2.txt"))["success"]
+
+
+def test_restore_without_index_falls_back(tmp_path, source_folder):
+    """Test archives whose index is missing are still restorable"""
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    result = service.backup_folder(str(source_folder), storage="archive")
+    index_path(Path(result["snapshot"]) / "backup.tar.gz").unlink()
+
+    restored = service.restore_file(str(Path(result["snapshot"]) / "big.bin"), str(tmp_path / "big.bin"))
+    assert restored["success"]
+    assert (tmp_path / "big.bin").read_bytes() == (source_folder / "big.bin").read_bytes()
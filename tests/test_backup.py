@@ -120,3 +120,139 @@ def test_restore_file(backup_service, test_file):
 
     finally:
         Path(temp_restore).unlink(missing_ok=True)
+
+
+@pytest.mark.parametrize("verify_mode", ["none", "full", "sample"])
+def test_backup_file_verify_modes(test_file, verify_mode):
+    """Test that every verify policy yields the source checksum"""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        service = BackupService(backup_base_path=temp_dir, verify_mode=verify_mode)
+        result = service.backup_file(source_file=test_file)
+
+        assert result["success"] is True
+        assert result["checksum"] == service._calculate_checksum(Path(test_file))
+        assert Path(result["destination"]).read_bytes() == Path(test_file).read_bytes()
+        assert not list(Path(temp_dir).rglob("*.part"))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_backup_file_without_checksum(backup_service, test_file):
+    """Test backing up without checksum skips hashing"""
+    result = backup_service.backup_file(source_file=test_file, create_checksum=False)
+
+    assert result["success"] is True
+    assert result["checksum"] is None
+
+
+def test_invalid_verify_mode(tmp_path):
+    """Test unknown verify policy is rejected"""
+    with pytest.raises(ValueError):
+        BackupService(backup_base_path=str(tmp_path), verify_mode="sometimes")
+
+
+def test_backup_files_parallel(backup_service, tmp_path):
+    """Test parallel backup aggregates results in input order with ordered progress"""
+    sources = []
+    for i in range(12):
+        f = tmp_path / f"dir{i % 3}" / f"file{i}.txt"
+        f.parent.mkdir(exist_ok=True)
+        f.write_text("x" * (i * 100 + 1))
+        sources.append(str(f))
+    sources.append(str(tmp_path / "missing.txt"))
+    progress = []
+
+    result = backup_service.backup_files(sources, progress_callback=lambda c, t, f: progress.append(c),
+                                         workers=4, max_inflight_mb=1)
+
+    assert result["successful"] == 12
+    assert result["failed"] == 1
+    assert [r["source"] for r in result["files"]] == [str(Path(s).absolute()) for s in sources[:12]]
+    assert progress == list(range(1, 14))
+
+
+def test_incremental_backup_folder(backup_service, tmp_path):
+    """Test incremental backup copies only changed files and restores referenced ones"""
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    (src / "a.txt").write_text("alpha")
+    (src / "sub" / "b.txt").write_text("beta")
+
+    first = backup_service.backup_folder(str(src), str(Path(backup_service.backup_base_path) / "snap1"), incremental=True)
+    assert first["successful"] == 2
+    assert first["unchanged"] == 0
+
+    (src / "a.txt").write_text("alpha changed")
+    (src / "c.txt").write_text("gamma")
+    second = backup_service.backup_folder(str(src), str(Path(backup_service.backup_base_path) / "snap2"), incremental=True)
+    assert second["successful"] == 3
+    assert second["unchanged"] == 1
+    assert len(second["files"]) == 2
+    assert not (Path(second["snapshot"]) / "sub" / "b.txt").exists()
+
+    restored = tmp_path / "restored_b.txt"
+    result = backup_service.restore_file(str(Path(second["snapshot"]) / "sub" / "b.txt"), str(restored))
+    assert result["success"] is True
+    assert restored.read_text() == "beta"
+
+    backups = {b["name"]: b for b in backup_service.list_backups()}
+    assert backups["snap2"]["file_count"] == 3
+
+
+@pytest.mark.parametrize("options", [{"storage": "directory"}, {"storage": "archive"}, {"storage": "chunks"},
+                                     {"pack_small_files": True}])
+def test_restore_snapshot(backup_service, tmp_path, options):
+    """Test a whole backup restores in parallel, and include patterns restore a subset"""
+    src = tmp_path / "src"
+    (src / "docs" / "deep").mkdir(parents=True)
+    files = {"a.txt": b"alpha", "docs/b.txt": b"beta" * 1000, "docs/deep/c.bin": bytes(range(256)) * 100}
+    for rel, data in files.items():
+        (src / rel).write_bytes(data)
+    snapshot = backup_service.backup_folder(str(src), str(backup_service.backup_base_path / "snap"), incremental=True,
+                                            **options)["snapshot"]
+
+    restored = backup_service.restore_snapshot(snapshot, str(tmp_path / "out"), workers=3)
+    assert restored["success"] and restored["restored"] == 3, restored
+    assert {rel: (tmp_path / "out" / rel).read_bytes() for rel in files} == files
+
+    subset = backup_service.restore_snapshot(snapshot, str(tmp_path / "subset"), include=["docs/*"])
+    assert subset["restored"] == 2
+    assert not (tmp_path / "subset" / "a.txt").exists()
+
+
+def test_restore_snapshot_reports_corruption(backup_service, tmp_path):
+    """Test a backup copy that no longer matches its stored checksum fails without stopping the rest"""
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "good.txt").write_text("good")
+    (src / "bad.txt").write_text("original")
+    result = backup_service.backup_folder(str(src), str(backup_service.backup_base_path / "snap"), incremental=True)
+    (Path(result["snapshot"]) / "bad.txt").write_text("tampered")
+
+    restored = backup_service.restore_snapshot(result["snapshot"], str(tmp_path / "out"))
+    assert not restored["success"]
+    assert restored["restored"] == 1 and [e["rel_path"] for e in restored["errors"]] == ["bad.txt"]
+    assert backup_service.restore_snapshot(str(tmp_path / "missing"), str(tmp_path / "out"))["success"] is False
+
+
+def test_snapshots_started_together_get_their_own_folders(backup_service, tmp_path, monkeypatch):
+    """Test backups started in the same second write separate snapshots instead of sharing one folder"""
+    from app.services import backup as backup_module
+
+    class FrozenClock(backup_module.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls(2024, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(backup_module, "datetime", FrozenClock)
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("alpha")
+    snapshots = [backup_service.backup_folder(str(src), incremental=True, **options)["snapshot"]
+                 for options in ({"pack_small_files": True}, {"storage": "archive"}, {"storage": "chunks"})]
+    assert [Path(s).name for s in snapshots] == ["backup_20240101_120000", "backup_20240101_120000_1", "backup_20240101_120000_2"]
+    assert len({b["path"] for b in backup_service.list_backups()}) == 3
+    for i, snapshot in enumerate(snapshots):
+        restored = backup_service.restore_snapshot(snapshot, str(tmp_path / f"out{i}"))
+        assert restored["success"] and (tmp_path / f"out{i}" / "a.txt").read_text() == "alpha"
@@ -0,0 +1,74 @@
+"""Tests for the backup catalog"""
+import pytest
+from pathlib import Path
+from app.services.backup import BackupService
+
+
+@pytest.fixture
+def backup_service(tmp_path):
+    """Create backup service with temporary directory"""
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def source_folder(tmp_path):
+    """Create a small source tree"""
+    src = tmp_path / "src"
+    (src / "docs").mkdir(parents=True)
+    (src / "a.txt").write_text("alpha")
+    (src / "docs" / "b.txt").write_text("beta beta")
+    return src
+
+
+def test_backup_is_cataloged(backup_service, source_folder):
+    """Test completed backups appear in the catalog without rescanning"""
+    result = backup_service.backup_folder(str(source_folder), str(backup_service.backup_base_path / "20240101_full"))
+    assert result["successful"] == 2
+
+    backups = backup_service.catalog.list_snapshots()
+    assert [b["name"] for b in backups] == ["20240101_full"]
+    assert backups[0]["file_count"] == 2
+    assert backups[0]["size_bytes"] == 14
+
+
+def test_list_backups_date_filter(backup_service, source_folder):
+    """Test date prefix filter uses the catalog"""
+    backup_service.backup_folder(str(source_folder), str(backup_service.backup_base_path / "20240101_a"))
+    backup_service.backup_folder(str(source_folder), str(backup_service.backup_base_path / "20240202_b"))
+
+    assert [b["name"] for b in backup_service.list_backups("202402")] == ["20240202_b"]
+    assert len(backup_service.list_backups()) == 2
+
+
+def test_rebuild_catalog_scans_legacy_folders(backup_service):
+    """Test rebuild picks up folders written before the catalog existed"""
+    legacy = backup_service.backup_base_path / "20230505_old" / "docs"
+    legacy.mkdir(parents=True)
+    (legacy / "report.txt").write_text("12345")
+
+    result = backup_service.rebuild_catalog()
+    assert result["success"] is True
+    assert result["snapshots"] == 1
+    backups = backup_service.list_backups()
+    assert backups[0]["name"] == "20230505_old"
+    assert backups[0]["file_count"] == 1
+    assert backups[0]["mode"] == "legacy"
+
+
+def test_delete_backup_updates_catalog(backup_service, source_folder):
+    """Test deleting a backup removes it from the catalog"""
+    result = backup_service.backup_folder(str(source_folder), str(backup_service.backup_base_path / "snap"))
+    snapshot = Path(result["files"][0]["destination"]).parents[1]
+
+    assert backup_service.delete_backup(str(snapshot))["success"] is True
+    assert backup_service.list_backups() == []
+
+
+def test_find_file(backup_service, source_folder):
+    """Test per-file lookup by backup path"""
+    result = backup_service.backup_folder(str(source_folder), str(backup_service.backup_base_path / "snap"), incremental=True)
+    entry = backup_service.catalog.find_file(Path(result["snapshot"]) / "docs" / "b.txt")
+
+    assert entry["size"] == 9
+    assert entry["checksum"] is not None
+    assert backup_service.catalog.find_file(Path(result["snapshot"]) / "missing.txt") is None
@@ -0,0 +1,86 @@
+"""Tests for the deduplicating chunk store"""
+import io
+import os
+import random
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from app.services.backup import BackupService
+from app.services.chunk_store import ChunkStore
+
+
+@pytest.fixture
+def chunk_store(tmp_path):
+    """Create a chunk store with small chunk sizes"""
+    return ChunkStore(tmp_path / "store", min_size=1024, avg_size=4096, max_size=16384)
+
+
+@pytest.fixture
+def random_data():
+    """Deterministic pseudo-random payload"""
+    return random.Random(42).randbytes(300000)
+
+
+def test_split_roundtrip(chunk_store, random_data):
+    """Test chunks respect size limits and reassemble to the input"""
+    chunks = list(chunk_store.split(io.BytesIO(random_data), read_size=50000))
+    assert b"".join(chunks) == random_data
+    assert all(len(c) <= chunk_store.max_size for c in chunks)
+    assert all(len(c) >= chunk_store.min_size for c in chunks[:-1])
+
+
+def test_shifted_data_deduplicates(chunk_store, random_data, tmp_path):
+    """Test inserting bytes at the front only costs the chunks around the edit"""
+    original, shifted = tmp_path / "a.bin", tmp_path / "b.bin"
+    original.write_bytes(random_data)
+    shifted.write_bytes(b"inserted header" + random_data)
+
+    first = chunk_store.store_file(original)
+    second = chunk_store.store_file(shifted)
+
+    assert first["new_chunks"] == len(first["chunks"])
+    assert second["new_chunks"] <= 2
+    assert len(set(first["chunks"]) & set(second["chunks"])) >= len(first["chunks"]) - 2
+
+
+def test_concurrent_readers(chunk_store, random_data, tmp_path):
+    """Test many readers can stream the same file at once"""
+    src = tmp_path / "data.bin"
+    src.write_bytes(random_data)
+    stored = chunk_store.store_file(src)
+
+    def read_all(_):
+        with chunk_store.open(stored["chunks"]) as f:
+            return f.read()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(data == random_data for data in pool.map(read_all, range(16)))
+
+
+def test_corrupt_chunk_detected(chunk_store, random_data, tmp_path):
+    """Test a damaged chunk fails verification on read"""
+    src = tmp_path / "data.bin"
+    src.write_bytes(random_data)
+    digest = chunk_store.store_file(src)["chunks"][0]
+    chunk_store.chunk_path(digest).write_bytes(b"R" + b"garbage")
+
+    with pytest.raises(IOError):
+        chunk_store.get_chunk(digest)
+
+
+def test_backup_folder_to_chunk_store(tmp_path, random_data):
+    """Test folder backups into the chunk store restore byte-for-byte"""
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "big.bin").write_bytes(random_data * 4)
+    (src / "copy.bin").write_bytes(random_data * 4)
+
+    result = service.backup_folder(str(src), storage="chunks")
+    assert result["successful"] == 2
+    assert result["stored_size_mb"] < result["total_size_mb"]
+
+    restored = tmp_path / "restored.bin"
+    r = service.restore_file(os.path.join(result["snapshot"], "copy.bin"), str(restored))
+    assert r["success"] is True
+    assert restored.read_bytes() == random_data * 4
@@ -0,0 +1,71 @@
+"""Tests for the copy engine's kernel and buffered copy paths"""
+import io
+import os
+import errno
+import hashlib
+import pytest
+from app.services import copy_engine
+from app.services.copy_engine import ChecksumMismatchError, CopyEngine, copy_file, copy_data
+
+
+@pytest.fixture
+def big_file(tmp_path):
+    """Create a 3 MB file that spans several copy blocks"""
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(3 * 1048576 + 123))
+    os.utime(path, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    return path
+
+
+def unsupported(*args):
+    raise OSError(errno.ENOSYS, "not supported")
+
+
+@pytest.mark.parametrize("disable", [[], ["copy_file_range"], ["copy_file_range", "sendfile"]])
+def test_copy_file_falls_back(big_file, tmp_path, monkeypatch, disable):
+    """Test copy_file works with copy_file_range, sendfile and the buffered fallback"""
+    for name in disable:
+        monkeypatch.setattr(os, name, unsupported, raising=False)
+    dest = copy_file(big_file, tmp_path / "copy.bin")
+
+    assert dest.read_bytes() == big_file.read_bytes()
+    assert dest.stat().st_mtime_ns == big_file.stat().st_mtime_ns
+
+
+def test_unhashed_copy_uses_kernel(big_file, tmp_path, monkeypatch):
+    """Test copies without hashing never pull the data through Python buffers"""
+    monkeypatch.setattr(copy_engine, "iter_blocks", lambda *a: pytest.fail("buffered path used"))
+    if not (hasattr(os, "copy_file_range") or hasattr(os, "sendfile")):
+        pytest.skip("No kernel copy on this platform")
+    result = CopyEngine(verify="none").copy(big_file, tmp_path / "copy.bin", hash_data=False)
+    assert result["size_bytes"] == big_file.stat().st_size
+    assert (tmp_path / "copy.bin").read_bytes() == big_file.read_bytes()
+
+
+@pytest.mark.parametrize("verify", ["full", "sample"])
+def test_hashed_copy_with_reused_buffer(big_file, tmp_path, verify):
+    """Test hashing copies through the reusable buffer match the source checksum"""
+    engine = CopyEngine(block_size=65536, verify=verify, sample_blocks=4, algorithm="md5")
+    result = engine.copy(big_file, tmp_path / "copy.bin")
+    assert result["checksum"] == hashlib.md5(big_file.read_bytes()).hexdigest()
+    assert engine.file_checksum(tmp_path / "copy.bin") == result["checksum"]
+
+
+@pytest.mark.parametrize("verify", ["none", "full", "sample"])
+def test_failed_verification_keeps_destination(big_file, tmp_path, verify):
+    """Test a copy that fails its checksum leaves the existing destination alone and no temp file"""
+    dest = tmp_path / "existing.bin"
+    dest.write_bytes(b"user data")
+    engine = CopyEngine(block_size=65536, verify=verify, algorithm="md5")
+    with pytest.raises(ChecksumMismatchError):
+        engine.copy(big_file, dest, expected_checksum="0" * 32)
+    assert dest.read_bytes() == b"user data"
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith(".part")] == []
+
+
+def test_copy_data_from_stream_without_fd(tmp_path):
+    """Test streams with no file descriptor use the buffered path"""
+    data = os.urandom(300000)
+    with open(tmp_path / "out.bin", "wb") as fout:
+        assert copy_data(io.BufferedReader(io.BytesIO(data)), fout, len(data), block_size=4096) == len(data)
+    assert (tmp_path / "out.bin").read_bytes() == data
@@ -0,0 +1,92 @@
+"""Tests for rsync-style delta backups"""
+import io
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+from app.services.delta import FileRange, Signature, open_delta, write_delta
+
+BLOCK = 4096
+
+
+def modified(data: bytes, seed: int) -> bytes:
+    """Overwrite a few bytes and insert a short run, shifting everything after it"""
+    data = bytearray(data)
+    data[seed * 1000:seed * 1000 + 50] = os.urandom(50)
+    return bytes(data[:len(data) // 2]) + os.urandom(seed) + bytes(data[len(data) // 2:])
+
+
+@pytest.fixture
+def delta_settings(monkeypatch):
+    """Treat every file as large and use small blocks"""
+    monkeypatch.setattr(settings, "DELTA_MIN_MB", 0)
+    monkeypatch.setattr(settings, "DELTA_BLOCK_KB", BLOCK // 1024)
+
+
+def test_write_delta_roundtrip(tmp_path):
+    """Test a delta holds only changed data and rebuilds the new version exactly"""
+    old = os.urandom(BLOCK * 100 + 77)
+    new = modified(old, 7) + b"appended"
+    (tmp_path / "old").write_bytes(old)
+    (tmp_path / "new").write_bytes(new)
+    with open(tmp_path / "old", "rb") as f:
+        sig = Signature.of_stream(f, BLOCK)
+
+    written = write_delta(tmp_path / "new", sig, tmp_path / "new.delta")
+    assert written["literal_bytes"] < 3 * BLOCK
+    assert written["stored_bytes"] < len(new) // 10
+    location = {"path": str(tmp_path / "new.delta"), "base": {"type": "file", "path": str(tmp_path / "old")}}
+    with open_delta(location, lambda base: FileRange(base["path"])) as f:
+        assert f.read() == new
+    assert written["signature"].blocks == Signature.of_stream(io.BytesIO(new), BLOCK).blocks
+
+
+def test_unrelated_file_is_not_delta_encoded(tmp_path):
+    """Test a mostly rewritten file falls back to a full copy"""
+    (tmp_path / "old").write_bytes(os.urandom(BLOCK * 50))
+    (tmp_path / "new").write_bytes(os.urandom(BLOCK * 50))
+    with open(tmp_path / "old", "rb") as f:
+        sig = Signature.of_stream(f, BLOCK)
+    assert write_delta(tmp_path / "new", sig, tmp_path / "new.delta") is None
+    assert not (tmp_path / "new.delta").exists()
+
+
+def test_incremental_delta_chain(tmp_path, delta_settings, monkeypatch):
+    """Test incremental backups store deltas, reuse cached signatures and restore every version"""
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    src = tmp_path / "src"
+    src.mkdir()
+    versions = [os.urandom(BLOCK * 200)]
+    (src / "mailbox.pst").write_bytes(versions[0])
+    service.backup_folder(str(src), str(tmp_path / "backups" / "s0"), incremental=True, delta=True)
+
+    for i in (1, 2):
+        if i == 2:
+            monkeypatch.setattr(Signature, "of_stream", lambda *a: pytest.fail("previous version re-read"))
+        versions.append(modified(versions[-1], i))
+        (src / "mailbox.pst").write_bytes(versions[-1])
+        result = service.backup_folder(str(src), str(tmp_path / "backups" / f"s{i}"), incremental=True, delta=True)
+        assert result["successful"] == 1 and result["failed"] == 0
+        assert result["stored_size_mb"] < 0.1
+        assert not (tmp_path / "backups" / f"s{i}" / "mailbox.pst").exists()
+
+    for i, data in enumerate(versions):
+        restored = service.restore_file(str(tmp_path / "backups" / f"s{i}" / "mailbox.pst"), str(tmp_path / f"out{i}"))
+        assert restored["success"], restored
+        assert (tmp_path / f"out{i}").read_bytes() == data
+
+
+def test_delta_chain_limit(tmp_path, delta_settings, monkeypatch):
+    """Test a full copy is stored again once the delta chain reaches its limit"""
+    monkeypatch.setattr(settings, "DELTA_MAX_CHAIN", 1)
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    src = tmp_path / "src"
+    src.mkdir()
+    data = os.urandom(BLOCK * 50)
+    for i in range(3):
+        data = modified(data, i + 1) if i else data
+        (src / "disk.vhd").write_bytes(data)
+        service.backup_folder(str(src), str(tmp_path / "backups" / f"s{i}"), incremental=True, delta=True)
+    assert not (tmp_path / "backups" / "s1" / "disk.vhd").exists()
+    assert (tmp_path / "backups" / "s2" / "disk.vhd").read_bytes() == data
@@ -0,0 +1,197 @@
+"""Tests for the persistent file index behind search"""
+import os
+import time
+import pytest
+from datetime import datetime
+from pathlib import Path
+from app.services.file_index import FileIndex
+from app.services.file_search import FileSearchService
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "data"
+    (root / "docs" / "old").mkdir(parents=True)
+    (root / "pics").mkdir()
+    (root / "docs" / "Report_2024.PDF").write_bytes(b"x" * 3000)
+    (root / "docs" / "report_2023.pdf").write_bytes(b"x" * 100)
+    (root / "docs" / "notes [draft].txt").write_text("notes")
+    (root / "docs" / "old" / "report_2019.pdf").write_bytes(b"x" * 50)
+    (root / "pics" / "cat.jpg").write_bytes(b"x" * 5000)
+    (root / "pics" / "archive.tar.gz").write_bytes(b"x" * 10)
+    past = time.time() - 30 * 86400
+    os.utime(root / "docs" / "old" / "report_2019.pdf", (past, past))
+    return root
+
+
+@pytest.fixture
+def service(tmp_path, tree):
+    service = FileSearchService(FileIndex(tmp_path / "index" / "files.db"))
+    assert service.build_index([str(tree)], workers=2)["file_count"] == 6
+    return service
+
+
+def names(results):
+    return sorted(f["name"] for f in results)
+
+
+QUERIES = [
+    {"file_pattern": "report_*"},
+    {"file_pattern": "*.pdf"},
+    {"file_pattern": "*.pdf", "case_sensitive": True},
+    {"file_pattern": "*[draft]*"},
+    {"file_extension": ".gz"},
+    {"file_extension": "tar.gz"},
+    {"file_pattern": "*", "min_size": 100, "max_size": 4000},
+    {"file_pattern": "*", "recursive": False},
+    {"file_pattern": "*port*"},
+    {"file_pattern": "*REPORT*2024*"},
+    {"file_pattern": "*port*2024*", "case_sensitive": True},
+    {"file_pattern": "*ep?rt_20??*"},
+    {"file_pattern": "*at*"},
+    {"file_extension": "ar.gz"},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_walk(service, tree, query):
+    """Test indexed searches return what a live walk returns"""
+    for folder in (tree, tree / "docs"):
+        indexed = names(service.index.search(str(folder), **query))
+        walked = names(service.search_files(str(folder), use_index=False, **query))
+        assert indexed == walked, (folder, query)
+
+
+def test_index_filters_and_scope(service, tree):
+    """Test date filters, result limits and sub-folder scopes"""
+    cutoff = datetime.fromtimestamp(time.time() - 86400)
+    assert names(service.index.search(str(tree), "*.pdf", modified_before=cutoff)) == ["report_2019.pdf"]
+    assert "report_2019.pdf" not in names(service.index.search(str(tree), "*.pdf", modified_after=cutoff))
+    assert len(list(service.index.search(str(tree), max_results=2))) == 2
+    assert names(service.index.search(str(tree / "docs" / "old"))) == ["report_2019.pdf"]
+    result = next(service.index.search(str(tree / "pics"), "cat*"))
+    assert result["path"] == str((tree / "pics" / "cat.jpg").absolute()) and result["size"] == 5000
+
+
+def test_reindex_and_fallback(service, tree, tmp_path):
+    """Test indexing again drops deleted files, and paths outside the index are walked"""
+    (tree / "pics" / "cat.jpg").unlink()
+    assert "cat.jpg" in names(service.index.search(str(tree)))
+    service.build_index([str(tree)])
+    assert "cat.jpg" not in names(service.index.search(str(tree)))
+
+    outside = tmp_path / "elsewhere"
+    outside.mkdir()
+    (outside / "loose.txt").write_text("x")
+    assert names(service.search_files(str(outside))) == ["loose.txt"]
+    assert service.index_status()["roots"][0]["path"] == str(tree.absolute())
+
+
+def test_unwatched_index_is_not_searched(service, tree):
+    """Test changes made after indexing show up in searches while nothing keeps the index current"""
+    assert not service.index_status()["watching"]
+    (tree / "pics" / "cat.jpg").unlink()
+    (tree / "pics" / "dog.jpg").write_text("new")
+    assert "cat.jpg" in names(service.index.search(str(tree)))
+    found = names(service.search_files(str(tree), "*.jpg"))
+    assert found == ["dog.jpg"] == names(service.search_files(str(tree), "*.jpg", use_index=False))
+
+
+def test_prefix_pattern_uses_name_index(service, tree):
+    """Test a pattern with a fixed start is answered with a range scan of the name index"""
+    with service.index._connect() as conn:
+        plan = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM files f WHERE f.name_lower GLOB ?", ("report_*",)))
+    assert "idx_files_name" in plan
+
+
+def test_reconcile_writes_only_changes(service, tree):
+    """Test reconciling picks up added, changed and removed files and leaves the rest alone"""
+    (tree / "pics" / "cat.jpg").unlink()
+    (tree / "docs" / "report_2023.pdf").write_bytes(b"x" * 200)
+    (tree / "new").mkdir()
+    (tree / "new" / "added.txt").write_text("new")
+    result = service.index.reconcile(str(tree))
+    assert (result["added"], result["updated"], result["removed"], result["file_count"]) == (1, 1, 1, 6)
+    assert names(service.index.search(str(tree))) == names(service.search_files(str(tree), use_index=False))
+    again = service.index.reconcile(str(tree))
+    assert again["added"] == again["updated"] == again["removed"] == 0
+
+
+def test_refresh_applies_changed_paths(service, tree):
+    """Test refreshing files, moved folders and deleted paths keeps the index and its count right"""
+    (tree / "docs" / "old").rename(tree / "archive")
+    (tree / "pics" / "dog.jpg").write_bytes(b"x" * 10)
+    result = service.index.refresh([str(tree / "docs" / "old"), str(tree / "archive"), str(tree / "pics" / "dog.jpg"),
+                                    str(tree.parent / "not_indexed.txt")])
+    assert result == {"added": 2, "updated": 0, "removed": 1}
+    assert names(service.index.search(str(tree))) == names(service.search_files(str(tree), use_index=False))
+    assert service.index_status()["file_count"] == 7
+
+
+def test_watcher_follows_changes(service, tree):
+    """Test the watcher applies filesystem events to the index"""
+    pytest.importorskip("watchdog")
+    watcher = service.watcher
+    watcher.delay = 0.1
+    assert watcher.start()
+    try:
+        deadline = time.time() + 10
+        while str(tree.absolute()) not in watcher.status()["watched_roots"] and time.time() < deadline:
+            time.sleep(0.05)
+        (tree / "pics" / "cat.jpg").unlink()
+        (tree / "docs" / "fresh.txt").write_text("fresh")
+        (tree / "docs" / "old").rename(tree / "docs" / "older")
+        expected = names(service.search_files(str(tree), use_index=False))
+        while names(service.search_files(str(tree))) != expected and time.time() < deadline:
+            time.sleep(0.05)
+        assert names(service.search_files(str(tree))) == expected
+        assert names(service.search_files(str(tree / "docs" / "older"))) == ["report_2019.pdf"]
+    finally:
+        watcher.stop()
+    assert not service.index_status()["watching"]
+
+
+def test_infix_pattern_uses_trigrams(service, tree):
+    """Test patterns without a fixed start narrow candidates with the trigram index, kept in step with changes"""
+    assert service.index.trigrams
+    with service.index._connect() as conn:
+        plan = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM files f WHERE f.id IN (SELECT rowid FROM name_trigrams WHERE name_trigrams MATCH ?)",
+            ('"rep" AND "por"',)))
+    assert "name_trigrams" in plan and "VIRTUAL TABLE" in plan
+    (tree / "docs" / "report_2023.pdf").rename(tree / "docs" / "summary_2023.pdf")
+    service.index.reconcile(str(tree))
+    assert names(service.index.search(str(tree), "*mmary*")) == ["summary_2023.pdf"]
+    assert names(service.index.search(str(tree), "*port_20*")) == ["Report_2024.PDF", "report_2019.pdf"]
+    status = service.index_status()
+    assert status["trigram_mb"] > 0 and status["cache_mb"] == service.index.cache_mb
+
+
+def test_overlapping_roots_are_merged(service, tree):
+    """Test indexing a folder inside or around indexed roots keeps one root and an exact file count"""
+    (tree / "docs" / "extra.txt").write_text("extra")
+    service.build_index([str(tree / "docs")])
+    status = service.index_status()
+    assert [r["path"] for r in status["roots"]] == [str(tree.absolute())] and status["file_count"] == 7
+
+    service.index.remove_root(str(tree))
+    service.build_index([str(tree / "docs"), str(tree / "pics")])
+    assert len(service.index_status()["roots"]) == 2
+    service.build_index([str(tree)])
+    status = service.index_status()
+    assert [r["path"] for r in status["roots"]] == [str(tree.absolute())] and status["file_count"] == 7
+    assert names(service.index.search(str(tree))) == names(service.search_files(str(tree), use_index=False))
+
+
+def test_scope_covers_any_case_and_character(tmp_path, tree, monkeypatch):
+    """Test folders typed in another case match where paths ignore case, and names beyond U+FFFF stay in scope"""
+    (tree / "docs" / "\U0001F4C1 emoji").mkdir()
+    (tree / "docs" / "\U0001F4C1 emoji" / "inside.txt").write_text("x")
+    monkeypatch.setattr(os.path, "normcase", str.lower)  # as on Windows
+    index = FileIndex(tmp_path / "nocase.db")
+    index.index_root(str(tree))
+    typed = str(tree / "docs").swapcase()
+    assert index.covering_root(typed) == str(tree.absolute())
+    assert names(index.search(typed, "*.txt")) == ["inside.txt", "notes [draft].txt"]
+    assert "inside.txt" in names(index.search(str(tree), "*.txt"))
@@ -0,0 +1,71 @@
+"""Tests for configurable checksum algorithms"""
+import hashlib
+import pytest
+from pathlib import Path
+from app.core import hashing
+from app.core.config import Settings, settings
+from app.core.hashing import Hasher, available_algorithms, checksum_algorithm, checksum_bytes
+from app.services.backup import BackupService
+from app.services.duplicate_finder import DuplicateFinderService
+
+
+@pytest.mark.parametrize("algorithm", available_algorithms())
+def test_checksum_records_algorithm(algorithm):
+    """Test checksums name their algorithm, except legacy MD5, and fit 64-character columns"""
+    checksum = checksum_bytes(b"data", algorithm)
+    assert checksum_algorithm(checksum) == algorithm
+    assert len(checksum) <= 64
+    if algorithm == "md5":
+        assert checksum == hashlib.md5(b"data").hexdigest()
+
+
+def test_missing_optional_algorithm(monkeypatch):
+    """Test an algorithm whose package is missing is reported, not silently replaced"""
+    monkeypatch.setattr(hashing, "xxhash", None)
+    assert "xxh3" not in available_algorithms()
+    with pytest.raises(ValueError, match="xxhash"):
+        Hasher("xxh3")
+
+
+def test_default_is_legacy_md5():
+    """Test checksums keep the bare MD5 format unless another algorithm is chosen"""
+    assert Settings.model_fields["HASH_ALGORITHM"].default == "md5"
+    assert checksum_bytes(b"data", Settings().HASH_ALGORITHM) == hashlib.md5(b"data").hexdigest()
+
+
+def test_auto_picks_an_available_algorithm(monkeypatch):
+    """Test "auto" resolves to an installed algorithm"""
+    monkeypatch.setattr(settings, "HASH_ALGORITHM", "auto")
+    assert Hasher().algorithm in available_algorithms()
+
+
+@pytest.mark.parametrize("storage", ["directory", "chunks", "archive"])
+def test_old_md5_backups_still_verify(tmp_path, monkeypatch, storage):
+    """Test backups made with MD5 restore with verification after the algorithm changes"""
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.txt").write_text("alpha" * 1000)
+    monkeypatch.setattr(settings, "HASH_ALGORITHM", "md5")
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    result = service.backup_folder(str(src), incremental=True, storage=storage)
+    assert result["files"][0]["checksum"] == hashlib.md5((src / "a.txt").read_bytes()).hexdigest()
+
+    monkeypatch.setattr(settings, "HASH_ALGORITHM", "blake2b")
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    restored = service.restore_file(str(Path(result["snapshot"]) / "a.txt"), str(tmp_path / "out.txt"))
+    assert restored["success"], restored
+    assert restored["checksum"] == result["files"][0]["checksum"]
+
+    (src / "b.txt").write_text("beta")
+    second = service.backup_folder(str(src), incremental=True, storage=storage)
+    assert checksum_algorithm(second["files"][0]["checksum"]) == "blake2b"
+
+
+def test_duplicate_finder_uses_configured_algorithm(tmp_path):
+    """Test duplicate detection works with a non-MD5 algorithm"""
+    for name in ("a.bin", "b.bin"):
+        (tmp_path / name).write_bytes(b"same" * 1000)
+    (tmp_path / "c.bin").write_bytes(b"diff" * 1000)
+    result = DuplicateFinderService(algorithm="blake2b").scan_for_duplicates([str(tmp_path)])
+    assert len(result["duplicate_groups"]) == 1 and result["total_duplicates"] == 1
+    assert checksum_algorithm(result["duplicate_groups"][0]["hash"]) == "blake2b"
@@ -0,0 +1,105 @@
+"""Tests for resumable backup jobs"""
+import pytest
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core import database
+from app.models.backup import BackupJob, BackupFile, BackupStatus
+from app.services.backup import BackupService
+from app.services.journal import BackupJournal
+
+
+@pytest.fixture
+def backup_service(tmp_path):
+    """Create backup service with temporary directory"""
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def source_folder(tmp_path):
+    """Create a source tree of ten files"""
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for i in range(10):
+        (src / ("sub" if i % 2 else "") / f"f{i}.txt").write_text(f"content {i}" * (i + 1))
+    return src
+
+
+def interrupt_after(n):
+    """Progress callback that simulates a crash after n files"""
+    def callback(current, total, path):
+        if current >= n:
+            raise RuntimeError("simulated crash")
+    return callback
+
+
+@pytest.mark.parametrize("options", [{}, {"incremental": True}, {"storage": "chunks"}])
+def test_interrupted_job_resumes(backup_service, source_folder, monkeypatch, options):
+    """Test an interrupted folder backup skips files its journal already holds"""
+    result = backup_service.backup_folder(str(source_folder), progress_callback=interrupt_after(4), **options)
+    assert not result["success"]
+
+    jobs = backup_service.list_jobs()
+    assert len(jobs) == 1 and jobs[0]["status"] == BackupStatus.IN_PROGRESS.value
+    assert jobs[0]["completed_files"] == 4 and not jobs[0]["running"]
+    assert backup_service.find_interrupted_job(str(source_folder))["job_id"] == jobs[0]["job_id"]
+
+    copied = []
+    copy, store_file = backup_service.copy_engine.copy, backup_service.chunk_store.store_file
+    monkeypatch.setattr(backup_service.copy_engine, "copy", lambda src, *a, **kw: copied.append(src) or copy(src, *a, **kw))
+    monkeypatch.setattr(backup_service.chunk_store, "store_file", lambda src: copied.append(src) or store_file(src))
+    result = backup_service.resume_job(jobs[0]["job_id"])
+
+    assert result["successful"] == 10 and result["resumed"] == 4
+    assert len(copied) == 6
+    assert backup_service.list_jobs() == []
+    assert backup_service.catalog.list_snapshots()[0]["file_count"] == 10
+    restored = backup_service.restore_file(str(Path(jobs[0]["destination"]) / "sub" / "f9.txt"), str(source_folder.parent / "out.txt"))
+    assert restored["success"]
+    assert (source_folder.parent / "out.txt").read_text() == (source_folder / "sub" / "f9.txt").read_text()
+
+
+def test_backup_folder_resume_flag(backup_service, source_folder):
+    """Test resume=True continues a matching interrupted job and otherwise starts fresh"""
+    backup_service.backup_folder(str(source_folder), progress_callback=interrupt_after(3))
+    job_id = backup_service.list_jobs()[0]["job_id"]
+
+    result = backup_service.backup_folder(str(source_folder), resume=True)
+    assert result["job_id"] == job_id and result["resumed"] == 3
+
+    result = backup_service.backup_folder(str(source_folder), resume=True)
+    assert result["job_id"] != job_id and result["resumed"] == 0
+
+
+def test_journal_ignores_torn_line(tmp_path):
+    """Test a partially written last record is dropped and overwritten on append"""
+    journal = BackupJournal.create(tmp_path, "/src", "/dest", {})
+    journal.record("a", {"source": "/src/a", "destination": "/dest/a", "size_bytes": 1, "mtime_ns": 1, "checksum": None})
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(b'{"type": "file", "key": "b", "res')
+
+    loaded = BackupJournal.load(journal.path)
+    assert list(loaded.completed) == ["a"] and loaded.completed_bytes == 1
+    loaded.record("c", {"source": "/src/c", "destination": "/dest/c", "size_bytes": 2, "mtime_ns": 2, "checksum": None})
+    loaded.close()
+    assert list(BackupJournal.load(journal.path).completed) == ["a", "c"]
+
+
+def test_job_mirrored_to_database(backup_service, source_folder, monkeypatch):
+    """Test jobs and their files are recorded in the BackupJob/BackupFile tables"""
+    engine = create_engine("sqlite://")
+    database.Base.metadata.create_all(bind=engine, tables=[BackupJob.__table__, BackupFile.__table__])
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+
+    backup_service.backup_folder(str(source_folder), progress_callback=interrupt_after(4))
+    db = database.SessionLocal()
+    job = db.query(BackupJob).one()
+    assert job.status == BackupStatus.IN_PROGRESS and job.successful_count == 4
+
+    backup_service.resume_job(backup_service.list_jobs()[0]["job_id"])
+    db.expire_all()
+    job = db.query(BackupJob).one()
+    assert job.status == BackupStatus.COMPLETED and job.successful_count == 10 and job.completed_at
+    assert db.query(BackupFile).filter(BackupFile.backup_job_id == job.id).count() == 10
+    db.close()
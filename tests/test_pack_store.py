@@ -0,0 +1,100 @@
+"""Tests for packing small files into pack files"""
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+from app.services.copy_engine import ChecksumMismatchError
+from app.services.journal import BackupJournal, JOURNAL_SUFFIX
+from app.services.pack_store import PackWriter, PACKS_DIR, open_packed
+
+
+@pytest.fixture
+def backup_service(tmp_path):
+    """Create backup service with temporary directory"""
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def source_folder(tmp_path):
+    """Create a tree of many small files and one large file"""
+    src = tmp_path / "src"
+    (src / "sub").mkdir(parents=True)
+    for i in range(50):
+        (src / ("sub" if i % 2 else "") / f"f{i}.txt").write_text(f"small {i}" * (i + 1))
+    (src / "large.bin").write_bytes(os.urandom(settings.PACK_THRESHOLD_KB * 1024 + 1))
+    return src
+
+
+def test_pack_writer_rolls_over(tmp_path):
+    """Test a new pack is started once the current one reaches max_size"""
+    writer = PackWriter(tmp_path / PACKS_DIR, max_size=1000)
+    locations = []
+    for i in range(10):
+        (tmp_path / f"{i}.bin").write_bytes(bytes([i]) * 300)
+        locations.append(writer.add(tmp_path / f"{i}.bin", f"{i}.bin")["location"])
+    writer.close("full")
+
+    assert len(list((tmp_path / PACKS_DIR).glob("*.pack"))) == 4
+    assert len(list((tmp_path / PACKS_DIR).glob("*.idx"))) == 4
+    for i, location in enumerate(locations):
+        assert open_packed(location).read() == bytes([i]) * 300
+
+
+def test_pack_verify_detects_corruption(tmp_path):
+    """Test verification on close compares packed bytes with the source checksums"""
+    (tmp_path / "a.txt").write_text("original")
+    writer = PackWriter(tmp_path / PACKS_DIR)
+    location = writer.add(tmp_path / "a.txt", "a.txt")["location"]
+    writer._pack.flush()
+    with open(location["path"], "r+b") as f:
+        f.write(b"X")
+    with pytest.raises(ChecksumMismatchError):
+        writer.close("full")
+
+
+@pytest.mark.parametrize("options", [{}, {"incremental": True}])
+def test_backup_folder_packs_small_files(backup_service, source_folder, tmp_path, options):
+    """Test small files land in a few packs, large files stay individual and all restore"""
+    dest = backup_service.backup_base_path / "snap"
+    result = backup_service.backup_folder(str(source_folder), str(dest), pack_small_files=True, **options)
+    assert result["successful"] == 51 and result["failed"] == 0
+
+    written = [p for p in dest.rglob("*") if p.is_file() and PACKS_DIR not in p.parts and not p.name.startswith(".")]
+    assert [p.name for p in written] == ["large.bin"]
+    assert len(list((dest / PACKS_DIR).glob("*.pack"))) == 1
+
+    for i, r in enumerate(sorted(result["files"], key=lambda r: r["source"])[:3] + [result["files"][-1]]):
+        restored = backup_service.restore_file(r["destination"], str(tmp_path / "out" / f"{i}"))
+        assert restored["success"], restored
+        assert (tmp_path / "out" / f"{i}").read_bytes() == Path(r["source"]).read_bytes()
+
+
+def test_backup_files_packs_small_files(backup_service, source_folder, tmp_path):
+    """Test plain file backups pack small files and restore them through the manifest"""
+    files = [str(p) for p in sorted(source_folder.glob("*.txt"))]
+    result = backup_service.backup_files(files, str(tmp_path / "dest"), pack_small_files=True)
+    assert result["successful"] == 25
+    assert not list((tmp_path / "dest").rglob("*.txt"))
+
+    restored = backup_service.restore_file(result["files"][0]["destination"], str(tmp_path / "out.txt"))
+    assert restored["success"], restored
+    assert (tmp_path / "out.txt").read_bytes() == Path(result["files"][0]["source"]).read_bytes()
+
+
+def test_packed_job_resumes(backup_service, source_folder, monkeypatch):
+    """Test a resumed job skips files already packed"""
+    def crash(current, total, path):
+        if current >= 20:
+            raise RuntimeError("simulated crash")
+    assert not backup_service.backup_folder(str(source_folder), progress_callback=crash, pack_small_files=True)["success"]
+    job = backup_service.list_jobs()[0]
+    done = set(BackupJournal.load(backup_service.jobs_path / f"{job['job_id']}{JOURNAL_SUFFIX}").completed)
+
+    packed = []
+    add = PackWriter.add
+    monkeypatch.setattr(PackWriter, "add", lambda self, src, name: packed.append(src) or add(self, src, name))
+    result = backup_service.resume_job(job["job_id"])
+    assert result["successful"] == 51 and result["resumed"] == 20
+    assert len(packed) == 50 - len(done - {str(source_folder / "large.bin")})
+    assert not done & {str(p) for p in packed}
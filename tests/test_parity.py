@@ -0,0 +1,97 @@
+"""Tests for Reed-Solomon parity files"""
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+from app.services.parity import ParityWriter, parity_path, repair_file
+
+BLOCK = 4096
+
+
+def protect(path: Path, data: bytes, percent: float = 10, data_blocks: int = 16) -> ParityWriter:
+    path.write_bytes(data)
+    writer = ParityWriter(path, percent, BLOCK, data_blocks)
+    for i in range(0, len(data), 10000):
+        writer.update(data[i:i + 10000])
+    writer.close()
+    return writer
+
+
+def damage(path: Path, blocks):
+    data = bytearray(path.read_bytes())
+    for b in blocks:
+        data[b * BLOCK + 17] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_repairs_damaged_blocks(tmp_path):
+    """Test up to the parity block count of damaged blocks per stripe are rebuilt in place"""
+    path, data = tmp_path / "a.pack", os.urandom(BLOCK * 40 + 123)
+    assert protect(path, data).parity_blocks == 2
+    damage(path, [0, 15, 16, 30, 40])  # two in each of the first two stripes and the short last block
+
+    assert repair_file(path, dry_run=True)["bad_blocks"] == 5
+    result = repair_file(path)
+    assert result["success"] and result["repaired_blocks"] == 5
+    assert path.read_bytes() == data
+    assert repair_file(path)["bad_blocks"] == 0
+
+
+def test_too_much_damage_is_reported(tmp_path):
+    """Test a stripe with more damaged blocks than parity blocks is left alone and reported"""
+    path, data = tmp_path / "a.pack", os.urandom(BLOCK * 32)
+    protect(path, data)
+    damage(path, [1, 2, 3, 20])
+    result = repair_file(path)
+    assert not result["success"] and result["unrecoverable_blocks"] == 3 and result["repaired_blocks"] == 1
+    assert repair_file(tmp_path / "missing.pack")["error"] == "No parity file"
+
+
+def test_truncated_file(tmp_path):
+    """Test a file cut short inside its last stripe is rebuilt to full length"""
+    path, data = tmp_path / "a.pack", os.urandom(BLOCK * 20)
+    protect(path, data, percent=25)
+    path.write_bytes(data[:BLOCK * 18 + 5])
+    assert repair_file(path)["success"]
+    assert path.read_bytes() == data
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PARITY_PERCENT", 10)
+    monkeypatch.setattr(settings, "PARITY_BLOCK_KB", 4)
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def src(tmp_path):
+    folder = tmp_path / "src"
+    folder.mkdir()
+    for i in range(20):
+        (folder / f"file{i}.bin").write_bytes(os.urandom(3000 + i * 500))
+    return folder
+
+
+@pytest.mark.parametrize("options", [{"pack_small_files": True}, {"storage": "archive", "archive_format": "tar.gz"}])
+def test_restore_repairs_backup(service, src, tmp_path, options):
+    """Test restoring a backup rebuilds a damaged pack file or archive from its parity file"""
+    result = service.backup_folder(str(src), str(service.backup_base_path / "s0"), incremental=True, **options)
+    stored = next(p for p in Path(result["snapshot"]).rglob("*") if p.suffix in (".pack", ".gz"))
+    assert parity_path(stored).is_file()
+    damage(stored, [1])
+
+    restored = service.restore_snapshot(result["snapshot"], str(tmp_path / "out"))
+    assert restored["success"] and restored["restored"] == 20, restored
+    assert all((tmp_path / "out" / f.name).read_bytes() == f.read_bytes() for f in src.iterdir())
+
+
+def test_scrub_repairs_pack(service, src):
+    """Test the scrubber repairs a damaged pack file and reports the repair instead of bad files"""
+    result = service.backup_folder(str(src), str(service.backup_base_path / "s0"), incremental=True, pack_small_files=True)
+    stored = next(Path(result["snapshot"]).rglob("*.pack"))
+    damage(stored, [2, 5])
+
+    status = service.start_scrub(wait=True)
+    assert status["completed_at"] and not status["bad"]
+    assert [(r["stored_path"], r["blocks"]) for r in status["repaired"]] == [(str(stored), 2)]
@@ -0,0 +1,100 @@
+"""Tests for S3/R2 replication, run against a local S3-compatible stand-in"""
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+from app.services.replication import S3Replicator, s3_client
+
+pytest.importorskip("boto3")
+from tests.s3_standin import S3StandIn  # noqa: E402
+
+MB = 1048576
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    server = S3StandIn().start()
+    monkeypatch.setattr(settings, "S3_ENDPOINT_URL", server.endpoint)
+    monkeypatch.setattr(settings, "S3_REGION", "us-east-1")
+    monkeypatch.setattr(settings, "R2_ACCESS_KEY_ID", "test")
+    monkeypatch.setattr(settings, "R2_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(settings, "R2_BUCKET_NAME", "backups")
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def base(tmp_path):
+    folder = tmp_path / "base"
+    (folder / "snap").mkdir(parents=True)
+    for i in range(5):
+        (folder / "snap" / f"small{i}.txt").write_text(f"small {i} " * 100)
+    (folder / "snap" / "big.bin").write_bytes(os.urandom(12 * MB + 12345))
+    return folder
+
+
+def replicator(base: Path, **kwargs) -> S3Replicator:
+    return S3Replicator(base, s3_client(), "backups", "offsite", workers=4, part_size=5 * MB, **kwargs)
+
+
+def files(base: Path):
+    return sorted(p for p in base.rglob("*") if p.is_file() and not p.name.startswith(".replication"))
+
+
+def test_uploads_and_skips(s3, base):
+    """Test small files go whole, large ones as parallel multipart uploads, and a second run uploads nothing"""
+    result = replicator(base).replicate(files(base))
+    assert result["success"] and result["uploaded"] == 6
+    assert s3.count("upload_part") == 3 and s3.count("put_object") == 5
+    for p in files(base):
+        obj = s3.objects[("backups", "offsite/" + p.relative_to(base).as_posix())]
+        assert obj["data"] == p.read_bytes() and obj["metadata"]["checksum"].startswith("sha256:")
+
+    requests = len(s3.requests)
+    again = replicator(base).replicate(files(base))
+    assert again["skipped"] == 6 and again["uploaded"] == 0 and len(s3.requests) == requests
+
+
+def test_skips_objects_already_in_bucket(s3, base, tmp_path):
+    """Test a fresh state still skips objects the bucket holds with the same checksum"""
+    replicator(base).replicate(files(base))
+    (base / "snap" / "small0.txt").write_text("changed")
+    result = replicator(base, state_path=tmp_path / "other.db").replicate(files(base))
+    assert result["uploaded"] == 1 and result["skipped"] == 5
+    assert s3.objects[("backups", "offsite/snap/small0.txt")]["data"] == b"changed"
+
+
+def test_resumes_interrupted_multipart_upload(s3, base):
+    """Test a failed multipart upload continues with only the parts the bucket is missing"""
+    s3.fail_parts_after = 1
+    result = replicator(base).replicate([base / "snap" / "big.bin"])
+    assert result["failed"] == 1 and ("backups", "offsite/snap/big.bin") not in s3.objects
+    stored = len(next(iter(s3.uploads.values()))["parts"])
+
+    s3.fail_parts_after = None
+    before = s3.count("upload_part")
+    result = replicator(base).replicate([base / "snap" / "big.bin"])
+    assert result["success"] and result["resumed"] == 1
+    assert s3.count("upload_part") - before == 3 - stored
+    assert s3.objects[("backups", "offsite/snap/big.bin")]["data"] == (base / "snap" / "big.bin").read_bytes()
+
+
+def test_replicate_backup(s3, tmp_path, monkeypatch):
+    """Test replicating one incremental backup also uploads the data it shares with older backups"""
+    monkeypatch.setattr(settings, "REPLICATION_PREFIX", "")
+    service = BackupService(backup_base_path=str(tmp_path / "backups"))
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "same.txt").write_text("same")
+    first = service.backup_folder(str(src), str(service.backup_base_path / "s0"), incremental=True)
+    (src / "new.txt").write_text("new")
+    second = service.backup_folder(str(src), str(service.backup_base_path / "s1"), incremental=True)
+
+    result = service.replicate(second["snapshot"])
+    assert result["success"], result
+    keys = {key for _, key in s3.objects}
+    old = Path(first["snapshot"]).relative_to(service.backup_base_path.absolute()).as_posix()
+    assert any(k.startswith(old) and k.endswith("same.txt") for k in keys)
+    assert [key for _, op, key in s3.requests if op == "put_object"][-1].endswith(".backupwin_manifest.json")
+    assert not any(k.startswith((".catalog", ".replication")) for k in keys)
@@ -0,0 +1,136 @@
+"""Tests for retention policies and pruning"""
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+from app.services.retention import RETAINED_DIR, TRASH_DIR, plan_retention
+
+
+def snapshot(created: str, source: str = "C:\\Data") -> dict:
+    return {"path": f"/b/{source[-4:]}_{created}", "name": created, "source": source, "created": created, "size_mb": 1}
+
+
+@pytest.fixture
+def service(tmp_path):
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def src(tmp_path):
+    folder = tmp_path / "src"
+    folder.mkdir()
+    (folder / "same.txt").write_text("unchanged " * 1000)
+    (folder / "changes.txt").write_text("version 0")
+    return folder
+
+
+def backup(service, src, name, **options):
+    result = service.backup_folder(str(src), str(service.backup_base_path / name), incremental=True, **options)
+    assert result["failed"] == 0, result
+    return Path(result["snapshot"])
+
+
+def restore_all(service, snapshot: Path, out: Path) -> dict:
+    files = {}
+    for f in service.list_backup_files(str(snapshot)):
+        restored = service.restore_file(f["path"], str(out / f["rel_path"]))
+        assert restored["success"], restored
+        files[f["rel_path"]] = (out / f["rel_path"]).read_bytes()
+    return files
+
+
+def test_plan_keeps_one_per_period():
+    """Test daily, weekly and monthly buckets and that each source keeps its newest snapshot"""
+    snapshots = [snapshot(f"2024-01-{d:02d} 0{h}:00:00") for d in (1, 2, 3, 10, 20) for h in (1, 2)]
+    snapshots.append(snapshot("2023-06-01 00:00:00", source="D:\\Old"))
+    prune = plan_retention(snapshots, keep_daily=2, keep_weekly=3)
+    kept = {s["name"] for s in snapshots} - {s["name"] for s in prune}
+    assert kept == {"2024-01-20 02:00:00", "2024-01-10 02:00:00", "2024-01-03 02:00:00", "2023-06-01 00:00:00"}
+    assert [s["name"] for s in prune] == sorted(s["name"] for s in prune)
+    assert {s["reason"] for s in prune} == {"policy"}
+
+
+def test_plan_size_cap_counts_shared_data():
+    """Test the size cap prunes the oldest snapshots and only counts data no kept snapshot shares"""
+    snapshots = [snapshot(f"2024-01-0{d} 00:00:00") for d in (1, 2, 3)]
+    paths = [s["path"] for s in snapshots]
+    objects = {paths[0]: {"shared": 100, "old": 50}, paths[1]: {"shared": 100, "mid": 50}, paths[2]: {"shared": 100, "new": 50}}
+    prune = plan_retention(snapshots, keep_last=3, max_bytes=160, objects=objects)
+    assert [(s["path"], s["reason"]) for s in prune] == [(paths[0], "size"), (paths[1], "size")]
+    assert plan_retention(snapshots, keep_last=3, max_bytes=1000, objects=objects) == []
+
+
+def test_delete_keeps_data_of_later_incrementals(service, src, tmp_path):
+    """Test deleting the base of an incremental chain keeps the files later snapshots reference"""
+    first = backup(service, src, "s0")
+    (src / "changes.txt").write_text("version 1")
+    second = backup(service, src, "s1")
+
+    assert service.delete_backup(str(first))["success"]
+    service.pruner.wait()
+    assert not first.exists()
+    assert [b["path"] for b in service.list_backups()] == [str(second)]
+    assert restore_all(service, second, tmp_path / "out") == {"same.txt": b"unchanged " * 1000, "changes.txt": b"version 1"}
+    assert not any((service.backup_base_path / TRASH_DIR).iterdir())
+
+    assert service.delete_backup(str(second))["success"]
+    service.pruner.wait()
+    assert not [p for p in (service.backup_base_path / RETAINED_DIR).rglob("*") if p.is_file()]
+
+
+def test_chunk_garbage_collection(service, src, tmp_path):
+    """Test chunks are freed once no snapshot needs them, and shared chunks stay"""
+    (src / "big.bin").write_bytes(os.urandom(300000))
+    first = backup(service, src, "s0", storage="chunks")
+    (src / "big.bin").write_bytes(os.urandom(300000))
+    second = backup(service, src, "s1", storage="chunks")
+    before = service.chunk_store.stats()["chunk_count"]
+
+    assert service.delete_backup(str(first))["success"]
+    service.pruner.wait()
+    assert service.pruner.last_purge["deleted_files"] > 0
+    assert service.chunk_store.stats()["chunk_count"] < before
+    assert restore_all(service, second, tmp_path / "out")["changes.txt"] == b"version 0"
+
+
+def test_prune_delta_chain(service, src, tmp_path, monkeypatch):
+    """Test pruning the snapshots under a delta chain keeps the newest version restorable"""
+    monkeypatch.setattr(settings, "DELTA_MIN_MB", 0)
+    monkeypatch.setattr(settings, "DELTA_BLOCK_KB", 4)
+    data = bytearray(os.urandom(4096 * 40))
+    snapshots = []
+    for i in range(3):
+        data[i * 5000:i * 5000 + 10] = os.urandom(10)
+        (src / "disk.vhd").write_bytes(bytes(data))
+        snapshots.append(backup(service, src, f"s{i}", delta=True))
+    assert not (snapshots[2] / "disk.vhd").exists()
+
+    result = service.apply_retention(keep_last=1, keep_daily=0, keep_weekly=0, keep_monthly=0, max_total_gb=0)
+    assert [p["path"] for p in result["pruned"]] == [str(s) for s in snapshots[:2]]
+    service.pruner.wait()
+    restored = service.restore_file(str(snapshots[2] / "disk.vhd"), str(tmp_path / "disk.vhd"))
+    assert restored["success"], restored
+    assert (tmp_path / "disk.vhd").read_bytes() == bytes(data)
+
+
+def test_retention_dry_run(service, src):
+    """Test a dry run reports the plan without deleting anything"""
+    for i in range(3):
+        backup(service, src, f"s{i}")
+    result = service.apply_retention(keep_last=1, keep_daily=0, keep_weekly=0, keep_monthly=0, max_total_gb=0, dry_run=True)
+    assert result["success"] and result["kept"] == 1 and len(result["pruned"]) == 2
+    assert len(service.list_backups()) == 3
+
+
+def test_running_backup_blocks_other_services(service, src):
+    """Test a backup running in one service stops deletes from another service on the same base"""
+    old = backup(service, src, "old")
+    other = BackupService(backup_base_path=str(service.backup_base_path))
+    (src / "changes.txt").write_text("version 1")
+    attempts = []
+    service.backup_folder(str(src), str(service.backup_base_path / "new"), incremental=True,
+                          progress_callback=lambda *a: attempts.append(other.delete_backup(str(old))))
+    assert attempts and not any(a["success"] for a in attempts)
+    assert "backup is running" in attempts[0]["error"] and old.exists()
+    assert other.delete_backup(str(old))["success"]
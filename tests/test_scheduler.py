@@ -0,0 +1,127 @@
+"""Tests for the backup schedule executor"""
+import threading
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core import database
+from app.models.backup import BackupSchedule
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import BackupScheduler, CronExpression
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2024, 1, 1, 10, 7), datetime(2024, 1, 1, 10, 15)),
+    ("30 2 * * *", datetime(2024, 1, 1, 2, 30), datetime(2024, 1, 2, 2, 30)),
+    ("0 9 * * mon-fri", datetime(2024, 1, 5, 10, 0), datetime(2024, 1, 8, 9, 0)),
+    ("0 0 31 * *", datetime(2024, 4, 1), datetime(2024, 5, 31)),
+    ("0 0 29 feb *", datetime(2024, 3, 1), datetime(2028, 2, 29)),
+    ("0 0 1 * 7", datetime(2024, 1, 1), datetime(2024, 1, 7)),
+    ("@weekly", datetime(2024, 1, 1), datetime(2024, 1, 7)),
+])
+def test_cron_next_after(expression, after, expected):
+    """Test next run times, including names, Sunday as 7 and the day-of-month/day-of-week OR rule"""
+    assert CronExpression(expression).next_after(after) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "0 0 * 13 *", "*/0 * * * *", "0 0 30 feb *"])
+def test_cron_rejects_invalid(expression):
+    """Test malformed or never-matching expressions raise ValueError"""
+    with pytest.raises(ValueError):
+        CronExpression(expression).next_after(datetime(2024, 1, 1))
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    database.Base.metadata.create_all(bind=engine, tables=[BackupSchedule.__table__])
+    return sessionmaker(bind=engine)
+
+
+def add_schedule(factory, tmp_path, name, destination, cron="0 * * * *", next_run_at=None):
+    src = tmp_path / name
+    src.mkdir()
+    (src / "file.txt").write_text(name)
+    with factory() as db:
+        schedule = BackupSchedule(name=name, source_path=str(src), destination_path=str(destination),
+                                  cron_expression=cron, is_active=True, next_run_at=next_run_at)
+        db.add(schedule)
+        db.commit()
+        return schedule.id
+
+
+def test_due_schedule_runs_and_persists_times(tmp_path, session_factory):
+    """Test a due schedule backs up into its destination and stores last/next run times"""
+    sid = add_schedule(session_factory, tmp_path, "docs", tmp_path / "dest", next_run_at=datetime(2024, 1, 1, 9, 0))
+    later = add_schedule(session_factory, tmp_path, "later", tmp_path / "dest2", next_run_at=datetime(2024, 1, 1, 11, 0))
+    scheduler = BackupScheduler(session_factory=session_factory)
+    now = datetime(2024, 1, 1, 10, 30)
+    assert scheduler.tick(now) == [sid]
+    scheduler.stop()
+
+    assert scheduler.last_results[sid]["successful"] == 1
+    assert list((tmp_path / "dest").glob("docs_*/file.txt"))
+    with session_factory() as db:
+        schedule = db.get(BackupSchedule, sid)
+        assert schedule.last_run_at == now
+        assert schedule.next_run_at == datetime(2024, 1, 1, 11, 0)
+        assert db.get(BackupSchedule, later).last_run_at is None
+
+
+def test_missing_next_run_is_scheduled_not_run(tmp_path, session_factory):
+    """Test a new schedule gets its next run time instead of running immediately"""
+    sid = add_schedule(session_factory, tmp_path, "new", tmp_path / "dest")
+    scheduler = BackupScheduler(session_factory=session_factory)
+    assert scheduler.tick(datetime(2024, 1, 1, 10, 30)) == []
+    with session_factory() as db:
+        assert db.get(BackupSchedule, sid).next_run_at == datetime(2024, 1, 1, 11, 0)
+
+
+def test_per_destination_limit(tmp_path, session_factory, monkeypatch):
+    """Test only one job per destination disk runs at a time and a running schedule is not started again"""
+    release = threading.Event()
+    monkeypatch.setattr(scheduler_module.BackupService, "backup_folder", lambda *a, **k: release.wait(5) and {"successful": 0, "failed": 0})
+    due = datetime(2024, 1, 1, 9, 0)
+    first = add_schedule(session_factory, tmp_path, "a", tmp_path / "dest", cron="* * * * *", next_run_at=due)
+    second = add_schedule(session_factory, tmp_path, "b", tmp_path / "dest" / "nested", cron="* * * * *", next_run_at=due)
+    scheduler = BackupScheduler(workers=4, per_destination=1, session_factory=session_factory)
+    try:
+        assert scheduler.tick(datetime(2024, 1, 1, 9, 0)) == [first]
+        assert scheduler.tick(datetime(2024, 1, 1, 9, 5)) == []
+        assert scheduler.running() == [first]
+    finally:
+        release.set()
+        scheduler.stop()
+    # The schedule that has waited longest gets the free slot
+    assert scheduler.tick(datetime(2024, 1, 1, 9, 10)) == [second]
+    scheduler.stop()
+
+
+def test_start_checks_the_database(tmp_path, session_factory):
+    """Test the scheduler does not start when the database cannot be reached"""
+    unreachable = sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'missing' / 'app.db'}"))
+    assert BackupScheduler(session_factory=unreachable).start() is False
+    scheduler = BackupScheduler(poll_seconds=3600, session_factory=session_factory)
+    try:
+        assert scheduler.start() is True
+    finally:
+        scheduler.stop()
+
+
+def test_failed_commit_releases_claims(tmp_path, session_factory, monkeypatch):
+    """Test a tick whose commit fails gives back its worker slots, so the schedule runs at the next tick"""
+    sid = add_schedule(session_factory, tmp_path, "docs", tmp_path / "dest", next_run_at=datetime(2024, 1, 1, 9, 0))
+    scheduler = BackupScheduler(workers=1, session_factory=session_factory)
+
+    def locked(*args, **kwargs):
+        raise RuntimeError("database is locked")
+
+    with monkeypatch.context() as m:
+        m.setattr(session_factory.class_, "commit", locked)
+        with pytest.raises(RuntimeError):
+            scheduler.tick(datetime(2024, 1, 1, 9, 0))
+    assert scheduler.running() == []
+    try:
+        assert scheduler.tick(datetime(2024, 1, 1, 9, 0)) == [sid]
+    finally:
+        scheduler.stop()
@@ -0,0 +1,81 @@
+"""Tests for the background integrity scrubber"""
+import os
+import pytest
+from pathlib import Path
+from app.services.backup import BackupService
+
+
+@pytest.fixture
+def service(tmp_path):
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def src(tmp_path):
+    folder = tmp_path / "src"
+    folder.mkdir()
+    for i in range(6):
+        (folder / f"file{i}.txt").write_text(f"content {i} " * 500)
+    return folder
+
+
+def backup(service, src, name, **options):
+    result = service.backup_folder(str(src), str(service.backup_base_path / name), incremental=True, **options)
+    assert result["failed"] == 0, result
+    return Path(result["snapshot"])
+
+
+def corrupt(path: Path):
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+
+def test_scrub_finds_corrupt_file(service, src):
+    """Test a flipped byte in a stored file is reported with the files that need it"""
+    first = backup(service, src, "s0")
+    second = backup(service, src, "s1")
+    corrupt(first / "file3.txt")
+
+    status = service.start_scrub(wait=True)
+    assert status["success"] and status["completed_at"]
+    assert status["checked_files"] == 6 and status["skipped_files"] == 6  # s1 only points at s0's copies
+    assert [(b["rel_path"], b["error"]) for b in status["bad"]] == [("file3.txt", "Checksum mismatch")]
+    assert {a["snapshot"] for a in status["bad"][0]["affected"]} == {str(first), str(second)}
+
+
+def test_scrub_resumes_in_slices(service, src):
+    """Test a byte budget stops the scrub and the next run continues from the saved position"""
+    backup(service, src, "s0")
+    size = (src / "file0.txt").stat().st_size
+    service.rebuild_catalog()
+    status = service.scrubber.run(max_bytes=2 * size, batch=2)
+    assert status["completed_at"] is None and status["checked_files"] == 2
+
+    status = service.scrubber.run(batch=2)
+    assert status["completed_at"] and status["checked_files"] == 6 and not status["bad"]
+    # A finished pass is kept as the last one and the next run starts over
+    status = service.scrubber.run(max_bytes=size, batch=2)
+    assert status["last_pass"]["checked_files"] == 6 and status["checked_files"] == 2
+
+
+def test_scrub_reports_corrupt_chunk(service, src):
+    """Test chunks are verified and a bad one names the files built from it"""
+    (src / "big.bin").write_bytes(os.urandom(200000))
+    snapshot = backup(service, src, "s0", storage="chunks")
+    chunk = next(p for p in service.chunk_store.chunks_path.rglob("*") if p.is_file())
+    corrupt(chunk)
+
+    status = service.start_scrub(wait=True)
+    assert status["completed_at"] and [b["type"] for b in status["bad"]] == ["chunk"]
+    assert status["bad"][0]["stored_path"] == str(chunk)
+    assert status["bad"][0]["affected"] and all(a["snapshot"] == str(snapshot) for a in status["bad"][0]["affected"])
+
+
+def test_scrub_background_status(service, src):
+    """Test a background scrub can be followed through its saved status"""
+    backup(service, src, "s0", pack_small_files=True)
+    assert service.start_scrub()["success"]
+    service.scrubber.wait(10)
+    status = service.scrub_status()
+    assert not status["running"] and status["completed_at"] and status["checked_files"] == 6 and not status["bad"]
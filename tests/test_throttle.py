@@ -0,0 +1,91 @@
+"""Tests for the backup I/O throttle"""
+import os
+import time
+import threading
+import pytest
+from app.core.throttle import Throttle, throttle
+from app.services.copy_engine import CopyEngine
+
+MIB = 1048576
+
+
+@pytest.fixture
+def limited():
+    """Limit the shared throttle for one test"""
+    yield throttle
+    throttle.configure(0, 0, False)
+
+
+def test_byte_rate_limit():
+    """Test reads are held to the configured MB/s"""
+    t = Throttle(mbps=40)
+    start = time.perf_counter()
+    for _ in range(4):
+        t.acquire(MIB)
+    assert time.perf_counter() - start >= 0.09
+
+
+def test_iops_limit():
+    """Test reads are held to the configured operations per second"""
+    t = Throttle(iops=100)
+    start = time.perf_counter()
+    for _ in range(10):
+        t.acquire(0)
+    assert time.perf_counter() - start >= 0.09
+
+
+def test_unlimited_does_not_wait():
+    """Test an unconfigured throttle never sleeps"""
+    t = Throttle()
+    start = time.perf_counter()
+    for _ in range(1000):
+        t.acquire(MIB)
+    assert time.perf_counter() - start < 0.05
+
+
+def test_limit_change_applies_to_waiting_reader():
+    """Test lifting the limit releases a reader that is already waiting"""
+    t = Throttle(mbps=0.1)
+    reader = threading.Thread(target=t.acquire, args=(MIB,))
+    reader.start()
+    time.sleep(0.1)
+    assert reader.is_alive()
+    t.configure(mbps=0)
+    reader.join(timeout=1)
+    assert not reader.is_alive()
+
+
+def test_adaptive_backs_off_and_recovers():
+    """Test rising read latency cuts the rate and normal latency restores it"""
+    t = Throttle(mbps=100, adaptive=True)
+    for seconds in [0.01] * 5 + [0.1] * 5:
+        t._adjusted = 0
+        t.observe(seconds, MIB)
+    assert t.factor < 1
+    assert t.status()["effective_mbps"] < 100
+
+    for _ in range(100):
+        t._adjusted = 0
+        t.observe(0.01, MIB)
+    assert t.factor == 1 and t.status()["effective_mbps"] == 100
+
+
+def test_adaptive_without_limit_uses_observed_speed():
+    """Test adaptive mode limits to a share of the speed reads reached on their own"""
+    t = Throttle(adaptive=True)
+    for seconds in [0.01] * 5 + [0.1] * 5:
+        t._adjusted = 0
+        t.observe(seconds, MIB)
+    assert 0 < t.status()["effective_mbps"] < 100
+
+
+@pytest.mark.parametrize("hash_data", [True, False])
+def test_copy_is_throttled(tmp_path, limited, hash_data):
+    """Test both the hashing and the kernel copy path wait for the throttle"""
+    data = os.urandom(3 * MIB)
+    (tmp_path / "src.bin").write_bytes(data)
+    limited.configure(mbps=30)
+    start = time.perf_counter()
+    CopyEngine(verify="none").copy(tmp_path / "src.bin", tmp_path / "dest.bin", hash_data=hash_data)
+    assert time.perf_counter() - start >= 0.09
+    assert (tmp_path / "dest.bin").read_bytes() == data
@@ -0,0 +1,100 @@
+"""Tests for offloading old backups to the bucket and the local restore cache"""
+import os
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.services.backup import BackupService
+
+pytest.importorskip("boto3")
+from tests.s3_standin import S3StandIn  # noqa: E402
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    server = S3StandIn().start()
+    monkeypatch.setattr(settings, "S3_ENDPOINT_URL", server.endpoint)
+    monkeypatch.setattr(settings, "S3_REGION", "us-east-1")
+    monkeypatch.setattr(settings, "R2_ACCESS_KEY_ID", "test")
+    monkeypatch.setattr(settings, "R2_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setattr(settings, "R2_BUCKET_NAME", "backups")
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(tmp_path):
+    return BackupService(backup_base_path=str(tmp_path / "backups"))
+
+
+@pytest.fixture
+def src(tmp_path):
+    folder = tmp_path / "src"
+    folder.mkdir()
+    for i in range(4):
+        (folder / f"file{i}.txt").write_text(f"first {i} " * 500)
+    (folder / "big.bin").write_bytes(os.urandom(200000))
+    return folder
+
+
+def two_backups(service, src):
+    """An old backup whose files all changed before the newest one"""
+    old = service.backup_folder(str(src), str(service.backup_base_path / "s0"), incremental=True, pack_small_files=True)
+    originals = {p.name: p.read_bytes() for p in src.iterdir()}
+    for i in range(4):
+        (src / f"file{i}.txt").write_text(f"second {i} " * 500)
+    (src / "big.bin").write_bytes(os.urandom(200000))
+    service.backup_folder(str(src), str(service.backup_base_path / "s1"), incremental=True)
+    return Path(old["snapshot"]), originals
+
+
+def stored_files(folder: Path):
+    return [p for p in folder.rglob("*") if p.is_file() and not p.name.startswith(".backupwin")]
+
+
+def test_offload_keeps_newest_local(s3, service, src):
+    """Test old backups move to the bucket, free their local data and stay listed, the newest stays local"""
+    old, _ = two_backups(service, src)
+    planned = service.offload_backups(older_than_days=1e-9, dry_run=True)
+    assert planned["offloaded"] == [str(old)] and stored_files(old)
+
+    result = service.offload_backups(older_than_days=1e-9)
+    assert result["success"] and result["offloaded"] == [str(old)] and result["freed_mb"] > 0
+    assert not stored_files(old) and not list((service.backup_base_path / ".packs").rglob("*.pack"))
+    tiers = {b["name"]: b["tier"] for b in service.list_backups()}
+    assert tiers == {"s0": "remote", "s1": "local"}
+    assert service.rebuild_catalog()["success"]
+    assert {b["name"]: b["tier"] for b in service.list_backups()} == tiers
+
+
+def test_restore_fetches_offloaded_data_once(s3, service, src, tmp_path):
+    """Test restoring an offloaded backup fetches its data, and a repeat restore makes no round trips"""
+    old, originals = two_backups(service, src)
+    service.offload_backups(older_than_days=1e-9)
+
+    result = service.restore_snapshot(str(old), str(tmp_path / "out1"))
+    assert result["success"] and result["restored"] == 5
+    assert {p.name: p.read_bytes() for p in (tmp_path / "out1").iterdir()} == originals
+    fetched = s3.count("get_object")
+    assert fetched > 0
+
+    again = service.restore_snapshot(str(old), str(tmp_path / "out2"))
+    single = service.restore_file(str(old / "file2.txt"), str(tmp_path / "one.txt"))
+    assert again["success"] and single["success"] and s3.count("get_object") == fetched
+    assert (tmp_path / "one.txt").read_bytes() == originals["file2.txt"]
+
+
+def test_cache_evicts_least_recently_used(s3, service, src, tmp_path):
+    """Test fetched files past the cache limit are deleted oldest first and fetched again when needed"""
+    old, originals = two_backups(service, src)
+    service.offload_backups(older_than_days=1e-9)
+    service.tiers.cache_bytes = 210000  # the big file, not the pack of small ones as well
+
+    assert service.restore_file(str(old / "file0.txt"), str(tmp_path / "a.txt"))["success"]
+    assert service.restore_file(str(old / "big.bin"), str(tmp_path / "b.bin"))["success"]
+    assert service.tiers.status()["cache_mb"] <= 210000 / 1048576
+    assert (old / "big.bin").exists() and not list((service.backup_base_path / ".packs").rglob("*.pack"))
+
+    fetched = s3.count("get_object")
+    assert service.restore_file(str(old / "file0.txt"), str(tmp_path / "c.txt"))["success"]
+    assert s3.count("get_object") > fetched
+    assert (tmp_path / "c.txt").read_bytes() == originals["file0.txt"]
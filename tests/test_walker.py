@@ -0,0 +1,75 @@
+"""Tests for the os.scandir directory walker"""
+import os
+import pytest
+from app.core.walker import folder_size, parallel_scan_files, scan_files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "a" / "deep").mkdir(parents=True)
+    (tmp_path / "skip").mkdir()
+    (tmp_path / "top.txt").write_text("top")
+    (tmp_path / "a" / "one.txt").write_text("one")
+    (tmp_path / "a" / "deep" / "two.bin").write_bytes(b"x" * 10)
+    (tmp_path / "skip" / "hidden.txt").write_text("hidden")
+    return tmp_path
+
+
+def test_scan_files(tree):
+    """Test recursive and flat scans yield files only, with paths joined onto the root"""
+    found = {os.path.relpath(e.path, tree) for e in scan_files(tree)}
+    assert found == {"top.txt", os.path.join("a", "one.txt"), os.path.join("a", "deep", "two.bin"),
+                     os.path.join("skip", "hidden.txt")}
+    assert [e.name for e in scan_files(str(tree), recursive=False)] == ["top.txt"]
+    assert folder_size(tree) == (3 + 3 + 10 + 6, 4)
+
+
+def test_excluded_folders_are_not_entered(tree):
+    """Test excluded folders are pruned before they are listed"""
+    seen = []
+
+    def exclude(entry):
+        seen.append(entry.name)
+        return entry.name == "skip"
+
+    names = {e.name for e in scan_files(tree, exclude_dir=exclude)}
+    assert names == {"top.txt", "one.txt", "two.bin"}
+    assert sorted(seen) == ["a", "deep", "skip"]
+
+
+def test_unreadable_folder_is_skipped(tree, monkeypatch):
+    """Test a folder that cannot be listed is reported once and the walk goes on"""
+    scandir = os.scandir
+
+    def guarded(path):
+        if os.path.basename(path) == "a":
+            raise PermissionError(13, "Access is denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", guarded)
+    errors = []
+    names = {e.name for e in scan_files(tree, on_error=errors.append)}
+    assert names == {"top.txt", "hidden.txt"}
+    assert len(errors) == 1 and isinstance(errors[0], PermissionError)
+
+
+def test_parallel_scan_matches_sequential(tree):
+    """Test the parallel walk finds the same files, and the ordered mode the same sequence every time"""
+    expected = sorted(e.path for e in scan_files(tree))
+    assert sorted(e.path for e in parallel_scan_files(tree, workers=4)) == expected
+    ordered = [os.path.relpath(e.path, tree) for e in parallel_scan_files(tree, workers=4, ordered=True)]
+    assert ordered == ["top.txt", os.path.join("a", "one.txt"), os.path.join("a", "deep", "two.bin"),
+                       os.path.join("skip", "hidden.txt")]
+    assert {e.name for e in parallel_scan_files(tree, workers=4, exclude_dir=lambda d: d.name == "skip")} == \
+        {"top.txt", "one.txt", "two.bin"}
+
+
+def test_parallel_scan_stops_early(tmp_path):
+    """Test closing the stream part way through returns without walking the rest"""
+    for i in range(50):
+        (tmp_path / f"d{i}").mkdir()
+        (tmp_path / f"d{i}" / "f.txt").write_text("x")
+    walk = parallel_scan_files(tmp_path, workers=2)
+    first = [next(walk) for _ in range(3)]
+    walk.close()
+    assert len(first) == 3